@@ -1,41 +1,48 @@
-import io
+import json
 import os
 import sys
-import zipfile
 from pathlib import Path
-from typing import Annotated, List
+from typing import Dict, List, Tuple
 from uuid import UUID
 
-import modal
-from fastapi import (
-    BackgroundTasks,
-    Depends,
-    FastAPI,
-    File,
-    HTTPException,
-    UploadFile,
-)
-from fastapi.concurrency import run_in_threadpool
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from supabase import AsyncClient
 
 from redact.core.config import (
     BASE_DIR,
-    MODAL_APP,
-    SUPABASE_BUCKET,
+    MAX_UPLOAD_BYTES,
+    STORAGE_CONCURRENCY,
     app,
-    get_supabase_client,
 )
 from redact.core.database import get_async_session
+from redact.core.metrics import render_metrics
+from redact.services.archive import stream_zip
+from redact.services.ingest import SNIFF_BYTES, check_type, ingest_multipart
+from redact.services.jobqueue import get_job_queue
+from redact.services.ocrdata import ocr_json
 from redact.services.storage import (
     create_batch_and_files,
+    create_upload_urls,
     delete_batch_db,
-    get_file_id_by_batch,
+    download_file,
+    files_exist,
+    files_info,
+    get_batch_files,
+    get_redacted_filenames,
+    read_heads,
+    transition_batch_status,
     update_batch_status_async,
 )
-from redact.sqlschema.tables import Batch, BatchStatus, Files
+from redact.sqlschema import (
+    Batch,
+    BatchRequest,
+    BatchStatus,
+    Files,
+    LabelOptions,
+    RedactMode,
+)
 
 
 @app.get("/")
@@ -51,105 +58,221 @@ async def favicon():
     return FileResponse(BASE_DIR / "assets" / "favicon_io" / "favicon.ico")
 
 
-@app.post("/predict")
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape target, for this process or all sharing PROMETHEUS_MULTIPROC_DIR."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+ALLOWED_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp", ".pdf", ".tif", ".tiff"]
+
+
+async def start_inference(batch_id: UUID, pages: int = 1):
+    # Awaited, not a background task, so a failure reaches the client
+    # instead of leaving the batch queued forever
+    try:
+        await get_job_queue().enqueue(batch_id, pages)
+    except Exception as e:
+        print("Enqueue failed:", str(e))
+        await update_batch_status_async(batch_id, BatchStatus.failed)
+        raise HTTPException(
+            status_code=503,  # Service Unavailable
+            detail=f"Could not queue batch: {str(e)}",
+        )
+
+
+PREDICT_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "description": "Send the option fields before the files",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                        },
+                        "redact_mode": {
+                            "type": "string",
+                            "enum": [mode.value for mode in RedactMode],
+                            "default": RedactMode.solid.value,
+                        },
+                        "labels": {
+                            "type": "string",
+                            "description": 'JSON list of entity types, e.g. ["email", "phone number"]',
+                        },
+                        "threshold": {"type": "number", "minimum": 0, "maximum": 1},
+                    },
+                }
+            }
+        },
+    }
+}  # The body is parsed by hand, so describe it for the docs
+
+
+def parse_predict_fields(fields: Dict[str, str]) -> Tuple[RedactMode, LabelOptions]:
+    """The batch options from /predict's form fields, 422 if any is invalid."""
+    try:
+        redact_mode = RedactMode(fields.get("redact_mode", RedactMode.solid))
+    except ValueError:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Invalid redact_mode. Allowed: {', '.join(m.value for m in RedactMode)}",
+        )
+
+    try:
+        options = LabelOptions.model_validate(
+            {
+                "labels": json.loads(fields["labels"]) if "labels" in fields else None,
+                "threshold": fields.get("threshold"),
+            }
+        )
+    except ValueError as e:  # Bad JSON or a failed validation
+        raise HTTPException(
+            status_code=422,
+            detail=f"Invalid labels or threshold: {str(e)}",
+        )
+
+    return redact_mode, options
+
+
+@app.post("/predict", openapi_extra=PREDICT_FORM)
 async def create_prediction(
-    background_tasks: BackgroundTasks,
-    supabase_client: Annotated[AsyncClient, Depends(get_supabase_client)],
-    files: List[UploadFile] = File(...),
+    request: Request,
     session: AsyncSession = Depends(get_async_session),
 ):
-    for file in files:
-        file_content = await file.read()
+    # Streams each part to storage as it arrives, validating type and size;
+    # the options are checked before the first file is stored
+    fields, files = await ingest_multipart(request, check_fields=parse_predict_fields)
 
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
-        if file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400,  # Bad Request
-                detail=f"Invalid file type. Allowed types: {', '.join(allowed_types)}",
-            )
+    if not files:
+        raise HTTPException(status_code=422, detail="No files uploaded")
+    redact_mode, options = parse_predict_fields(fields)
 
-        # Validate file size (e.g., max 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB in bytes
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
+    # Save to database
+    batch_id = await create_batch_and_files(
+        files,
+        session,
+        redact_mode,
+        [file.content_hash for file in files],
+        labels=options.labels,
+        threshold=options.threshold,
+    )
+    await update_batch_status_async(batch_id, BatchStatus.uploaded)
 
-        if file_size > max_size:
-            raise HTTPException(
-                status_code=413,  # Payload Too Large
-                detail=f"File too large. Maximum size: {max_size / (1024 * 1024)}MB",
-            )
+    # Enqueue model processing job
+    await start_inference(batch_id, len(files))
+
+    return {
+        "batch_id": batch_id,
+        "status": "queued",
+    }
 
-        # Validate filename
-        if not file.filename or file.filename.strip() == "":
+
+@app.post("/batches")
+async def create_batch(
+    request: BatchRequest, session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Start a direct upload: returns one signed URL per file, so image bytes go
+    from the client to storage without passing through the API. Call
+    `/batches/{batch_id}/commit` once every upload has finished.
+    """
+    for file in request.files:
+        # Validate file type by extension, the bytes never reach us
+        if os.path.splitext(file.filename)[1].lower() not in ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400,  # Bad Request
-                detail="Filename cannot be empty",
+                detail=f"Invalid file type. Allowed extensions: {', '.join(ALLOWED_EXTENSIONS)}",
             )
 
-        # Save file to supabase storage bucket
-        file_path = f"uploads/{file.filename}"
+    # Sign first: a failure here leaves no batch rows behind
+    try:
+        signed = await create_upload_urls(
+            [f"uploads/{file.filename}" for file in request.files]
+        )
+    except Exception as e:
+        print("Signing upload URLs failed:", str(e))
+        raise HTTPException(status_code=502, detail="Could not create upload URLs")
+
+    batch_id = await create_batch_and_files(
+        request.files,
+        session,
+        request.redact_mode,
+        status=BatchStatus.awaiting_upload,
+        labels=request.labels,
+        threshold=request.threshold,
+    )
 
-        try:
-            # Use the storage client from the initialized supabase client
-            await supabase_client.storage.from_(SUPABASE_BUCKET).upload(
-                path=file_path,
-                file=file_content,
-                file_options={"content-type": file.content_type, "upsert": "true"},
-            )
+    return {
+        "batch_id": batch_id,
+        "status": BatchStatus.awaiting_upload.value,
+        "uploads": [
+            {
+                "filename": file.filename,
+                "path": upload["path"],
+                "signed_url": upload["signed_url"],
+                "token": upload["token"],
+            }
+            for file, upload in zip(request.files, signed)
+        ],
+    }
 
-            """ 
-            # Check if file already exists
-            if os.path.exists(file_path):
-                raise HTTPException(
-                    status_code=409,  # Conflict
-                    detail=f"File '{file.filename}' already exists",
-                )
-            """
-
-        except HTTPException:
-            # Re-raise HTTP exceptions
-            raise
-        except PermissionError:
-            raise HTTPException(
-                status_code=403,  # Forbidden
-                detail="Permission denied when writing file",
-            )
-        except OSError as e:
-            raise HTTPException(
-                status_code=500,  # Internal Server Error
-                detail=f"Failed to save file: {str(e)}",
-            )
-        except Exception as e:
-            # Cleanup: remove file if it was partially written
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-            raise HTTPException(
-                status_code=500,  # Internal Server Error
-                detail=f"Unexpected error during file upload: {str(e)}",
-            )
-        finally:
-            await file.close()
 
-    # Save to database
-    batch_id = await create_batch_and_files(files, session)
-    await update_batch_status_async(batch_id, BatchStatus.uploaded)
+@app.post("/batches/{batch_id}/commit")
+async def commit_batch(
+    batch_id: UUID,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Check every file of a direct upload landed in storage within the size
+    and type limits of `/predict`, then queue it.
+    """
+    batch = await session.get(Batch, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    if batch.status != BatchStatus.awaiting_upload:
+        raise HTTPException(
+            status_code=409,  # Conflict
+            detail=f"Batch {batch_id} is already committed",
+        )
 
-    # Enqueue model processing job
-    async def start_inference(batch_id):
-        # Run async in background task and return batch_id immediately
-        remote_inference = modal.Function.from_name(MODAL_APP, "inference_work")
-        try:
-            await run_in_threadpool(remote_inference.spawn, batch_id)
-        except Exception as e:
-            print("Modal spawn failed:", str(e))
-            raise HTTPException(status_code=500, detail=f"Modal spawn failed: {str(e)}")
+    rows = await get_batch_files(batch_id, session, Files.filename)
+    paths = [f"uploads/{filename}" for (filename,) in rows]
+    exists = await files_exist(paths)
+    missing = [path for path, found in zip(paths, exists) if not found]
+    if missing:
+        raise HTTPException(
+            status_code=409,  # Conflict
+            detail={"message": "Files not uploaded yet", "missing": missing},
+        )
 
-    background_tasks.add_task(start_inference, batch_id)
+    # Hold direct uploads to /predict's limits; the batch stays uncommitted,
+    # so the client can replace the offending file and commit again
+    infos = await files_info(paths)
+    for (filename,), info in zip(rows, infos):
+        if info["size"] > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,  # Payload Too Large
+                detail=f"File too large. {filename} exceeds {MAX_UPLOAD_BYTES / (1024 * 1024)}MB",
+            )
+    heads = await read_heads(paths, SNIFF_BYTES)
+    for (filename,), head in zip(rows, heads):
+        check_type(filename, head)
+
+    # Only the commit that moves the batch out of awaiting_upload queues it
+    if not await transition_batch_status(
+        batch_id, BatchStatus.awaiting_upload, BatchStatus.uploaded
+    ):
+        raise HTTPException(
+            status_code=409,  # Conflict
+            detail=f"Batch {batch_id} is already committed",
+        )
+    await start_inference(batch_id, len(paths))
 
     return {
         "batch_id": batch_id,
@@ -174,9 +297,15 @@ async def get_task_status(
         elif status == BatchStatus.failed:
             return {"status": "failed"}
 
+        elif status == BatchStatus.partially_failed:
+            return {"status": "partially_failed"}
+
         elif status == BatchStatus.processing:
             return {"status": "processing"}
 
+        elif status == BatchStatus.awaiting_upload:
+            return {"status": "awaiting_upload"}
+
         else:
             return {"status": "queued"}
 
@@ -184,46 +313,53 @@ async def get_task_status(
         raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
 
 
+@app.get("/results/{batch_id}")
+async def get_results(
+    batch_id: UUID, session: AsyncSession = Depends(get_async_session)
+):
+    """OCR words and entities per file, in the per-word JSON shape"""
+    rows = await get_batch_files(
+        batch_id,
+        session,
+        Files.file_id,
+        Files.filename,
+        Files.ocr_data,
+        Files.json_data,
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+
+    files = []
+    for file_id, filename, ocr_data, json_data in rows:
+        # Packed results are expanded on demand, older rows still hold JSON
+        data = ocr_json(ocr_data) if ocr_data else json_data
+        files.append({"file_id": file_id, "filename": filename, "data": data})
+
+    return {"batch_id": batch_id, "files": files}
+
+
 # For Users to request a file.
 @app.get("/download/{batch_id}")
 async def get_image(
-    supabase_client: Annotated[AsyncClient, Depends(get_supabase_client)],
     batch_id: UUID,
     session: AsyncSession = Depends(get_async_session),
 ):
+    # Only files that finished; a partially failed batch zips what it has
+    names = await get_redacted_filenames(batch_id, session)
+    if not names:
+        raise HTTPException(
+            status_code=409,  # Conflict
+            detail=f"Batch {batch_id} has no redacted files ready",
+        )
+
     try:
-        # Get file list for the batch
-        file_list: List[str] = []
-        file_ids = await get_file_id_by_batch(batch_id, session)
-        for file_id in file_ids:
-            str_uuid = str(file_id)
-            result = await session.execute(
-                select(Files.redact_filename).where(Files.file_id == str_uuid)
-            )
-            redact_image_name = result.scalars().one()
-            file_path = f"redacted/{redact_image_name}"
-            file_list.append(file_path)
-
-        CHUNK_SIZE = 1024 * 1024  # 1 MB
-
-        # Async generator that streams a zip
-        async def zip_generator():
-            with io.BytesIO() as mem_zip:
-                with zipfile.ZipFile(mem_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-                    for file_path in file_list:
-                        # Stream file from Supabase
-                        data = await supabase_client.storage.from_(
-                            SUPABASE_BUCKET
-                        ).download(path=file_path)
-                        zf.writestr(os.path.basename(file_path), data)
-
-                mem_zip.seek(0)
-                while chunk := mem_zip.read(CHUNK_SIZE):
-                    yield chunk
+        file_list: List[str] = [
+            f"redacted/{redact_image_name}" for redact_image_name in names
+        ]
 
         zip_filename = "redacted_files.zip"
         return StreamingResponse(
-            zip_generator(),
+            stream_zip(file_list, download_file, STORAGE_CONCURRENCY),
             media_type="application/zip",
             headers={"Content-Disposition": f"attachment; filename={zip_filename}"},
         )
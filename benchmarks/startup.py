@@ -0,0 +1,70 @@
+# Run `python benchmarks/startup.py` from ~/redact/; exits 1 if a module is over budget
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+RUNS = 3
+
+# Seconds to import each module in a fresh interpreter, and modules it must not
+# pull in: the model loads on first use (or in `warm_up`), never at import
+HEAVY = ["torch", "gliner", "onnxruntime"]
+BUDGETS = {
+    "redact.core.config": (2.5, HEAVY),
+    "redact.workers.worker": (2.5, HEAVY),
+    "redact.workers.inference": (4.0, HEAVY),
+    "app.main": (4.0, HEAVY),
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - start, sorted(sys.modules)]))
+"""
+
+
+def time_import(module: str):
+    """Best of RUNS cold imports, and the modules the import loaded."""
+    best, loaded = None, []
+    for _ in range(RUNS):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            cwd=ROOT,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        seconds, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+        best = seconds if best is None else min(best, seconds)
+    return best, loaded
+
+
+def benchmark_startup() -> bool:
+    ok = True
+    for module, (budget, forbidden) in BUDGETS.items():
+        try:
+            seconds, loaded = time_import(module)
+        except RuntimeError as e:
+            print(f"FAIL {module}: {e}")
+            ok = False
+            continue
+
+        heavy = [name for name in forbidden if name in loaded]
+        passed = seconds <= budget and not heavy
+        ok = ok and passed
+
+        print(
+            f"{'ok  ' if passed else 'FAIL'} {module}: {seconds:.2f}s "
+            f"(budget {budget:.1f}s)"
+            + (f", loaded {', '.join(heavy)}" if heavy else "")
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_startup() else 1)
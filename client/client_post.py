@@ -5,10 +5,14 @@ Redacted documents are saved in a dir named "Your_Files", along with your batch_
 
 Replace the variable `paths` with a list of your own local file paths.
 
-For local development, replace `response` & `status` with appropriate local server URLs.
+For local development, replace `BASE_URL` with your local server URL.
+
+Set `DIRECT_UPLOAD = True` to upload straight to storage with signed URLs
+(`POST /batches`, then `POST /batches/{batch_id}/commit`) instead of sending
+the images through the API.
 """
 
-import io
+import mimetypes
 import os
 import time
 import zipfile
@@ -17,6 +21,9 @@ from pathlib import Path
 import requests
 
 CHUNK_SIZE = 4096
+BASE_URL = "https://redact7th.vercel.app"
+DIRECT_UPLOAD = False  # Upload to storage with signed URLs, skipping the API
+PENDING = ("awaiting_upload", "queued", "processing")  # Statuses to keep polling on
 script_dir = Path(
     __file__
 ).parent.parent  # Get the directory where the current script is located
@@ -45,76 +52,135 @@ paths = [
     "/your/local/file/path2.jpg",
 ]  # These would be your file paths.
 
-files_to_upload = []
-for path in paths:
-    files_to_upload.append(
-        (
-            "files",
-            (os.path.basename(path), open(path, "rb"), "image/jpg"),
+
+def post_through_api(paths):
+    files_to_upload = []
+    for path in paths:
+        files_to_upload.append(
+            (
+                "files",
+                (os.path.basename(path), open(path, "rb"), "image/jpg"),
+            )
         )
-    )
 
-# Start job
-try:
-    # Upload list of files to server
+    try:
+        # Upload list of files to server
+        response = requests.post(f"{BASE_URL}/predict", files=files_to_upload)
+        response.raise_for_status()
+        return response.json()
+
+    finally:
+        # Close all opened file handles after the request is complete
+        for _, file_tuple in files_to_upload:
+            file_tuple[1].close()
+
+
+def post_direct(paths):
+    # Reserve the batch and get one signed upload URL per file
     response = requests.post(
-        "https://redact7th.vercel.app/predict", files=files_to_upload
+        f"{BASE_URL}/batches",
+        json={"files": [{"filename": os.path.basename(path)} for path in paths]},
     )
+    response.raise_for_status()
     data = response.json()
+
+    # Send each image straight to storage
+    for path, upload in zip(paths, data["uploads"]):
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with open(path, "rb") as f:
+            put = requests.put(
+                upload["signed_url"],
+                files={"file": (upload["filename"], f, content_type)},
+                headers={"x-upsert": "true"},
+            )
+        put.raise_for_status()
+
+    # Tell the API everything is in place, which queues the batch
+    response = requests.post(f"{BASE_URL}/batches/{data['batch_id']}/commit")
+    response.raise_for_status()
+    return response.json()
+
+
+def download_results(batch_id):
+    # Use stream=True for efficient downloading of larger files
+    now = time.time()
+    response = requests.get(f"{BASE_URL}/download/{batch_id}", stream=True)
+    response.raise_for_status()
+    later = time.time()
+    print(f"Download took: {later - now}")
+
+    # Save batch_id to delete files if you want to later.
+    with open(batch_id_file, "w") as f:
+        f.write(batch_id)
+
+    # Open the local file in binary write mode ('wb')
+    with open(local_filename, "wb") as outfile:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            outfile.write(chunk)
+
+    print(f"Download complete. File saved to {local_filename}")
+
+
+def failed_files(paths):
+    # Redacted files are named {name}_redacted.{ext}; anything missing failed
+    with zipfile.ZipFile(local_filename) as archive:
+        finished = {
+            os.path.splitext(name)[0].rsplit("_redacted", 1)[0]
+            for name in archive.namelist()
+        }
+    return [
+        os.path.basename(path)
+        for path in paths
+        if os.path.splitext(os.path.basename(path))[0] not in finished
+    ]
+
+
+# Start job
+try:
+    data = post_direct(paths) if DIRECT_UPLOAD else post_through_api(paths)
     print(f"Data: {data}")
     batch_id = data["batch_id"]
 
-    # Print the response from the server
-    print(f"Status Code: {response.status_code}")
-    print(f"Response Body: {response.json()}")
-
 except requests.exceptions.RequestException as e:
     print(f"An error occurred: {e}")
-
-finally:
-    # Close all opened file handles after the request is complete
-    for _, file_tuple in files_to_upload:
-        file_tuple[1].close()
+    raise SystemExit(1)
 
 print(f"Batch ID: {batch_id}. Saved to batch_id.txt")
+
 # Poll manually
 counter = 1
 while True:
-    status = requests.get(f"https://redact7th.vercel.app/check/{batch_id}")
+    status = requests.get(f"{BASE_URL}/check/{batch_id}")
+    if not status.ok:
+        print(f"Status check failed: {status.status_code} {status.text}")
+        break
     data = status.json()
+
     if data["status"] == "completed":
         try:
-            # Use stream=True for efficient downloading of larger files
-            now = time.time()
-            response = requests.get(
-                f"https://redact7th.vercel.app/download/{batch_id}", stream=True
-            )
-            response.raise_for_status()
-            later = time.time()
-            print(f"Download took: {later - now}")
-
-            # Save batch_id to delete files if you want to later.
-            with open(batch_id_file, "w") as f:
-                f.write(batch_id)
-
-            # Open the local file in binary write mode ('wb')
-            with open(local_filename, "wb") as outfile:
-                # Use getbuffer() or getvalue() to get the bytes-like object
-                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                    outfile.write(chunk)
-
-            print(f"Download complete. File saved to {local_filename}")
-
-            break
+            download_results(batch_id)
+        except Exception as e:
+            print(f"Failed to download the file: {e}")
+        break
 
+    elif data["status"] == "partially_failed":
+        try:
+            download_results(batch_id)
+            print(
+                f"Some files could not be processed: {', '.join(failed_files(paths))}"
+            )
         except Exception as e:
             print(f"Failed to download the file: {e}")
-            break
+        break
 
     elif data["status"] == "failed":
         print("Processing Failed.")
         break
 
+    elif data["status"] not in PENDING:
+        print(f"Unexpected batch status: {data['status']}")
+        break
+
     time.sleep(5)
     counter += 1
     print(f"Processing has taken {5 * counter} seconds.")
@@ -4,10 +4,11 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
+import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from supabase import AsyncClient, acreate_client
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
 
 from redact.core.database import init_async_db
 
@@ -17,15 +18,124 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET")
 MODAL_APP = os.getenv("MODAL_APP")
 
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase URL and Key must be set in environment variables")
+# Storage I/O
+STORAGE_CONCURRENCY = int(os.getenv("STORAGE_CONCURRENCY", "8"))  # Requests in flight
+STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", "3"))
+STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", "60"))  # Seconds
+
+# Ingest
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))  # Per file
+
+# NER model and backend: "torch", or "onnx" for an int8-quantized ONNX Runtime export (CPU)
+NER_MODEL_NAME = os.getenv("NER_MODEL_NAME", "urchade/gliner_medium-v2.1")
+NER_BACKEND = os.getenv("NER_BACKEND", "torch")
+MODEL_CACHE_DIR = os.getenv(
+    "MODEL_CACHE_DIR", os.path.expanduser("~/.cache/redact/models")
+)  # Checksummed weight snapshots, fetched once
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR", os.path.expanduser("~/.cache/redact/onnx")
+)  # Exports are built here once and reused
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+
+# Worker tuning
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "8"))  # Texts per GLiNER forward pass
+NER_WINDOW = int(
+    os.getenv("NER_WINDOW", "0")
+)  # Tokens per window, 0 for the model's max
+NER_STRIDE = int(
+    os.getenv("NER_STRIDE", "0")
+)  # Tokens between windows, 0 for 3/4 window
+RULES_ENABLED = os.getenv("RULES_ENABLED", "true").lower() == "true"  # Regex detectors
+RULES_SKIP_MODEL = (
+    os.getenv("RULES_SKIP_MODEL", "false").lower() == "true"
+)  # Leave structured labels to the rules alone
+LABEL_CACHE_SIZE = int(
+    os.getenv("LABEL_CACHE_SIZE", "32")
+)  # Label sets whose encodings are kept
+MAX_LABELS = int(os.getenv("MAX_LABELS", "25"))  # Per request
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))  # Items between stages
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+PREPROCESS_CONCURRENCY = int(os.getenv("PREPROCESS_CONCURRENCY", "2"))
+OCR_CONCURRENCY = int(
+    os.getenv("OCR_CONCURRENCY", str(os.cpu_count() or 1))
+)  # Pool size
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "eng")
+OCR_TEXT_HEIGHT = int(os.getenv("OCR_TEXT_HEIGHT", "32"))  # Target glyph height, px
+OCR_MIN_SCALE = float(os.getenv("OCR_MIN_SCALE", "0.25"))
+OCR_MAX_SCALE = float(os.getenv("OCR_MAX_SCALE", "3"))
+OCR_MAX_PIXELS = int(
+    os.getenv("OCR_MAX_PIXELS", str(16_000_000))
+)  # Cap on the image handed to Tesseract
+OCR_TILE_PIXELS = int(
+    os.getenv("OCR_TILE_PIXELS", str(6_000_000))
+)  # Larger pages are OCRed as tiles across the pool
+OCR_TILE_SIZE = int(os.getenv("OCR_TILE_SIZE", "2000"))  # Tile side, px
+OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "400"))  # Shared by neighbours, px
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX")  # Optional, for tesserocr
+REDACT_CONCURRENCY = int(os.getenv("REDACT_CONCURRENCY", "2"))
+DOCUMENT_DPI = int(os.getenv("DOCUMENT_DPI", "200"))  # PDF/TIFF rasterization
+IMAGE_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_BYTES", str(512 * 1024 * 1024)))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR")  # Spill dir, defaults to system temp
+
+# Micro-batching: coalesce batches arriving close together into one GPU run
+SCHEDULER_MAX_WAIT_MS = float(os.getenv("SCHEDULER_MAX_WAIT_MS", "250"))
+SCHEDULER_MAX_PAGES = int(os.getenv("SCHEDULER_MAX_PAGES", "32"))
+SCHEDULER_MAX_INPUTS = int(
+    os.getenv("SCHEDULER_MAX_INPUTS", "64")
+)  # Batches a worker container accepts at once
+
+# Job queue: "modal" spawns on Modal, "postgres" is drained by redact.workers.runner
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "modal")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # Visibility timeout
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "30"))  # Seconds, doubles per try
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))  # Seconds when idle
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # Runner loops per process
+JOB_PROCESSES = int(
+    os.getenv("JOB_PROCESSES", "1")
+)  # Forked runner processes sharing one model
+
+# Page result cache, keyed by upload content hash
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "10000"))
+
+# Metrics: the API serves /metrics; workers nothing scrapes push to a gateway
+METRICS_PUSHGATEWAY = os.getenv("METRICS_PUSHGATEWAY", "")  # host:port, empty to skip
+METRICS_JOB = os.getenv("METRICS_JOB", "redact-worker")
+METRICS_INSTANCE = os.getenv(
+    "METRICS_INSTANCE", ""
+)  # Pushgateway group, default hostname
 
 
 _supabase_client: Optional[AsyncClient] = None
+_http_client: Optional[httpx.AsyncClient] = None
 _lock = asyncio.Lock()
 
 
+async def create_supabase_client() -> AsyncClient:
+    global _http_client
+
+    # Checked here rather than at import, so workers and tests load config freely
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Supabase URL and Key must be set in environment variables")
+
+    # One HTTP/2 connection pool, shared by every request made through the client
+    _http_client = http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=STORAGE_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=STORAGE_CONCURRENCY,
+            max_keepalive_connections=STORAGE_CONCURRENCY,
+        ),
+    )
+    return await acreate_client(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        options=AsyncClientOptions(httpx_client=http_client),
+    )
+
+
 async def get_supabase_client() -> AsyncClient:
     """Get or create the Supabase client (works in any context)."""
     global _supabase_client
@@ -39,7 +149,7 @@ async def get_supabase_client() -> AsyncClient:
         if _supabase_client is not None:
             return _supabase_client
 
-        _supabase_client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+        _supabase_client = await create_supabase_client()
         return _supabase_client
         # thread safe, lazy initialized, non-redundant.
 
@@ -52,7 +162,7 @@ async def lifespan(app: FastAPI):
     print("Application startup: Initializing resources...")
 
     # Create the client
-    _supabase_client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    _supabase_client = await create_supabase_client()
     print("Supabase client created successfully.")
 
     await init_async_db()
@@ -74,3 +184,9 @@ app.mount(
     StaticFiles(directory=BASE_DIR / "assets" / "favicon_io"),
     name="favicon",
 )
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """The Supabase client's connection pool, for requests storage3 can't make."""
+    await get_supabase_client()
+    return _http_client
@@ -1,23 +1,45 @@
 import os
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 
+from redact.core.metrics import instrument_engine
+from redact.core.migrations import run_migrations
+
 load_dotenv()
-ASYNC_DB_URL = os.getenv("ASYNC_DB_URL")
 
-# Validate environment variable
-if not ASYNC_DB_URL:
-    raise ValueError("ASYNC_DB_URL environment variable is not set.")
+# Created on first use, so importing config (or the API) needs no database
+_engine: Optional[AsyncEngine] = None
+_sessionmaker: Optional[sessionmaker] = None
+
+
+def get_engine() -> AsyncEngine:
+    """Get or create the async engine for FastAPI and the workers."""
+    global _engine, _sessionmaker
+
+    if _engine is None:
+        url = os.getenv("ASYNC_DB_URL")
+        # Validate environment variable
+        if not url:
+            raise ValueError("ASYNC_DB_URL environment variable is not set.")
+
+        _engine = create_async_engine(url, echo=True)
+        # Every round-trip into redact_db_seconds
+        instrument_engine(_engine.sync_engine)
+        _sessionmaker = sessionmaker(
+            _engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    return _engine
+
 
-# Async engine for FastAPI
-async_engine = create_async_engine(ASYNC_DB_URL, echo=True)
-AsyncSessionLocal = sessionmaker(
-    async_engine, class_=AsyncSession, expire_on_commit=False
-)
+def AsyncSessionLocal() -> AsyncSession:
+    """A new session on the shared engine, used as `async with AsyncSessionLocal()`."""
+    get_engine()
+    return _sessionmaker()
 
 
 # Dependency to get DB session
@@ -28,5 +50,6 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
 
 # Func to initialize_db
 async def init_async_db():
-    async with async_engine.begin() as conn:
+    async with get_engine().begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+    await run_migrations(get_engine())  # Columns added to existing tables
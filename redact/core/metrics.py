@@ -0,0 +1,123 @@
+# metrics.py
+# Prometheus metrics shared by the API and the workers.
+import multiprocessing
+import os
+import socket
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    push_to_gateway,
+)
+from sqlalchemy import event
+
+# Seconds; a page's OCR can take far longer than a web request
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "redact_stage_seconds",
+    "Time spent in one pipeline step, per call",
+    ["stage", "batch_size"],
+    buckets=BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "redact_db_seconds",
+    "Database round-trip time, per statement",
+    ["operation"],
+    buckets=BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "redact_queue_depth",
+    "Items waiting in front of a pipeline stage",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+IN_FLIGHT = Gauge(
+    "redact_in_flight",
+    "Items a pipeline stage is working on",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+
+
+def size_bucket(size: int) -> str:
+    """Batch sizes rounded up to a power of two, to keep label values few."""
+    return str(1 << max(size - 1, 0).bit_length())
+
+
+@contextmanager
+def timed(stage: str, batch_size: int = 1):
+    """Observe the time spent in the block, async code included."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage, size_bucket(batch_size)).observe(
+            time.perf_counter() - start
+        )
+
+
+def instrument_engine(engine):
+    """Time every statement `engine` sends, labelled by its SQL verb."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement else ""
+        DB_SECONDS.labels(operation).observe(elapsed)
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    The registry to export.
+
+    With PROMETHEUS_MULTIPROC_DIR set (forked runners, several API workers)
+    every process writes its samples there, and this collects them all.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics():
+    """Body and content type for a scrape."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def grouping_key(instance: str = "") -> Dict[str, str]:
+    """
+    The Pushgateway group this process pushes to.
+
+    Stable across restarts, so each push replaces the group rather than
+    leaving one behind per pid. Forked runners keep their slot name; with
+    PROMETHEUS_MULTIPROC_DIR they all push the same merged registry, so the
+    node gets one group.
+    """
+    key = {"instance": instance or socket.gethostname()}
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        key["process"] = multiprocessing.current_process().name
+    return key
+
+
+def push_metrics(gateway: str, job: str, instance: str = ""):
+    """Push this process's metrics to a Pushgateway, for workers nothing scrapes."""
+    push_to_gateway(
+        gateway,
+        job=job,
+        registry=get_registry(),
+        grouping_key=grouping_key(instance),
+    )
@@ -0,0 +1,62 @@
+# migrations.py
+# create_all only creates missing tables, it never alters one that exists.
+# Columns and enum values added since are brought in here; every statement is
+# idempotent and runs on each startup, after create_all.
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+MIGRATIONS = [
+    # Redaction styles
+    """
+    DO $$ BEGIN
+        CREATE TYPE redactmode AS ENUM ('solid', 'pixelate', 'blur');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    "ALTER TABLE batch ADD COLUMN IF NOT EXISTS redact_mode redactmode"
+    " NOT NULL DEFAULT 'solid'",
+    # Packed OCR results
+    "ALTER TABLE files ADD COLUMN IF NOT EXISTS ocr_data BYTEA",
+    # Page cache lookups by upload hash
+    "ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_files_content_hash ON files (content_hash)",
+    # Direct uploads
+    "ALTER TYPE filestatus ADD VALUE IF NOT EXISTS 'awaiting_upload' BEFORE 'uploaded'",
+    # Per-batch labels and threshold
+    "ALTER TABLE batch ADD COLUMN IF NOT EXISTS labels JSONB",
+    "ALTER TABLE batch ADD COLUMN IF NOT EXISTS threshold FLOAT",
+    # Batches get their own status type, with partially_failed
+    """
+    DO $$ BEGIN
+        CREATE TYPE batchstatus AS ENUM (
+            'awaiting_upload', 'uploaded', 'processing', 'completed',
+            'partially_failed', 'failed'
+        );
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    """
+    DO $$ BEGIN
+        IF (
+            SELECT udt_name FROM information_schema.columns
+            WHERE table_name = 'batch' AND column_name = 'status'
+        ) = 'filestatus' THEN
+            ALTER TABLE batch ALTER COLUMN status TYPE batchstatus USING (
+                CASE status::text
+                    WHEN 'complete' THEN 'completed'
+                    WHEN 'unusable' THEN 'failed'
+                    ELSE status::text
+                END
+            )::batchstatus;
+        END IF;
+    END $$
+    """,
+]
+
+
+async def run_migrations(engine: AsyncEngine):
+    """Apply MIGRATIONS in order, each on its own (ADD VALUE can't share a transaction)."""
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in MIGRATIONS:
+            await conn.execute(text(statement))
@@ -0,0 +1,79 @@
+# archive.py
+import asyncio
+import os
+import time
+import zipfile
+from typing import AsyncIterator, Awaitable, Callable, Sequence
+
+# Already compressed formats, deflating them again only costs CPU
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+class _ZipSink:
+    """Unseekable write target, ZipFile falls back to data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def compression_for(filename: str) -> int:
+    extension = os.path.splitext(filename)[1].lower()
+    return (
+        zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    )
+
+
+async def stream_zip(
+    paths: Sequence[str],
+    fetch: Callable[[str], Awaitable[bytes]],
+    prefetch: int = 4,
+) -> AsyncIterator[bytes]:
+    """
+    Yield a ZIP archive of `paths` as each file arrives.
+
+    Up to `prefetch` downloads run ahead of the writer, entries are written in
+    the order of `paths`. Only the files in flight are held in memory.
+    """
+    tasks = {}
+    sink = _ZipSink()
+
+    def schedule(i):
+        if i < len(paths) and i not in tasks:
+            tasks[i] = asyncio.ensure_future(fetch(paths[i]))
+
+    try:
+        with zipfile.ZipFile(sink, "w") as zf:
+            for i in range(min(prefetch, len(paths))):
+                schedule(i)
+
+            for i, path in enumerate(paths):
+                schedule(i)
+                data = await tasks.pop(i)
+                schedule(i + prefetch)
+
+                name = os.path.basename(path)
+                info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+                info.compress_type = compression_for(name)
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, data)
+                del data
+
+                yield sink.drain()
+
+        yield sink.drain()  # Central directory
+
+    finally:
+        for task in tasks.values():
+            task.cancel()
@@ -0,0 +1,262 @@
+# ingest.py
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from redact.core.config import MAX_UPLOAD_BYTES, STORAGE_CONCURRENCY
+from redact.services.storage import upload_file
+
+ALLOWED_TYPES = [
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+    "application/pdf",
+    "image/tiff",
+]
+DOCUMENT_EXTENSIONS = {
+    "application/pdf": (".pdf",),
+    "image/tiff": (".tif", ".tiff"),
+}  # Multi-page types, the worker picks them out by extension
+MAX_FIELD_BYTES = 64 * 1024  # Plain form fields, e.g. redact_mode
+SNIFF_BYTES = 12  # Enough for every signature sniff_type knows
+
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """MIME type from the file's magic bytes, None if it isn't an allowed type."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    return None
+
+
+@dataclass
+class IngestedFile:
+    filename: str
+    content_type: str  # Sniffed, not the client's claim
+    content_hash: str
+    size: int
+
+
+class _Part:
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.name = ""
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.data = bytearray()
+        self.hasher = hashlib.sha256()
+
+
+def check_type(filename: str, head: bytes) -> str:
+    """
+    Sniffed MIME type of a file from its first SNIFF_BYTES, raising 400 if it
+    isn't allowed or doesn't match the extension the worker will go by.
+    """
+    # Validate file type from content, the declared Content-Type is not trusted
+    content_type = sniff_type(head)
+    if content_type is None:
+        raise HTTPException(
+            status_code=400,  # Bad Request
+            detail=f"Invalid file type. Allowed types: {', '.join(ALLOWED_TYPES)}",
+        )
+
+    # Documents and images take different paths in the worker, chosen by name
+    extension = os.path.splitext(filename)[1].lower()
+    named_document = any(extension in e for e in DOCUMENT_EXTENSIONS.values())
+    if extension not in DOCUMENT_EXTENSIONS.get(content_type, ()) and (
+        named_document or content_type in DOCUMENT_EXTENSIONS
+    ):
+        raise HTTPException(
+            status_code=400,  # Bad Request
+            detail=f"Invalid file type. {filename} is {content_type}",
+        )
+    return content_type
+
+
+def _check_type(part: _Part):
+    part.content_type = check_type(part.filename, bytes(part.data[:SNIFF_BYTES]))
+
+
+async def _cancel(tasks: List[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def ingest_multipart(
+    request: Request,
+    max_size: int = MAX_UPLOAD_BYTES,
+    check_fields: Optional[Callable[[Dict[str, str]], Any]] = None,
+) -> Tuple[Dict[str, str], List[IngestedFile]]:
+    """
+    Stream a multipart body straight into `uploads/`.
+
+    Each file part is checked as it arrives: its type is sniffed from the
+    first bytes and the size limit is enforced per chunk, so bad parts are
+    rejected before they are buffered. Finished parts are uploaded while the
+    rest of the body is still being read, at most STORAGE_CONCURRENCY at a
+    time; when all slots are busy, reading waits, which bounds memory.
+
+    Plain form fields must come before the files. `check_fields` sees them
+    when the first file part starts, so a request with bad options is
+    rejected before anything is written to storage.
+    Returns the plain form fields and the uploaded files.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    events = []  # Parser callbacks are sync, handle their events between chunks
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        events.append(("header", (bytes(header_field).lower(), bytes(header_value))))
+        header_field.clear()
+        header_value.clear()
+
+    parser = MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": lambda: events.append(("begin", None)),
+            "on_part_data": lambda data, start, end: events.append(
+                ("data", bytes(data[start:end]))
+            ),
+            "on_part_end": lambda: events.append(("end", None)),
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": lambda: events.append(("headers", None)),
+        },
+    )
+
+    fields: Dict[str, str] = {}
+    files: List[IngestedFile] = []
+    uploads: List[asyncio.Task] = []
+    slots = asyncio.Semaphore(STORAGE_CONCURRENCY)
+    part = _Part()
+
+    async def upload(path: str, data: bytes, content_type: str):
+        try:
+            await upload_file(path, data, content_type)
+        finally:
+            slots.release()
+
+    async def handle(event, value):
+        nonlocal part
+        if event == "begin":
+            part = _Part()
+
+        elif event == "header":
+            part.headers[value[0]] = value[1]
+
+        elif event == "headers":
+            _, options = parse_options_header(
+                part.headers.get(b"content-disposition", b"")
+            )
+            part.name = options.get(b"name", b"").decode("utf-8", "replace")
+            if b"filename" in options:
+                if not files and check_fields is not None:
+                    check_fields(fields)  # Before the first upload can start
+                part.filename = options[b"filename"].decode("utf-8", "replace")
+                # Validate filename
+                if part.filename.strip() == "":
+                    raise HTTPException(
+                        status_code=400,  # Bad Request
+                        detail="Filename cannot be empty",
+                    )
+
+        elif event == "data":
+            part.data.extend(value)
+            if part.filename is None:
+                if len(part.data) > MAX_FIELD_BYTES:
+                    raise HTTPException(status_code=413, detail="Form field too large")
+                return
+
+            if len(part.data) > max_size:
+                raise HTTPException(
+                    status_code=413,  # Payload Too Large
+                    detail=f"File too large. Maximum size: {max_size / (1024 * 1024)}MB",
+                )
+            if part.content_type is None and len(part.data) >= SNIFF_BYTES:
+                _check_type(part)
+            part.hasher.update(value)
+
+        elif event == "end":
+            if part.filename is None:
+                if files:
+                    raise HTTPException(
+                        status_code=400,  # Bad Request
+                        detail=f"Form field {part.name} must come before the files",
+                    )
+                fields[part.name] = part.data.decode("utf-8", "replace")
+                return
+
+            if part.content_type is None:
+                _check_type(part)  # Shorter than the sniff window
+
+            await slots.acquire()  # Backpressure: stop reading until a slot frees
+            uploads.append(
+                asyncio.create_task(
+                    upload(
+                        f"uploads/{part.filename}",
+                        bytes(part.data),
+                        part.content_type,
+                    )
+                )
+            )
+            files.append(
+                IngestedFile(
+                    part.filename,
+                    part.content_type,
+                    part.hasher.hexdigest(),
+                    len(part.data),
+                )
+            )
+            part.data = bytearray()  # The upload task holds its own copy
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event, value in events:
+                await handle(event, value)
+            events.clear()
+
+            # Fail fast: surface a finished upload's error without reading on
+            await asyncio.gather(*(task for task in uploads if task.done()))
+
+        parser.finalize()
+        for event, value in events:
+            await handle(event, value)
+
+        await asyncio.gather(*uploads)
+
+    except HTTPException:
+        await _cancel(uploads)
+        raise
+    except Exception as e:
+        await _cancel(uploads)
+        raise HTTPException(
+            status_code=500,  # Internal Server Error
+            detail=f"Unexpected error during file upload: {str(e)}",
+        )
+
+    return fields, files
@@ -0,0 +1,404 @@
+# jobqueue.py
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+
+import modal
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import and_, or_, select, update
+
+from redact.core.config import (
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_QUEUE_BACKEND,
+    JOB_RETRY_DELAY,
+    MODAL_APP,
+)
+from redact.core.database import AsyncSessionLocal
+from redact.sqlschema.tables import Job, JobStatus
+
+
+@dataclass
+class ClaimedJob:
+    id: UUID
+    batch_id: UUID
+    pages: int
+    attempts: int  # Including this one
+    max_attempts: int
+
+    @property
+    def final_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+
+class JobQueue(ABC):
+    """Where the API sends batches to run; all the API needs is `enqueue`."""
+
+    @abstractmethod
+    async def enqueue(self, batch_id: UUID, pages: int = 1) -> Optional[UUID]:
+        """Queue a batch, returning the job id where the backend has one."""
+
+
+class ClaimableJobQueue(JobQueue):
+    """
+    At-least-once queue of batches that runners pull jobs from.
+
+    A claim leases a job for `lease_seconds`; a worker that dies or stalls
+    without calling `complete`/`fail` loses the lease and the job becomes
+    claimable again (the visibility timeout). Long jobs keep their lease with
+    `extend`. `complete`, `fail` and `extend` only act while the caller still
+    holds the lease, so a worker whose job was reclaimed can't clobber it.
+    """
+
+    @abstractmethod
+    async def claim(
+        self, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS
+    ) -> Optional[ClaimedJob]:
+        """Lease the oldest ready job to `worker_id`, None if nothing is ready."""
+
+    @abstractmethod
+    async def extend(
+        self, job: ClaimedJob, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS
+    ) -> bool:
+        """Renew a held lease; False if the job was lost to another worker."""
+
+    @abstractmethod
+    async def complete(self, job: ClaimedJob, worker_id: str):
+        """Mark a held job done."""
+
+    @abstractmethod
+    async def fail(
+        self,
+        job: ClaimedJob,
+        worker_id: str,
+        error: str,
+        retry_delay: float = JOB_RETRY_DELAY,
+    ) -> bool:
+        """Release a failed job; True if it will be retried."""
+
+    @abstractmethod
+    async def reap(self) -> List[UUID]:
+        """Fail jobs whose last lease expired, returning their batch ids."""
+
+
+def _backoff(retry_delay: float, attempts: int) -> float:
+    return retry_delay * 2 ** max(attempts - 1, 0)
+
+
+class PostgresJobQueue(ClaimableJobQueue):
+    """Jobs table polled with `SELECT ... FOR UPDATE SKIP LOCKED`."""
+
+    def __init__(self, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+
+    async def enqueue(self, batch_id: UUID, pages: int = 1) -> UUID:
+        job = Job(batch_id=batch_id, pages=pages, max_attempts=self.max_attempts)
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    session.add(job)
+
+        except SQLAlchemyError as e:
+            # handle/log later
+            print("DB Error: ", e)
+            raise
+
+        return job.id
+
+    @staticmethod
+    def claim_statement(now: datetime):
+        """Oldest claimable job, skipping rows other workers have locked."""
+        return (
+            select(Job)
+            .where(
+                or_(
+                    and_(Job.status == JobStatus.queued, Job.available_at <= now),
+                    and_(Job.status == JobStatus.running, Job.lease_expires_at < now),
+                ),
+                Job.attempts < Job.max_attempts,
+            )
+            .order_by(Job.available_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+
+    async def claim(
+        self, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS
+    ) -> Optional[ClaimedJob]:
+        now = datetime.utcnow()
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    result = await session.execute(self.claim_statement(now))
+                    job = result.scalars().first()
+                    if job is None:
+                        return None
+
+                    job.status = JobStatus.running
+                    job.attempts += 1
+                    job.locked_by = worker_id
+                    job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+                    claimed = ClaimedJob(
+                        job.id, job.batch_id, job.pages, job.attempts, job.max_attempts
+                    )
+
+        except SQLAlchemyError as e:
+            # handle/log later
+            print("DB Error: ", e)
+            raise
+
+        return claimed
+
+    async def _update_held(self, job: ClaimedJob, worker_id: str, **values) -> bool:
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    result = await session.execute(
+                        update(Job)
+                        .where(
+                            Job.id == job.id,
+                            Job.locked_by == worker_id,
+                            Job.status == JobStatus.running,
+                        )
+                        .values(**values)
+                    )
+
+        except SQLAlchemyError as e:
+            # handle/log later
+            print("DB Error: ", e)
+            raise
+
+        return result.rowcount > 0
+
+    async def extend(
+        self, job: ClaimedJob, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS
+    ) -> bool:
+        return await self._update_held(
+            job,
+            worker_id,
+            lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds),
+        )
+
+    async def complete(self, job: ClaimedJob, worker_id: str):
+        await self._update_held(
+            job, worker_id, status=JobStatus.done, lease_expires_at=None
+        )
+
+    async def fail(
+        self,
+        job: ClaimedJob,
+        worker_id: str,
+        error: str,
+        retry_delay: float = JOB_RETRY_DELAY,
+    ) -> bool:
+        if job.final_attempt:
+            await self._update_held(
+                job,
+                worker_id,
+                status=JobStatus.failed,
+                lease_expires_at=None,
+                last_error=error,
+            )
+            return False
+
+        await self._update_held(
+            job,
+            worker_id,
+            status=JobStatus.queued,
+            locked_by=None,
+            lease_expires_at=None,
+            last_error=error,
+            available_at=datetime.utcnow()
+            + timedelta(seconds=_backoff(retry_delay, job.attempts)),
+        )
+        return True
+
+    async def reap(self) -> List[UUID]:
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    result = await session.execute(
+                        update(Job)
+                        .where(
+                            Job.status == JobStatus.running,
+                            Job.lease_expires_at < datetime.utcnow(),
+                            Job.attempts >= Job.max_attempts,
+                        )
+                        .values(status=JobStatus.failed, last_error="Lease expired")
+                        .returning(Job.batch_id)
+                    )
+                    batch_ids = list(result.scalars().all())
+
+        except SQLAlchemyError as e:
+            # handle/log later
+            print("DB Error: ", e)
+            raise
+
+        return batch_ids
+
+
+class MemoryJobQueue(ClaimableJobQueue):
+    """In-process queue with the same semantics, for tests and single-process runs."""
+
+    def __init__(self, max_attempts: int = JOB_MAX_ATTEMPTS, clock=None):
+        self.max_attempts = max_attempts
+        self.clock = clock or time.time
+        self.jobs: Dict[UUID, Job] = {}
+        self._lock = asyncio.Lock()
+
+    def _now(self) -> datetime:
+        return datetime.fromtimestamp(self.clock())
+
+    async def enqueue(self, batch_id: UUID, pages: int = 1) -> UUID:
+        job = Job(
+            id=uuid4(),
+            batch_id=batch_id,
+            pages=pages,
+            max_attempts=self.max_attempts,
+            available_at=self._now(),
+            created_at=self._now(),
+        )
+        self.jobs[job.id] = job
+        return job.id
+
+    def _claimable(self, job: Job, now: datetime) -> bool:
+        if job.attempts >= job.max_attempts:
+            return False
+        if job.status == JobStatus.queued:
+            return job.available_at <= now
+        return job.status == JobStatus.running and job.lease_expires_at < now
+
+    async def claim(
+        self, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS
+    ) -> Optional[ClaimedJob]:
+        async with self._lock:
+            now = self._now()
+            ready = [job for job in self.jobs.values() if self._claimable(job, now)]
+            if not ready:
+                return None
+
+            job = min(ready, key=lambda job: job.available_at)
+            job.status = JobStatus.running
+            job.attempts += 1
+            job.locked_by = worker_id
+            job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+            return ClaimedJob(
+                job.id, job.batch_id, job.pages, job.attempts, job.max_attempts
+            )
+
+    def _held(self, job: ClaimedJob, worker_id: str) -> Optional[Job]:
+        row = self.jobs.get(job.id)
+        if row is None or row.locked_by != worker_id or row.status != JobStatus.running:
+            return None
+        return row
+
+    async def extend(
+        self, job: ClaimedJob, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS
+    ) -> bool:
+        row = self._held(job, worker_id)
+        if row is None:
+            return False
+        row.lease_expires_at = self._now() + timedelta(seconds=lease_seconds)
+        return True
+
+    async def complete(self, job: ClaimedJob, worker_id: str):
+        row = self._held(job, worker_id)
+        if row is not None:
+            row.status = JobStatus.done
+            row.lease_expires_at = None
+
+    async def fail(
+        self,
+        job: ClaimedJob,
+        worker_id: str,
+        error: str,
+        retry_delay: float = JOB_RETRY_DELAY,
+    ) -> bool:
+        row = self._held(job, worker_id)
+        if row is None:
+            return False
+
+        row.last_error = error
+        row.lease_expires_at = None
+        if job.final_attempt:
+            row.status = JobStatus.failed
+            return False
+
+        row.status = JobStatus.queued
+        row.locked_by = None
+        row.available_at = self._now() + timedelta(
+            seconds=_backoff(retry_delay, job.attempts)
+        )
+        return True
+
+    async def reap(self) -> List[UUID]:
+        now = self._now()
+        reaped = []
+        for job in self.jobs.values():
+            if (
+                job.status == JobStatus.running
+                and job.lease_expires_at < now
+                and job.attempts >= job.max_attempts
+            ):
+                job.status = JobStatus.failed
+                job.last_error = "Lease expired"
+                reaped.append(job.batch_id)
+        return reaped
+
+
+class ModalJobQueue(JobQueue):
+    """Hands jobs to the Modal worker, which runs them itself; nothing to claim."""
+
+    async def enqueue(self, batch_id: UUID, pages: int = 1) -> Optional[UUID]:
+        # The worker groups batches by page count, so pass it along
+        worker = modal.Cls.from_name(MODAL_APP, "InferenceWorker")()
+        call = await run_in_threadpool(worker.inference_work.spawn, batch_id, pages)
+        print(f"Spawned Modal call {call.object_id} for batch {batch_id}")
+        return None
+
+
+_job_queue: Optional[JobQueue] = None
+
+BACKENDS = {
+    "modal": ModalJobQueue,
+    "postgres": PostgresJobQueue,
+    "memory": MemoryJobQueue,
+}
+
+
+def get_job_queue() -> JobQueue:
+    """Get or create the queue for JOB_QUEUE_BACKEND."""
+    global _job_queue
+
+    if _job_queue is None:
+        try:
+            _job_queue = BACKENDS[JOB_QUEUE_BACKEND]()
+        except KeyError:
+            raise ValueError(
+                f"Unknown JOB_QUEUE_BACKEND {JOB_QUEUE_BACKEND!r}, "
+                f"expected one of {', '.join(BACKENDS)}"
+            )
+
+    return _job_queue
+
+
+def get_claimable_job_queue() -> ClaimableJobQueue:
+    """The JOB_QUEUE_BACKEND queue, for runners; fails if it can't be pulled from."""
+    queue = get_job_queue()
+    if not isinstance(queue, ClaimableJobQueue):
+        claimable = [
+            name
+            for name, backend in BACKENDS.items()
+            if issubclass(backend, ClaimableJobQueue)
+        ]
+        raise ValueError(
+            f"JOB_QUEUE_BACKEND {JOB_QUEUE_BACKEND!r} runs jobs itself, runners "
+            f"can't claim from it; set it to one of {', '.join(claimable)}"
+        )
+
+    return queue
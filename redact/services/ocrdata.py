@@ -0,0 +1,238 @@
+# ocrdata.py
+import json
+import struct
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# magic, version, coord itemsize, n words, bbox scale, label table length
+_HEADER = struct.Struct("<4sBBIfI")
+_MAGIC = b"ROCR"
+_VERSION = 1
+
+# magic, page count; then a uint32 byte length per page, then the pages
+_PAGES_HEADER = struct.Struct("<4sI")
+_PAGES_MAGIC = b"ROCP"
+
+
+def _pad(n: int) -> int:
+    return -n % 4  # Keep every array 4-byte aligned
+
+
+class OCRResult:
+    """
+    Columnar OCR output for one page.
+
+    Words are stored as parallel arrays: x/y/w/h (int16, or int32 for huge
+    pages), confidence (float32), an entity label index (int16, -1 for none)
+    and a text offsets table into one UTF-8 blob. `to_bytes` packs it for a
+    bytea column and `from_bytes` maps it back without copying the arrays;
+    word texts are only decoded when asked for. Boxes are in OCR image
+    coordinates, divide by `scale` for the original image.
+    """
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        w: np.ndarray,
+        h: np.ndarray,
+        conf: np.ndarray,
+        text_offsets: np.ndarray,
+        text_blob: bytes,
+        entity: Optional[np.ndarray] = None,
+        labels: Sequence[str] = (),
+        scale: float = 1.0,
+    ):
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.conf = conf
+        self.text_offsets = text_offsets
+        self.text_blob = text_blob
+        self.entity = (
+            np.full(len(x), -1, dtype=np.int16) if entity is None else entity.copy()
+        )  # Writable even when the rest are read-only views
+        self.labels = list(labels)
+        self.scale = scale
+        self._texts: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @classmethod
+    def from_columns(cls, text, left, top, width, height, conf, scale: float = 1.0):
+        """Build from pytesseract.image_to_data style columns."""
+        encoded = [t.encode("utf-8") for t in text]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum([len(t) for t in encoded])
+
+        coords = [np.asarray(c, dtype=np.int64) for c in (left, top, width, height)]
+        limit = max((int(np.abs(c).max()) for c in coords if len(c)), default=0)
+        coord_type = np.int16 if limit <= np.iinfo(np.int16).max else np.int32
+
+        result = cls(
+            *(c.astype(coord_type) for c in coords),
+            conf=np.asarray(conf, dtype=np.float32),
+            text_offsets=offsets,
+            text_blob=b"".join(encoded),
+            scale=scale,
+        )
+        result._texts = list(text)
+        return result
+
+    @classmethod
+    def from_words(cls, words: List[Dict[str, Any]], scale: float = 1.0):
+        """Build from the legacy per-word dicts stored in `Files.json_data`."""
+        result = cls.from_columns(
+            [word["text"] for word in words],
+            [word["bbox"][0][0] for word in words],
+            [word["bbox"][0][1] for word in words],
+            [word["bbox"][1][0] - word["bbox"][0][0] for word in words],
+            [word["bbox"][1][1] - word["bbox"][0][1] for word in words],
+            [word["ocr_confidence"] for word in words],
+            scale=scale,
+        )
+        for i, word in enumerate(words):
+            if word.get("entity") is not None:
+                result.set_entity(i, word["entity"])
+        return result
+
+    @property
+    def texts(self) -> List[str]:
+        if self._texts is None:
+            offsets = self.text_offsets
+            blob = self.text_blob
+            self._texts = [
+                blob[offsets[i] : offsets[i + 1]].decode("utf-8")
+                for i in range(len(self))
+            ]
+        return self._texts
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """(N, 4) x1, y1, x2, y2 in OCR image coordinates."""
+        x = self.x.astype(np.int64)
+        y = self.y.astype(np.int64)
+        return np.stack([x, y, x + self.w, y + self.h], axis=1)
+
+    def label_id(self, label: str) -> int:
+        if label not in self.labels:
+            self.labels.append(label)
+        return self.labels.index(label)
+
+    def set_entity(self, index, label: str):
+        """Tag one word (or an index array of words) with `label`."""
+        self.entity[index] = self.label_id(label)
+
+    def entity_of(self, i: int) -> Optional[str]:
+        idx = int(self.entity[i])
+        return None if idx < 0 else self.labels[idx]
+
+    def to_bytes(self) -> bytes:
+        labels = json.dumps(self.labels).encode("utf-8")
+        header = _HEADER.pack(
+            _MAGIC, _VERSION, self.x.itemsize, len(self), self.scale, len(labels)
+        )
+        parts = [header, labels, b"\0" * _pad(len(header) + len(labels))]
+        for array in (self.x, self.y, self.w, self.h, self.conf, self.entity):
+            raw = np.ascontiguousarray(array).tobytes()
+            parts += [raw, b"\0" * _pad(len(raw))]
+        parts += [self.text_offsets.astype(np.uint32).tobytes(), self.text_blob]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, buffer: bytes) -> "OCRResult":
+        buffer = memoryview(buffer)
+        magic, version, coord_size, n, scale, labels_len = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a packed OCR result")
+
+        offset = _HEADER.size
+        labels = json.loads(bytes(buffer[offset : offset + labels_len]))
+        offset += labels_len
+        offset += _pad(offset)
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            offset += _pad(array.nbytes)
+            return array
+
+        coord_type = np.int16 if coord_size == 2 else np.int32
+        x, y, w, h = (take(coord_type, n) for _ in range(4))
+        conf = take(np.float32, n)
+        entity = take(np.int16, n)
+        text_offsets = np.frombuffer(
+            buffer, dtype=np.uint32, count=n + 1, offset=offset
+        )
+        offset += text_offsets.nbytes
+
+        return cls(
+            x,
+            y,
+            w,
+            h,
+            conf,
+            text_offsets,
+            bytes(buffer[offset:]),
+            entity=entity,
+            labels=labels,
+            scale=scale,
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        """The legacy `{"ocr": [...]}` shape, built on demand."""
+        boxes = self.boxes.tolist()
+        conf = self.conf.tolist()
+        return {
+            "ocr": [
+                {
+                    "text": text,
+                    "bbox": [(x1, y1), (x2, y2)],
+                    "entity": self.entity_of(i),
+                    "ocr_confidence": round(conf[i], 3),
+                }
+                for i, (text, (x1, y1, x2, y2)) in enumerate(zip(self.texts, boxes))
+            ],
+            "scale": self.scale,
+        }
+
+
+def pack_pages(results: Sequence[OCRResult]) -> bytes:
+    """Pack a multi-page document's results, one `to_bytes` blob per page."""
+    blobs = [result.to_bytes() for result in results]
+    parts = [
+        _PAGES_HEADER.pack(_PAGES_MAGIC, len(blobs)),
+        struct.pack(f"<{len(blobs)}I", *(len(blob) for blob in blobs)),
+    ]
+    for blob in blobs:
+        parts += [blob, b"\0" * _pad(len(blob))]  # Pages stay 4-byte aligned
+    return b"".join(parts)
+
+
+def is_paged(buffer: bytes) -> bool:
+    return bytes(buffer[:4]) == _PAGES_MAGIC
+
+
+def unpack_pages(buffer: bytes) -> List[OCRResult]:
+    """Every page of a `pack_pages` buffer; a single-image result is one page."""
+    if not is_paged(buffer):
+        return [OCRResult.from_bytes(buffer)]
+
+    buffer = memoryview(buffer)
+    _, count = _PAGES_HEADER.unpack_from(buffer)
+    sizes = struct.unpack_from(f"<{count}I", buffer, _PAGES_HEADER.size)
+    offset = _PAGES_HEADER.size + 4 * count
+
+    pages = []
+    for size in sizes:
+        pages.append(OCRResult.from_bytes(buffer[offset : offset + size]))
+        offset += size + _pad(size)
+    return pages
+
+
+def ocr_json(buffer: bytes) -> Dict[str, Any]:
+    """Legacy JSON for a stored result, `{"pages": [...]}` for documents."""
+    if is_paged(buffer):
+        return {"pages": [page.to_json() for page in unpack_pages(buffer)]}
+    return OCRResult.from_bytes(buffer).to_json()
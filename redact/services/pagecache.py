@@ -0,0 +1,168 @@
+# pagecache.py
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import delete, or_, select, update
+
+from redact.core.config import (
+    DOCUMENT_DPI,
+    NER_STRIDE,
+    NER_WINDOW,
+    OCR_MAX_PIXELS,
+    OCR_MAX_SCALE,
+    OCR_MIN_SCALE,
+    OCR_TEXT_HEIGHT,
+    OCR_TILE_OVERLAP,
+    OCR_TILE_PIXELS,
+    OCR_TILE_SIZE,
+    PAGE_CACHE_MAX_ENTRIES,
+    PAGE_CACHE_TTL,
+    TESSERACT_LANG,
+)
+from redact.core.database import AsyncSessionLocal
+from redact.services.storage import remove_files
+from redact.sqlschema.tables import PageCache
+
+CACHE_VERSION = 4  # Bump when the pipeline's output changes for the same input
+
+
+def hash_content(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def result_settings() -> List[Any]:
+    """Config that changes what a page's OCR, entities and rendering come out as."""
+    return [
+        DOCUMENT_DPI,
+        TESSERACT_LANG,
+        OCR_TEXT_HEIGHT,
+        OCR_MIN_SCALE,
+        OCR_MAX_SCALE,
+        OCR_MAX_PIXELS,
+        OCR_TILE_PIXELS,
+        OCR_TILE_SIZE,
+        OCR_TILE_OVERLAP,
+        NER_WINDOW,
+        NER_STRIDE,
+    ]
+
+
+def cache_key(
+    content_hash: str,
+    model_version: str,
+    labels: Sequence[str],
+    redact_mode: str,
+    extension: str,
+    threshold: Optional[float] = None,
+) -> str:
+    """
+    Everything that changes a page's result goes into the key, so hits are
+    never stale: the request's options, the model and rules, and the OCR and
+    NER settings. Changes in code rather than config bump CACHE_VERSION.
+    """
+    material = json.dumps(
+        [
+            CACHE_VERSION,
+            result_settings(),
+            content_hash,
+            model_version,
+            list(labels),
+            str(redact_mode),
+            extension.lower(),
+            threshold,
+        ]
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def cache_path(key: str, extension: str) -> str:
+    return f"cache/{key}{extension}"
+
+
+async def lookup_cached_pages(keys: Sequence[str]) -> Dict[str, PageCache]:
+    """Fetch live cache entries for `keys` in one query, touching their last use."""
+    if not keys:
+        return {}
+
+    cutoff = datetime.utcnow() - timedelta(seconds=PAGE_CACHE_TTL)
+    try:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                result = await session.execute(
+                    select(PageCache).where(
+                        PageCache.key.in_(keys), PageCache.created_at >= cutoff
+                    )
+                )
+                rows = result.scalars().all()
+
+                if rows:
+                    await session.execute(
+                        update(PageCache)
+                        .where(PageCache.key.in_([row.key for row in rows]))
+                        .values(last_used_at=datetime.utcnow())
+                    )
+
+    except SQLAlchemyError as e:
+        # handle/log later
+        print("DB Error: ", e)
+        raise
+
+    return {row.key: row for row in rows}
+
+
+async def store_cached_pages(entries: List[Dict[str, Any]]):
+    """Insert new cache rows in one statement, keeping whichever row got there first."""
+    if not entries:
+        return
+
+    try:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await session.execute(
+                    insert(PageCache)
+                    .values(entries)
+                    .on_conflict_do_nothing(index_elements=["key"])
+                )
+
+    except SQLAlchemyError as e:
+        # handle/log later
+        print("DB Error: ", e)
+        raise
+
+
+async def evict_cached_pages():
+    """Drop entries past the TTL, then the least recently used past the size cap."""
+    cutoff = datetime.utcnow() - timedelta(seconds=PAGE_CACHE_TTL)
+    try:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                keep = (
+                    select(PageCache.key)
+                    .order_by(PageCache.last_used_at.desc())
+                    .limit(PAGE_CACHE_MAX_ENTRIES)
+                )
+                result = await session.execute(
+                    select(PageCache.key, PageCache.redact_path).where(
+                        or_(PageCache.created_at < cutoff, PageCache.key.not_in(keep))
+                    )
+                )
+                evicted = result.all()
+
+                if evicted:
+                    await session.execute(
+                        delete(PageCache).where(
+                            PageCache.key.in_([key for key, _ in evicted])
+                        )
+                    )
+
+    except SQLAlchemyError as e:
+        # handle/log later
+        print("DB Error: ", e)
+        raise
+
+    await remove_files([path for _, path in evicted])
+    return len(evicted)
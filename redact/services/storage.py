@@ -1,35 +1,59 @@
-import os
+import asyncio
+import random
+import weakref
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from uuid import UUID, uuid4
 
+import httpx
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.exc import SQLAlchemyError
-from sqlmodel import delete, select
+from sqlmodel import delete, select, update
 from sqlmodel.ext.asyncio.session import AsyncSession
+from storage3.exceptions import StorageApiError
+from storage3.types import CreateSignedUploadUrlOptions
 
-from redact.core.config import SUPABASE_BUCKET, get_supabase_client
+from redact.core.config import (
+    STORAGE_CONCURRENCY,
+    STORAGE_RETRIES,
+    SUPABASE_BUCKET,
+    get_http_client,
+    get_supabase_client,
+)
 from redact.core.database import AsyncSessionLocal
-from redact.sqlschema.tables import Batch, BatchStatus, Files
+from redact.sqlschema.tables import Batch, BatchStatus, Files, FileStatus, RedactMode
 
 
 async def create_batch_and_files(
-    files: List[UploadFile], session: AsyncSession
+    files: List[UploadFile],
+    session: AsyncSession,
+    redact_mode: RedactMode = RedactMode.solid,
+    content_hashes: Optional[List[str]] = None,
+    status: BatchStatus = BatchStatus.uploaded,
+    labels: Optional[List[str]] = None,
+    threshold: Optional[float] = None,
 ) -> UUID:
     batch_id = uuid4()
 
     try:
         async with session.begin():  # start transaction
             # Create and add batch record
-            batch = Batch(id=batch_id)
+            batch = Batch(
+                id=batch_id,
+                redact_mode=redact_mode,
+                status=status,
+                labels=labels,
+                threshold=threshold,
+            )
             session.add(batch)
 
             # Create file records
             file_objs = []
-            for f in files:
+            for i, f in enumerate(files):
                 file_obj = Files(
                     batch_id=batch_id,
                     filename=f.filename,
+                    content_hash=content_hashes[i] if content_hashes else None,
                     created_at=datetime.utcnow(),
                 )
                 file_objs.append(file_obj)
@@ -51,29 +75,107 @@ async def get_file_id_by_batch(batch_id: UUID, session: AsyncSession):
     return results.scalars().all()
 
 
+async def get_batch_files(batch_id: UUID, session: AsyncSession, *columns):
+    """Fetch `columns` (default: whole rows) for every file in a batch, in one query."""
+    statement = select(*(columns or (Files,))).where(Files.batch_id == batch_id)
+    results = await session.execute(statement)
+    return results.all()
+
+
+async def get_redacted_filenames(batch_id: UUID, session: AsyncSession) -> List[str]:
+    """Redacted object names of a batch's completed files; failed files have none."""
+    statement = select(Files.redact_filename).where(
+        Files.batch_id == batch_id,
+        Files.status == FileStatus.complete,
+        Files.redact_filename.is_not(None),
+    )
+    results = await session.execute(statement)
+    return list(results.scalars().all())
+
+
+async def get_files_for_batches(
+    batch_ids: Sequence[UUID], session: AsyncSession, *columns
+):
+    """Like `get_batch_files` across several batches; `columns` may include Batch's."""
+    statement = (
+        select(*columns)
+        .join(Batch, Files.batch_id == Batch.id)
+        .where(Files.batch_id.in_(batch_ids))
+    )
+    results = await session.execute(statement)
+    return results.all()
+
+
+async def update_files_bulk(updates: List[Dict[str, Any]]):
+    """
+    Write per-file values in one executemany UPDATE.
+
+    Each dict holds a `file_id` plus the columns to set for that file.
+    """
+    if not updates:
+        return
+
+    try:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await session.execute(update(Files), updates)
+
+    except SQLAlchemyError as e:
+        # handle/log later
+        print("DB Error: ", e)
+        raise
+
+
+async def _set_batch_status(
+    session: AsyncSession, batch_id: UUID, status: BatchStatus, *where
+) -> bool:
+    """Set a batch's status where `where` holds, False if no row matched."""
+    result = await session.execute(
+        update(Batch).where(Batch.id == batch_id, *where).values(status=status)
+    )
+    if result.rowcount == 0:
+        return False
+
+    # Propagate to files, one statement for the whole batch; after a partial
+    # failure each file keeps its own status
+    if status != BatchStatus.partially_failed:
+        await session.execute(
+            update(Files)
+            .where(Files.batch_id == batch_id)
+            .values(status=FileStatus(status.value))
+        )
+    return True
+
+
 # for async usage (FastAPI)
 async def update_batch_status_async(batch_id: UUID, status: BatchStatus):
     try:
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                # Create and add batch record
-                batch = await session.get(Batch, batch_id)
-
-                if not batch:
+                if not await _set_batch_status(session, batch_id, status):
                     raise ValueError("Batch not found")
 
-                batch.status = status
+    except SQLAlchemyError as e:
+        # handle/log later
+        print("DB Error: ", e)
+        raise
 
-                # Propagate to files
-                # Return batch_id matching column for all rows, in a list.
-                result = await session.execute(
-                    select(Files).where(Files.batch_id == batch_id)
-                )
 
-                files = result.scalars().all()
+async def transition_batch_status(
+    batch_id: UUID, from_status: BatchStatus, to_status: BatchStatus
+) -> bool:
+    """
+    Move a batch from `from_status` to `to_status` in one conditional UPDATE.
 
-                for f in files:
-                    f.status = status
+    Returns False if the batch wasn't in `from_status`, so of several
+    concurrent callers exactly one wins.
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                return await _set_batch_status(
+                    session, batch_id, to_status, Batch.status == from_status
+                )
 
     except SQLAlchemyError as e:
         # handle/log later
@@ -125,3 +227,136 @@ async def delete_batch_db(batch_id: UUID, session: AsyncSession):
         # handle/log later
         print("DB Error: ", e)
         raise
+
+
+# Storage I/O, bounded by STORAGE_CONCURRENCY across all callers on a loop
+_storage_slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+
+def _get_storage_slots() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _storage_slots:
+        _storage_slots[loop] = asyncio.Semaphore(STORAGE_CONCURRENCY)
+    return _storage_slots[loop]
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.TransportError):
+        return True  # Timeouts, dropped connections
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code  # Requests made without storage3
+        return status == 429 or status >= 500
+    if isinstance(e, StorageApiError):
+        try:
+            status = int(e.status)
+        except (TypeError, ValueError):
+            return False
+        return status == 429 or status >= 500
+    return False
+
+
+async def _storage_call(operation, *args, **kwargs):
+    """Run a storage request in a concurrency slot, retrying with backoff."""
+    for attempt in range(STORAGE_RETRIES + 1):
+        try:
+            async with _get_storage_slots():
+                return await operation(*args, **kwargs)
+
+        except Exception as e:
+            if attempt == STORAGE_RETRIES or not _is_retryable(e):
+                raise
+
+            delay = 0.5 * 2**attempt + random.uniform(0, 0.25)  # Jittered backoff
+            print(f"Storage request failed ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+async def download_file(path: str) -> bytes:
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    return await _storage_call(bucket.download, path)
+
+
+async def upload_file(path: str, data: bytes, content_type: str):
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    await _storage_call(
+        bucket.upload,
+        path=path,
+        file=data,
+        file_options={"content-type": content_type, "upsert": "true"},
+    )
+
+
+async def copy_file(from_path: str, to_path: str):
+    """Server-side copy, replacing `to_path` if it exists."""
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    await _storage_call(bucket.remove, [to_path])  # Copy doesn't overwrite
+    await _storage_call(bucket.copy, from_path, to_path)
+
+
+async def remove_files(paths: Sequence[str]):
+    if not paths:
+        return
+
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    await _storage_call(bucket.remove, list(paths))
+
+
+async def create_upload_url(path: str) -> Dict[str, str]:
+    """Signed URL + token a client can upload `path` with, bypassing the API."""
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    return await _storage_call(
+        bucket.create_signed_upload_url,
+        path,
+        CreateSignedUploadUrlOptions(upsert="true"),
+    )
+
+
+async def create_upload_urls(paths: Sequence[str]) -> List[Dict[str, str]]:
+    return await asyncio.gather(*(create_upload_url(path) for path in paths))
+
+
+async def files_exist(paths: Sequence[str]) -> List[bool]:
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    return await asyncio.gather(*(_storage_call(bucket.exists, path) for path in paths))
+
+
+async def files_info(paths: Sequence[str]) -> List[Dict[str, Any]]:
+    """Stored metadata (size, content_type, ...) per path, without the bytes."""
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    return await asyncio.gather(*(_storage_call(bucket.info, path) for path in paths))
+
+
+async def read_heads(paths: Sequence[str], size: int) -> List[bytes]:
+    """The first `size` bytes of each object, by ranged GETs on signed URLs."""
+    supabase_client = await get_supabase_client()
+    bucket = supabase_client.storage.from_(SUPABASE_BUCKET)
+    signed = await _storage_call(bucket.create_signed_urls, list(paths), 60)
+    http_client = await get_http_client()
+
+    async def read(item) -> bytes:
+        if item["error"]:
+            raise ValueError(f"Could not sign {item['path']}: {item['error']}")
+        response = await http_client.get(
+            item["signedURL"], headers={"Range": f"bytes=0-{size - 1}"}
+        )
+        response.raise_for_status()
+        return response.content[:size]  # A server ignoring Range sends it all
+
+    return await asyncio.gather(*(_storage_call(read, item) for item in signed))
+
+
+async def download_files(paths: Sequence[str]) -> List[bytes]:
+    """Download concurrently, results in the order of `paths`."""
+    return await asyncio.gather(*(download_file(path) for path in paths))
+
+
+async def upload_files(files: Sequence[Tuple[str, bytes, str]]):
+    """Upload (path, data, content_type) triples concurrently."""
+    await asyncio.gather(*(upload_file(*file) for file in files))
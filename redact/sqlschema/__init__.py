@@ -1 +1,11 @@
-from .tables import Batch, BatchStatus, Files, FileStatus
+from .schemas import BatchRequest, LabelOptions, UploadRequest
+from .tables import (
+    Batch,
+    BatchStatus,
+    Files,
+    FileStatus,
+    Job,
+    JobStatus,
+    PageCache,
+    RedactMode,
+)
@@ -0,0 +1,35 @@
+from typing import List, Optional
+
+from pydantic import field_validator
+from sqlmodel import Field, SQLModel
+
+from redact.core.config import MAX_LABELS
+
+from .tables import RedactMode
+
+
+class UploadRequest(SQLModel):
+    filename: str = Field(min_length=1)
+
+
+class LabelOptions(SQLModel):
+    labels: Optional[List[str]] = Field(
+        default=None, min_length=1, max_length=MAX_LABELS
+    )  # Entity types to redact, None for the default set
+    threshold: Optional[float] = Field(default=None, ge=0, le=1)
+
+    @field_validator("labels")
+    @classmethod
+    def normalize_labels(cls, labels: Optional[List[str]]) -> Optional[List[str]]:
+        """Trimmed, lowercase, deduplicated and sorted, so equal sets share caches."""
+        if labels is None:
+            return None
+        labels = sorted({label.strip().lower() for label in labels})
+        if not all(0 < len(label) <= 100 for label in labels):
+            raise ValueError("labels must be 1-100 characters")
+        return labels
+
+
+class BatchRequest(LabelOptions):
+    files: List[UploadRequest] = Field(min_length=1)
+    redact_mode: RedactMode = RedactMode.solid
@@ -4,10 +4,11 @@ from typing import Any, Dict, List, Optional
 from uuid import UUID, uuid4
 
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlmodel import Column, Field, Relationship, SQLModel
+from sqlmodel import Column, Field, LargeBinary, Relationship, SQLModel
 
 
 class FileStatus(str, Enum):
+    awaiting_upload = "awaiting_upload"
     uploaded = "queued"
     processing = "processing"
     complete = "complete"
@@ -16,6 +17,7 @@ class FileStatus(str, Enum):
 
 
 class BatchStatus(str, Enum):
+    awaiting_upload = "awaiting_upload"  # Created, client uploading to storage
     uploaded = "queued"
     processing = "processing"
     completed = "complete"
@@ -23,12 +25,29 @@ class BatchStatus(str, Enum):
     failed = "failed"
 
 
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class RedactMode(str, Enum):
+    solid = "solid"
+    pixelate = "pixelate"
+    blur = "blur"
+
+
 class Files(SQLModel, table=True):
     file_id: UUID = Field(default_factory=uuid4, primary_key=True)
     batch_id: UUID = Field(foreign_key="batch.id")
     filename: str
-    json_data: Dict[str, Any] = Field(default=None, sa_column=Column(JSONB))
+    json_data: Dict[str, Any] = Field(default=None, sa_column=Column(JSONB))  # Legacy
+    ocr_data: Optional[bytes] = Field(
+        default=None, sa_column=Column(LargeBinary)
+    )  # Packed OCRResult
     redact_filename: Optional[str] = Field(default=None)
+    content_hash: Optional[str] = Field(default=None, index=True)  # sha256 of upload
     status: FileStatus = Field(default=FileStatus.uploaded)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -37,7 +56,38 @@ class Files(SQLModel, table=True):
 
 class Batch(SQLModel, table=True):
     id: Optional[UUID] = Field(default_factory=uuid4, primary_key=True)
-    status: FileStatus = Field(default=BatchStatus.uploaded)
+    status: BatchStatus = Field(default=BatchStatus.uploaded)
+    redact_mode: RedactMode = Field(default=RedactMode.solid)
+    labels: Optional[List[str]] = Field(
+        default=None, sa_column=Column(JSONB)
+    )  # None for the default label set
+    threshold: Optional[float] = Field(default=None)  # None for the model's default
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     files: List[Files] = Relationship(back_populates="batch")
+
+
+class PageCache(SQLModel, table=True):
+    key: str = Field(primary_key=True)  # Content hash + model version + label set
+    content_hash: str = Field(index=True)
+    model_version: str
+    ocr_data: bytes = Field(sa_column=Column(LargeBinary))
+    redact_path: str  # Cached redacted object in storage
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class Job(SQLModel, table=True):
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    batch_id: UUID = Field(foreign_key="batch.id", index=True)
+    pages: int = Field(default=1)
+    status: JobStatus = Field(default=JobStatus.queued, index=True)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    available_at: datetime = Field(
+        default_factory=datetime.utcnow, index=True
+    )  # Not claimable before, used for retry backoff
+    lease_expires_at: Optional[datetime] = Field(default=None)  # While running
+    locked_by: Optional[str] = Field(default=None)
+    last_error: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1 +0,0 @@
-from redact.workers import inference
@@ -0,0 +1,117 @@
+# cache.py
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+import numpy as np
+
+Image = Union[bytes, np.ndarray]
+
+
+def _size(value: Image) -> int:
+    return value.nbytes if isinstance(value, np.ndarray) else len(value)
+
+
+class ImageCache:
+    """
+    Per-batch image store keyed by file_id.
+
+    Holds raw bytes or decoded arrays in memory up to `max_bytes`, past that the
+    least recently used entries are spilled to a temp dir and read back on demand.
+    """
+
+    def __init__(self, max_bytes: int, spill_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.mem_bytes = 0
+        self._memory: "OrderedDict[str, Image]" = OrderedDict()
+        self._spilled = {}  # key -> path on disk
+        self._dir = tempfile.mkdtemp(prefix="redact-cache-", dir=spill_dir)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._memory or key in self._spilled
+
+    def __len__(self) -> int:
+        return len(self._memory) + len(self._spilled)
+
+    def put(self, key: str, value: Image):
+        with self._lock:
+            self._discard(key)
+            self._store(key, value)
+
+    def get(self, key: str) -> Image:
+        """Return the entry, reading it back from disk if it was spilled."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+            path = self._spilled.pop(key)  # KeyError if never stored
+            value = self._load(path)
+            os.remove(path)
+            self._store(key, value)
+            return value
+
+    def pop(self, key: str) -> Image:
+        """Return the entry and drop it from the cache."""
+        with self._lock:
+            if key in self._memory:
+                value = self._memory.pop(key)
+                self.mem_bytes -= _size(value)
+                return value
+
+            path = self._spilled.pop(key)
+            value = self._load(path)
+            os.remove(path)
+            return value
+
+    def close(self):
+        with self._lock:
+            self._memory.clear()
+            self._spilled.clear()
+            self.mem_bytes = 0
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _store(self, key: str, value: Image):
+        self._memory[key] = value
+        self.mem_bytes += _size(value)
+        self._evict()
+
+    def _discard(self, key: str):
+        if key in self._memory:
+            self.mem_bytes -= _size(self._memory.pop(key))
+        if key in self._spilled:
+            os.remove(self._spilled.pop(key))
+
+    def _evict(self):
+        # Always keep the newest entry in memory, even if it alone is over budget
+        while self.mem_bytes > self.max_bytes and len(self._memory) > 1:
+            key, value = self._memory.popitem(last=False)
+            self.mem_bytes -= _size(value)
+            self._spilled[key] = self._dump(key, value)
+
+    def _dump(self, key: str, value: Image) -> str:
+        if isinstance(value, np.ndarray):
+            path = os.path.join(self._dir, f"{key}.npy")
+            np.save(path, value, allow_pickle=False)
+        else:
+            path = os.path.join(self._dir, f"{key}.bin")
+            with open(path, "wb") as f:
+                f.write(value)
+        return path
+
+    @staticmethod
+    def _load(path: str) -> Image:
+        if path.endswith(".npy"):
+            return np.load(path, allow_pickle=False)
+        with open(path, "rb") as f:
+            return f.read()
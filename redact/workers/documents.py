@@ -0,0 +1,92 @@
+# documents.py
+# Multi-page inputs (PDF, TIFF), rasterized one page at a time with PyMuPDF.
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import fitz
+import numpy as np
+
+from redact.services.ocrdata import OCRResult
+
+DOCUMENT_EXTENSIONS = {".pdf": "pdf", ".tif": "tiff", ".tiff": "tiff"}
+TEXT_LAYER_MAX_IMAGE_AREA = 0.5  # Past this much picture, a text layer may miss text
+
+_lock = threading.Lock()  # MuPDF is not thread safe, one call at a time per process
+
+
+def is_document(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in DOCUMENT_EXTENSIONS
+
+
+def open_document(data: bytes, filename: str) -> fitz.Document:
+    filetype = DOCUMENT_EXTENSIONS[os.path.splitext(filename)[1].lower()]
+    with _lock:
+        return fitz.open(stream=data, filetype=filetype)
+
+
+def page_count(document: fitz.Document) -> int:
+    with _lock:
+        return document.page_count
+
+
+def close_document(document: fitz.Document):
+    with _lock:
+        document.close()
+
+
+def _image_area(page: fitz.Page) -> float:
+    """Fraction of the page covered by its largest embedded image."""
+    area = page.rect.width * page.rect.height
+    boxes = [fitz.Rect(info["bbox"]) & page.rect for info in page.get_image_info()]
+    return max((box.width * box.height / area for box in boxes), default=0.0)
+
+
+def _text_layer(page: fitz.Page, zoom: float) -> Optional[OCRResult]:
+    """
+    The page's embedded words in raster pixel coordinates, None if OCR is needed.
+
+    Pages without text, or mostly covered by an image (scans, photos of
+    documents), go to Tesseract: text drawn inside pictures isn't in the layer.
+    """
+    words = page.get_text("words", sort=True)
+    if not words or _image_area(page) > TEXT_LAYER_MAX_IMAGE_AREA:
+        return None
+
+    # Extracted boxes ignore /Rotate, the raster doesn't
+    matrix = page.rotation_matrix * fitz.Matrix(zoom, zoom)
+    boxes = [fitz.Rect(word[:4]) * matrix for word in words]
+    return OCRResult.from_columns(
+        [word[4] for word in words],
+        [round(box.x0) for box in boxes],
+        [round(box.y0) for box in boxes],
+        [max(round(box.width), 1) for box in boxes],
+        [max(round(box.height), 1) for box in boxes],
+        [100.0] * len(words),
+    )
+
+
+def render_page(
+    document: fitz.Document, index: int, dpi: int
+) -> Tuple[np.ndarray, Optional[OCRResult]]:
+    """One page as a BGR image at `dpi`, and its text layer when it can skip OCR."""
+    with _lock:
+        page = document.load_page(index)
+        pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+        text = _text_layer(page, dpi / 72)
+
+    rgb = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(
+        pixmap.height, pixmap.width, pixmap.n
+    )
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), text  # A copy, pixmap can go
+
+
+def build_pdf(pages: List[Tuple[bytes, int, int]], dpi: int) -> bytes:
+    """A PDF of (encoded image, width, height) pages, sized as printed at `dpi`."""
+    with _lock:
+        output = fitz.open()
+        for image, width, height in pages:
+            page = output.new_page(width=width * 72 / dpi, height=height * 72 / dpi)
+            page.insert_image(page.rect, stream=image)
+        return output.tobytes(garbage=3, deflate=True)
@@ -0,0 +1,118 @@
+# export.py
+# Run `python -m redact.workers.export` to build the ONNX model ahead of time.
+# Like the worker, torch and GLiNER are only imported when a model is built.
+import hashlib
+import os
+
+from redact.core.config import NER_MODEL_NAME, ONNX_MODEL_DIR, ONNX_QUANTIZE
+from redact.workers.worker import MANIFEST, fetch_weights
+
+ONNX_FILE = "model.onnx"
+QUANTIZED_FILE = "model_quantized.onnx"
+SOURCE_FILE = "source.sha256"  # Digest of the weight manifest it was built from
+
+
+def onnx_dir(model_name: str) -> str:
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "--"))
+
+
+def _source_digest(weights: str) -> str:
+    with open(os.path.join(weights, MANIFEST), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _read_source(path: str):
+    try:
+        with open(os.path.join(path, SOURCE_FILE)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def export_onnx(model_name: str, quantize: bool = ONNX_QUANTIZE) -> str:
+    """
+    Export `model_name` to ONNX (int8 dynamic quantization unless disabled).
+
+    Built from the checksummed snapshot `fetch_weights` keeps, the same
+    weights the torch backend loads. The directory also gets the GLiNER
+    config and tokenizer, so it loads with
+    `GLiNER.from_pretrained(path, load_onnx_model=True, ...)`. An export is
+    reused until the snapshot changes. Returns the export directory.
+    """
+    weights = fetch_weights(model_name)
+    source = _source_digest(weights)
+    path = onnx_dir(model_name)
+    onnx_path = os.path.join(path, ONNX_FILE)
+    quantized_path = os.path.join(path, QUANTIZED_FILE)
+    if (
+        os.path.exists(quantized_path if quantize else onnx_path)
+        and _read_source(path) == source
+    ):
+        return path
+
+    import torch
+    from gliner import GLiNER
+
+    os.makedirs(path, exist_ok=True)
+    model = GLiNER.from_pretrained(weights, local_files_only=True).to("cpu").eval()
+    model.save_pretrained(path)
+    model.data_processor.transformer_tokenizer.save_pretrained(path)
+
+    # Trace with a sample input; every axis that varies per call is dynamic
+    inputs, _ = model.prepare_model_inputs(
+        ["Jane Doe emailed jane@example.com on 4 May."], ["person", "email", "date"]
+    )
+    names = ["input_ids", "attention_mask", "words_mask", "text_lengths"]
+    dynamic_axes = {
+        "input_ids": {0: "batch_size", 1: "sequence_length"},
+        "attention_mask": {0: "batch_size", 1: "sequence_length"},
+        "words_mask": {0: "batch_size", 1: "sequence_length"},
+        "text_lengths": {0: "batch_size", 1: "value"},
+        "logits": {
+            0: "position",
+            1: "batch_size",
+            2: "sequence_length",
+            3: "num_classes",
+        },
+    }
+    if model.config.span_mode != "token_level":
+        names += ["span_idx", "span_mask"]
+        dynamic_axes["span_idx"] = {0: "batch_size", 1: "num_spans", 2: "idx"}
+        dynamic_axes["span_mask"] = {0: "batch_size", 1: "num_spans"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model.model,
+            tuple(inputs[name] for name in names),
+            f=onnx_path,
+            input_names=names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QUInt8)
+
+    with open(os.path.join(path, SOURCE_FILE), "w") as f:
+        f.write(source)  # Last, so a half-finished export is never reused
+    print(f"Exported {model_name} to {path}")
+    return path
+
+
+def load_onnx_model(model_name: str, quantize: bool = ONNX_QUANTIZE):
+    """GLiNER running on ONNX Runtime, with the same predict methods."""
+    from gliner import GLiNER
+
+    return GLiNER.from_pretrained(
+        export_onnx(model_name, quantize),
+        load_onnx_model=True,
+        load_tokenizer=True,
+        onnx_model_file=QUANTIZED_FILE if quantize else ONNX_FILE,
+    )
+
+
+if __name__ == "__main__":
+    export_onnx(NER_MODEL_NAME)
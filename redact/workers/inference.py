@@ -1,23 +1,97 @@
 import asyncio
-import json
+import multiprocessing
 import os
 import sys
 import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from typing import Any, Dict, List, Optional, Set, Tuple
 from uuid import UUID
 
 # sys.path.append("/home/fw7th/.pyenv/versions/mlenv/lib/python3.10/site-packages/") local dev hack
 import cv2
 import numpy as np
-import pytesseract
-from sqlmodel import select
 
-from redact.core.config import SUPABASE_BUCKET, get_supabase_client
+from redact.core.config import (
+    DOCUMENT_DPI,
+    DOWNLOAD_CONCURRENCY,
+    IMAGE_CACHE_BYTES,
+    IMAGE_CACHE_DIR,
+    LABEL_CACHE_SIZE,
+    METRICS_INSTANCE,
+    METRICS_JOB,
+    METRICS_PUSHGATEWAY,
+    NER_BATCH_SIZE,
+    NER_STRIDE,
+    NER_WINDOW,
+    OCR_CONCURRENCY,
+    OCR_TILE_OVERLAP,
+    OCR_TILE_PIXELS,
+    OCR_TILE_SIZE,
+    PAGE_CACHE_ENABLED,
+    PIPELINE_QUEUE_SIZE,
+    PREPROCESS_CONCURRENCY,
+    REDACT_CONCURRENCY,
+    RULES_ENABLED,
+    RULES_SKIP_MODEL,
+    SCHEDULER_MAX_PAGES,
+    SCHEDULER_MAX_WAIT_MS,
+    TESSDATA_PREFIX,
+    TESSERACT_LANG,
+)
 from redact.core.database import AsyncSessionLocal
-from redact.services.storage import get_file_id_by_batch, update_batch_status_async
-from redact.sqlschema.tables import Files, FileStatus
-from redact.workers.worker import predict_entities
-
-labels = [
+from redact.core.metrics import IN_FLIGHT, QUEUE_DEPTH, push_metrics, timed
+from redact.services.ocrdata import OCRResult, pack_pages, unpack_pages
+from redact.services.pagecache import (
+    cache_key,
+    cache_path,
+    evict_cached_pages,
+    hash_content,
+    lookup_cached_pages,
+    store_cached_pages,
+)
+from redact.services.storage import (
+    copy_file,
+    download_file,
+    get_files_for_batches,
+    update_batch_status_async,
+    update_files_bulk,
+    upload_file,
+)
+from redact.sqlschema.tables import Batch, BatchStatus, Files, FileStatus, RedactMode
+from redact.workers.cache import ImageCache
+from redact.workers.documents import (
+    build_pdf,
+    close_document,
+    is_document,
+    open_document,
+    page_count,
+    render_page,
+)
+from redact.workers.ocr import (
+    init_worker,
+    merge_tiles,
+    ocr_image,
+    ocr_tile,
+    preprocess_ocr,
+    tile_grid,
+)
+from redact.workers.render import entity_boxes, render_redactions
+from redact.workers.rules import RULES_VERSION, STRUCTURED_LABELS, RuleEngine
+from redact.workers.scheduler import MicroBatcher
+from redact.workers.text import boundaries, join_words, span_words, window_words
+from redact.workers.worker import (
+    MODEL_VERSION,
+    THRESHOLD,
+    batch_predict_entities,
+    get_max_len,
+    set_threads,
+)
+
+DEFAULT_LABELS = (  # Used when a batch doesn't pick its own
     "person",
     "credit card number",
     "email",
@@ -27,256 +101,777 @@ labels = [
     "date",
     "social security number, health insurance",
     "location",
-]
+)
+
+# Everything that changes a page's entities, for the page cache
+PIPELINE_VERSION = MODEL_VERSION
+if RULES_ENABLED:
+    PIPELINE_VERSION += f"+rules{RULES_VERSION}" + ("-skip" if RULES_SKIP_MODEL else "")
+
+_DONE = object()  # Queue sentinel, marks the end of a stage's input
+
+
+class StageQueue(asyncio.Queue):
+    """A bounded queue in front of a stage, its depth kept in a gauge."""
+
+    def __init__(self, stage: str, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.depth = QUEUE_DEPTH.labels(stage)
+
+    def _put(self, item):
+        super()._put(item)
+        if item is not _DONE:
+            self.depth.inc()
 
+    def _get(self):
+        item = super()._get()
+        if item is not _DONE:
+            self.depth.dec()
+        return item
 
-async def NER(batch_id: UUID):
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_workers = OCR_CONCURRENCY
+_batcher: Optional[MicroBatcher] = None
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def label_plan(label_set: Tuple[str, ...]) -> Tuple[RuleEngine, Tuple[str, ...]]:
     """
-    Perform NER with the loaded model.
+    The rule engine and the model's labels for a label set.
+
+    Structured labels go to the rule engine; with RULES_SKIP_MODEL the model
+    doesn't see them, and isn't run at all if nothing else is asked for.
     """
-    async with AsyncSessionLocal() as session:
-        file_ids = await get_file_id_by_batch(batch_id, session)
-        for file_id in file_ids:
-            str_uuid = str(file_id)
+    rules = RuleEngine(label_set if RULES_ENABLED else [])
+    model_labels = tuple(
+        label
+        for label in label_set
+        if not (RULES_ENABLED and RULES_SKIP_MODEL and label in STRUCTURED_LABELS)
+    )
+    return rules, model_labels
 
-            try:
-                result = await session.execute(
-                    select(Files.json_data).where(Files.file_id == str_uuid)
-                )
 
-                data = result.scalars().one()
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """Get or create the OCR process pool, kept warm across batches."""
+    global _ocr_pool
 
-                # Join full text
-                full_text = " ".join(result["text"] for result in data["ocr"])
+    if _ocr_pool is None:
+        # spawn, not fork: the parent holds the model and CUDA state
+        _ocr_pool = ProcessPoolExecutor(
+            max_workers=_ocr_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(TESSERACT_LANG, TESSDATA_PREFIX),
+        )
 
-                try:
-                    entities = await asyncio.to_thread(
-                        predict_entities, full_text, labels
-                    )  # Perform NER w/ GLiNER
+    return _ocr_pool
 
-                    # Build fast lookup dict: word -> label
-                    entity_map = {}
-                    for entity in entities:
-                        for token in entity["text"].split(" "):
-                            entity_map[token] = entity["label"]
 
-                    # Update OCR records using 0(1) lookup
-                    for item in data["ocr"]:
-                        txt = item["text"]
-                        if txt in entity_map:
-                            item["entity"] = entity_map[txt]
+def claim_cpu_share(processes: int):
+    """Size this process's OCR pool and torch threads as one of `processes` on the node."""
+    global _ocr_workers
 
-                    # Update the DB to store the JSON
-                except Exception as e:
-                    print(f"Error performing NER on images. {e}")
+    cores = os.cpu_count() or 1
+    _ocr_workers = max(OCR_CONCURRENCY // processes, 1)
+    set_threads(cores // processes)
 
-                json_table = await session.get(Files, str_uuid)
-                if not json_table:
-                    raise ValueError(f"Document {str_uuid} not found.")
 
-                json_table.json_data = data
-                session.add(json_table)
-                await session.commit()
-                await session.refresh(json_table)
+@dataclass
+class Page:
+    """A single file moving through the pipeline."""
 
-            except json.JSONDecodeError:
-                print(f"Error: Could not decode JSON from the file '{file_id}'.")
-            except Exception as e:
-                print(f"An unexpected error occurred: {e}")
+    file_id: str
+    filename: str
+    content_hash: Optional[str] = None
+    batch_id: Optional[UUID] = None
+    redact_mode: RedactMode = RedactMode.solid
+    labels: Tuple[str, ...] = DEFAULT_LABELS
+    threshold: float = THRESHOLD
+    cache_key: Optional[str] = None
+    buffer: Optional[bytes] = None
+    ocr_input: Optional[np.ndarray] = None  # Preprocessed for Tesseract
+    ocr_scale: float = 1.0  # ocr_input size / original size
+    result: Optional[OCRResult] = None
+    redact_filename: Optional[str] = None
+    index: int = 0  # Page number within a PDF/TIFF
+    document: Optional["Document"] = None  # Set on each page of a PDF/TIFF
+    image: Optional[np.ndarray] = None  # Rasterized document page
+    pages: Optional[List[OCRResult]] = None  # A PDF/TIFF file's per-page results
 
+    @property
+    def key(self) -> str:
+        """Image cache key, unique per page of a document."""
+        return self.file_id if self.document is None else f"{self.file_id}:{self.index}"
 
-async def redact(batch_id):
-    async with AsyncSessionLocal() as session:
-        file_ids = await get_file_id_by_batch(batch_id, session)
-        for file_id in file_ids:
-            str_uuid = str(file_id)
+    def ocr_bytes(self) -> bytes:
+        return (
+            pack_pages(self.pages) if self.pages is not None else self.result.to_bytes()
+        )
 
-            result = await session.execute(
-                select(Files.filename, Files.json_data).where(Files.file_id == str_uuid)
-            )
-            row = result.first()
-            image, data = row  # return (image_name, json) from query
 
-            image_name, old_extension = os.path.splitext(
-                image
-            )  # Get image name w/o extension
+@dataclass
+class Document:
+    """A PDF/TIFF file whose pages go through the pipeline one by one."""
+
+    file: Page
+    page_count: int
+    results: Dict[int, OCRResult] = field(default_factory=dict)  # Redacted so far
+    sizes: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+
+    def output_key(self, index: int) -> str:
+        return f"{self.file.file_id}:{index}:redacted"
+
+
+def ner_windows(result: OCRResult) -> List[Tuple[int, int]]:
+    """Overlapping word ranges for NER, breaking at sentence and line ends."""
+    window = NER_WINDOW or get_max_len()
+    stride = NER_STRIDE or max(window * 3 // 4, 1)
+    words = result.texts
+    return window_words(words, window, stride, boundaries(words, result.x.tolist()))
+
+
+def tag_entities(pages: List[Page]):
+    """
+    Perform NER with the rule engine and the loaded model, batching the text
+    of every page together.
+
+    Each page is checked for its batch's labels, at its batch's threshold.
+    Rules read each page in one pass; the model reads it in overlapping
+    windows, so nothing past its max length goes unchecked. Entities are
+    placed by their character span, so only the words they were found at are
+    tagged; the same span found twice counts once, at its best score.
+    """
+    spans = {}  # (page index, first word, end word) -> (score, label)
+    # (model labels, threshold) -> texts, and (page index, first word, word
+    # offsets) for each text
+    groups = defaultdict(lambda: ([], []))
+
+    def add(idx: int, first: int, starts: List[int], entities: List[dict]):
+        for entity in entities:
+            words = span_words(starts, entity["start"], entity["end"])
+            if not words:
+                continue
+            key = (idx, first + words.start, first + words.stop)
+            found = (entity.get("score", 0.0), entity["label"])
+            spans[key] = max(spans.get(key, found), found)
+
+    for idx, page in enumerate(pages):
+        rules, model_labels = label_plan(page.labels)
+        words = page.result.texts
+        text, starts = join_words(words)
+        add(idx, 0, starts, rules.find(text))
+
+        if not model_labels:
+            continue
+        for start, end in ner_windows(page.result):
+            text, starts = join_words(words[start:end])
+            texts, chunks = groups[(model_labels, page.threshold)]
+            texts.append(text)
+            chunks.append((idx, start, starts))
+
+    # Forward passes only mix texts that share a label set and threshold
+    for (model_labels, threshold), (texts, chunks) in groups.items():
+        all_entities = batch_predict_entities(
+            texts, list(model_labels), NER_BATCH_SIZE, threshold
+        )
+        for (idx, first, starts), entities in zip(chunks, all_entities):
+            add(idx, first, starts, entities)
+
+    # Lowest score first, so a word in two overlapping spans keeps the surer label
+    for (idx, start, stop), (_, label) in sorted(spans.items(), key=lambda s: s[1]):
+        pages[idx].result.set_entity(slice(start, stop), label)
+
+
+def encode_image(image, extension):
+    encode_param = [
+        int(cv2.IMWRITE_JPEG_QUALITY),
+        95,
+    ]  # Set JPEG quality to 95
+    success, encoded_buffer = cv2.imencode(
+        f"{extension}", image, encode_param
+    )  # Decode image back to jpeg
+
+    if not success:
+        raise Exception("Could not encode image buffer")
+
+    return encoded_buffer.tobytes()
+
+
+def decode_and_preprocess(page: Page, cache: ImageCache):
+    if page.image is not None:  # Already rasterized from a document
+        image, page.image = page.image, None
+    else:
+        with timed("decode"):
+            nparr = np.frombuffer(
+                page.buffer, np.uint8
+            )  # Conv supabase buffer to np array
+            image = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
+        page.buffer = None
+
+    if page.result is None:  # Pages with a text layer already have their words
+        with timed("preprocess"):
+            page.ocr_input, page.ocr_scale = preprocess_ocr(image)
+
+    # Hold the decoded original for the redact stage, spilled to disk if over budget
+    cache.put(page.key, image)
 
-            document_path = f"uploads/{image}"  # Path to uploaded images
 
-            supabase_client = await get_supabase_client()
-            supabase_buffer = await supabase_client.storage.from_(
-                SUPABASE_BUCKET
-            ).download(
-                path=document_path,
+def redact_and_encode(page: Page, cache: ImageCache, extension: str, mode: RedactMode):
+    image = cache.pop(page.key)  # Owned by this stage now, redact in place
+    with timed("redact"):
+        boxes = entity_boxes(page.result)
+        render_redactions(image, boxes, mode)
+        return encode_image(image, extension)
+
+
+def redact_document_page(page: Page, cache: ImageCache):
+    """Redact one document page, kept as a JPEG until the PDF is assembled."""
+    document = page.document
+    image = cache.pop(page.key)
+    with timed("redact"):
+        render_redactions(image, entity_boxes(page.result), page.redact_mode)
+        encoded = encode_image(image, ".jpg")
+    cache.put(document.output_key(page.index), encoded)
+    document.sizes[page.index] = (image.shape[1], image.shape[0])
+
+
+def assemble_document(document: Document, cache: ImageCache) -> bytes:
+    pages = [
+        (cache.pop(document.output_key(index)), *document.sizes[index])
+        for index in range(document.page_count)
+    ]
+    with timed("assemble", document.page_count):
+        return build_pdf(pages, DOCUMENT_DPI)
+
+
+async def download_stage(page: Page):
+    # Runs DOWNLOAD_CONCURRENCY wide, prefetching while earlier pages are in OCR
+    with timed("download"):
+        page.buffer = await download_file(f"uploads/{page.filename}")
+
+    # Uploads share a path per filename: another batch may have replaced the
+    # object since ingest. Those bytes aren't this batch's to redact, return
+    # or cache under this batch's hash.
+    if page.content_hash:
+        digest = await asyncio.to_thread(hash_content, page.buffer)
+        if digest != page.content_hash:
+            raise ValueError(f"uploads/{page.filename} changed since it was uploaded")
+    return page
+
+
+async def rasterize_stage(page: Page):
+    """
+    Pass images through; yield a PDF/TIFF's pages one at a time.
+
+    Each page is rendered only when the next stage has room for it, so a long
+    document holds at most a queue's worth of pages in memory. Pages with a
+    usable text layer carry its words and skip OCR.
+    """
+    if not is_document(page.filename):
+        yield page
+        return
+
+    source = await asyncio.to_thread(open_document, page.buffer, page.filename)
+    page.buffer = None
+    try:
+        count = page_count(source)
+        if count == 0:
+            raise ValueError(f"{page.filename} has no pages")
+
+        document = Document(page, count)
+        for index in range(count):
+            with timed("rasterize"):
+                image, text = await asyncio.to_thread(
+                    render_page, source, index, DOCUMENT_DPI
+                )
+            yield Page(
+                page.file_id,
+                page.filename,
+                page.content_hash,
+                page.batch_id,
+                page.redact_mode,
+                page.labels,
+                page.threshold,
+                result=text,
+                index=index,
+                document=document,
+                image=image,
             )
+    finally:
+        close_document(source)
 
-            nparr = np.frombuffer(supabase_buffer, np.uint8)
-            cv_image = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
-            copied_image = cv_image.copy()
-            try:
-                for item in data["ocr"]:
-                    if item["entity"] is not None:
-                        redact_area = [
-                            [bbox_num // 3 for bbox_num in inner_list]
-                            for inner_list in item["bbox"]
-                        ]  # Scale image bbox back to original value
-                        top_left = redact_area[0]
-                        bottom_right = redact_area[1]
-                        color = (0, 0, 0)  # Black color
-                        thickness = -1  # Filled rectangle
-
-                        cv2.rectangle(
-                            copied_image, top_left, bottom_right, color, thickness
-                        )
-                    else:
-                        pass
-
-                redact_image_name = f"{image_name}_redacted{old_extension}"
-
-                encode_param = [
-                    int(cv2.IMWRITE_JPEG_QUALITY),
-                    95,
-                ]  # Set JPEG quality to 95
-                success, encoded_buffer = cv2.imencode(
-                    f"{old_extension}", copied_image, encode_param
-                )  # Decode image back to jpeg
-
-                if not success:
-                    raise Exception("Could not encode image buffer")
-
-                image_bytes = encoded_buffer.tobytes()
-
-                try:
-                    save_path = f"redacted/{redact_image_name}"
-
-                    supabase_client = await get_supabase_client()
-                    await supabase_client.storage.from_(SUPABASE_BUCKET).upload(
-                        path=save_path,
-                        file=image_bytes,
-                        file_options={
-                            "content-type": "image/jpeg",
-                            "upsert": "true",
-                        },
-                    )
-
-                except Exception as e:
-                    print(f"Redacted image could not be saved: {e}")
 
-            except Exception as e:
-                print(f"Could not resolve file name. Error: {e}")
+async def preprocess_stage(page: Page, cache: ImageCache):
+    await asyncio.to_thread(decode_and_preprocess, page, cache)
+    return page
+
+
+async def ocr_tiled(image: np.ndarray, scale: float) -> OCRResult:
+    """OCR a large page as overlapping tiles, spread over the whole OCR pool."""
+    loop = asyncio.get_running_loop()
+    pool = get_ocr_pool()
+    height, width = image.shape[:2]
+
+    futures = []
+    for tile in tile_grid(height, width, OCR_TILE_SIZE, OCR_TILE_OVERLAP):
+        x0, y0, x1, y1 = tile[0]
+        futures.append(loop.run_in_executor(pool, ocr_tile, image[y0:y1, x0:x1], tile))
+
+    return merge_tiles(await asyncio.gather(*futures), scale)
+
+
+async def ocr_stage(page: Page):
+    global _ocr_pool
+
+    if page.result is not None:  # Text layer, nothing to read
+        return page
+
+    loop = asyncio.get_running_loop()
+    try:
+        with timed("ocr"):
+            if page.ocr_input.size > OCR_TILE_PIXELS and _ocr_workers > 1:
+                # One Tesseract call per page would leave the other cores idle
+                page.result = await ocr_tiled(page.ocr_input, page.ocr_scale)
+            else:
+                page.result = await loop.run_in_executor(
+                    get_ocr_pool(), ocr_image, page.ocr_input, page.ocr_scale
+                )
+    except BrokenProcessPool:
+        _ocr_pool = None  # A worker died, start a fresh pool for the next page
+        raise
 
-            json_table = await session.get(Files, str_uuid)
-            if not json_table:
-                raise ValueError(f"Document {str_uuid} not found.")
+    page.ocr_input = None
+    return page
 
-            json_table.redact_filename = redact_image_name
-            session.add(json_table)
-            await session.commit()
-            await session.refresh(json_table)
 
+async def ner_stage(pages: List[Page]):
+    with timed("ner", len(pages)):
+        await asyncio.to_thread(tag_entities, pages)
+    return pages
 
-def preprocess_ocr(buffer):
-    # Read image
-    img = cv2.imdecode(buffer, cv2.IMREAD_UNCHANGED)
 
-    # 1. Optional: scale image (helps Tesseract)
-    sized = cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+def redacted_name(filename: str) -> str:
+    image_name, extension = os.path.splitext(filename)  # Get image name w/o extension
+    if is_document(filename):
+        extension = ".pdf"  # TIFFs come back as PDFs too
+    return f"{image_name}_redacted{extension}"
 
-    # 2. Grayscale
-    gray = cv2.cvtColor(sized, cv2.COLOR_BGR2GRAY)
 
-    # 3. Noise reduction (Gaussian blur)
-    denoised = cv2.GaussianBlur(gray, (5, 5), 0)
+async def redact_document_stage(page: Page, cache: ImageCache):
+    """Redact a document page; whichever page finishes last uploads the PDF."""
+    document = page.document
+    await asyncio.to_thread(redact_document_page, page, cache)
+    document.results[page.index] = page.result
+    if len(document.results) < document.page_count:
+        return page
 
-    # 4. Adaptive threshold (handles uneven lighting)
-    thresh = cv2.adaptiveThreshold(
-        denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 13, 7
+    pdf_bytes = await asyncio.to_thread(assemble_document, document, cache)
+    file = document.file
+    redact_name = redacted_name(file.filename)
+    with timed("upload"):
+        await upload_file(f"redacted/{redact_name}", pdf_bytes, "application/pdf")
+    file.pages = [document.results[index] for index in range(document.page_count)]
+    file.redact_filename = redact_name
+    return page
+
+
+async def redact_stage(page: Page, cache: ImageCache):
+    if page.document is not None:
+        return await redact_document_stage(page, cache)
+
+    old_extension = os.path.splitext(page.filename)[1]
+
+    image_bytes = await asyncio.to_thread(
+        redact_and_encode, page, cache, old_extension, page.redact_mode
     )
 
-    return thresh
+    redact_image_name = redacted_name(page.filename)
+    with timed("upload"):
+        await upload_file(f"redacted/{redact_image_name}", image_bytes, "image/jpeg")
+    page.redact_filename = redact_image_name
+    return page
+
+
+def result_row(page: Page, failed: bool) -> Dict[str, Any]:
+    """Column values to write back for a page, keyed by file_id."""
+    if failed:
+        return {"file_id": UUID(page.file_id), "status": FileStatus.failed}
+
+    return {
+        "file_id": UUID(page.file_id),
+        "ocr_data": page.ocr_bytes(),
+        "redact_filename": page.redact_filename,
+        "status": FileStatus.complete,
+    }
+
+
+async def run_stage(
+    name: str,
+    handler,
+    inbox: asyncio.Queue,
+    outbox: Optional[asyncio.Queue],
+    failed: List[str],
+    concurrency: int = 1,
+    batch_size: int = 0,
+    expand: bool = False,
+):
+    """
+    Pull items from `inbox` through `handler` into `outbox` with `concurrency` workers.
+
+    With a `batch_size` the handler receives a list of up to that many ready items.
+    With `expand` the handler is an async generator, each item it yields is
+    passed on as soon as the outbox has room.
+    A failing item is recorded in `failed` and dropped from the pipeline.
+    """
+    in_flight = IN_FLIGHT.labels(name)
+
+    async def work():
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                await inbox.put(_DONE)  # Let sibling workers see it too
+                return
+
+            items = [item]
+            while batch_size and len(items) < batch_size and not inbox.empty():
+                item = inbox.get_nowait()
+                if item is _DONE:
+                    await inbox.put(_DONE)
+                    break
+                items.append(item)
+
+            in_flight.inc(len(items))
+            try:
+                if expand:
+                    async for page in handler(items[0]):
+                        await outbox.put(page)
+                    continue
+                result = await handler(items if batch_size else items[0])
+            except Exception as e:
+                print(f"Error in {name} stage: {e}")
+                failed.extend(page.file_id for page in items)
+                continue
+            finally:
+                in_flight.dec(len(items))
+
+            if outbox is not None:
+                for page in result if batch_size else [result]:
+                    await outbox.put(page)
 
+    await asyncio.gather(*(work() for _ in range(max(concurrency, 1))))
+    if outbox is not None:
+        await outbox.put(_DONE)
 
-async def document_ocr(batch_id: UUID):
-    async with AsyncSessionLocal() as session:
-        file_ids = await get_file_id_by_batch(batch_id, session)
-        for file_id in file_ids:
-            str_uuid = str(file_id)
 
-            result = await session.execute(
-                select(Files.filename).where(Files.file_id == str_uuid)
+async def run_pipeline(pages: List[Page]) -> List[str]:
+    """
+    Stream pages through download -> rasterize -> preprocess -> OCR -> NER -> redact.
+
+    Every stage runs at the same time, connected by bounded queues; PDF/TIFF
+    files become one item per page at the rasterize stage. Returns the
+    file_ids of pages that failed.
+    """
+    queues = [
+        StageQueue(stage, PIPELINE_QUEUE_SIZE)
+        for stage in ("download", "rasterize", "preprocess", "ocr", "ner", "redact")
+    ]
+    failed: List[str] = []
+
+    async def feed():
+        for page in pages:
+            await queues[0].put(page)
+        await queues[0].put(_DONE)
+
+    with ImageCache(IMAGE_CACHE_BYTES, IMAGE_CACHE_DIR) as cache:
+        await asyncio.gather(
+            feed(),
+            run_stage(
+                "download",
+                download_stage,
+                queues[0],
+                queues[1],
+                failed,
+                DOWNLOAD_CONCURRENCY,
+            ),
+            run_stage(
+                "rasterize",
+                rasterize_stage,
+                queues[1],
+                queues[2],
+                failed,
+                PREPROCESS_CONCURRENCY,
+                expand=True,
+            ),
+            run_stage(
+                "preprocess",
+                partial(preprocess_stage, cache=cache),
+                queues[2],
+                queues[3],
+                failed,
+                PREPROCESS_CONCURRENCY,
+            ),
+            run_stage("ocr", ocr_stage, queues[3], queues[4], failed, OCR_CONCURRENCY),
+            run_stage(
+                "ner",
+                ner_stage,
+                queues[4],
+                queues[5],
+                failed,
+                batch_size=NER_BATCH_SIZE,
+            ),
+            run_stage(
+                "redact",
+                partial(redact_stage, cache=cache),
+                queues[5],
+                None,
+                failed,
+                REDACT_CONCURRENCY,
+            ),
+        )
+
+    return failed
+
+
+async def restore_cached_pages(pages: List[Page]) -> List[Page]:
+    """
+    Serve pages seen before straight from the page cache.
+
+    Hits get their stored OCR + entities and a copy of the cached redacted
+    object, skipping Tesseract and GLiNER. Returns the pages still to process.
+    """
+    for page in pages:
+        if page.content_hash:
+            page.cache_key = cache_key(
+                page.content_hash,
+                PIPELINE_VERSION,
+                page.labels,
+                page.redact_mode,
+                os.path.splitext(page.filename)[1],
+                page.threshold,
             )
-            document = str(result.scalars().one())
 
-            data = {"ocr": []}
+    hits = await lookup_cached_pages(
+        [page.cache_key for page in pages if page.cache_key]
+    )
+
+    async def restore(page: Page, entry):
+        redact_image_name = redacted_name(page.filename)
+        await copy_file(entry.redact_path, f"redacted/{redact_image_name}")
+        results = unpack_pages(entry.ocr_data)
+        if is_document(page.filename):
+            page.pages = results
+        else:
+            page.result = results[0]
+        page.redact_filename = redact_image_name
+
+    cached = [page for page in pages if page.cache_key in hits]
+    restored = await asyncio.gather(
+        *(restore(page, hits[page.cache_key]) for page in cached),
+        return_exceptions=True,
+    )
+
+    todo = [page for page in pages if page.cache_key not in hits]
+    for page, outcome in zip(cached, restored):
+        if isinstance(outcome, Exception):
+            print(f"Cached result for {page.file_id} unusable: {outcome}")
+            page.result = page.pages = page.redact_filename = None
+            todo.append(page)
+
+    print(f"{len(pages) - len(todo)} of {len(pages)} file(s) served from cache")
+    return todo
+
+
+async def cache_pages(pages: List[Page]):
+    """Keep processed pages' results and redacted objects for later re-uploads."""
+    pages = [page for page in pages if page.cache_key]
+    paths = [
+        cache_path(page.cache_key, os.path.splitext(page.redact_filename)[1])
+        for page in pages
+    ]
+
+    copied = await asyncio.gather(
+        *(
+            copy_file(f"redacted/{page.redact_filename}", path)
+            for page, path in zip(pages, paths)
+        ),
+        return_exceptions=True,
+    )
+
+    await store_cached_pages(
+        [
+            {
+                "key": page.cache_key,
+                "content_hash": page.content_hash,
+                "model_version": PIPELINE_VERSION,
+                "ocr_data": page.ocr_bytes(),
+                "redact_path": path,
+            }
+            for page, path, outcome in zip(pages, paths, copied)
+            if not isinstance(outcome, Exception)
+        ]
+    )
+    await evict_cached_pages()
+
+
+def batch_status(pages: List[Page], failed: Set[str]) -> BatchStatus:
+    failures = sum(page.file_id in failed for page in pages)
+    if pages and failures == len(pages):
+        return BatchStatus.failed
+    return BatchStatus.partially_failed if failures else BatchStatus.completed
+
+
+async def full_inference_many(batch_ids: List[UUID], raise_errors: bool = False):
+    """
+    Performs OCR + NER for several batches as one pipeline run.
 
-            document_path = f"uploads/{document}"
+    Pages from every batch share the pipeline (and the NER batches), then each
+    batch is marked complete, partially failed if only some of its files made
+    it, or failed if none did. If the
+    run itself breaks the batches are marked failed, unless `raise_errors`,
+    which leaves them to the caller (e.g. the job runner, to retry).
+    """
+    print(f"Processing {len(batch_ids)} batch(es): {batch_ids}")
+    start_time = time.perf_counter()
+
+    marked = await asyncio.gather(
+        *(
+            update_batch_status_async(batch_id, BatchStatus.processing)
+            for batch_id in batch_ids
+        ),
+        return_exceptions=True,
+    )
+    active = []
+    for batch_id, outcome in zip(batch_ids, marked):
+        if isinstance(outcome, Exception):
+            print(f"Skipping batch {batch_id}: {outcome}")
+        else:
+            active.append(batch_id)
 
-            supabase_client = await get_supabase_client()
-            supabase_buffer = await supabase_client.storage.from_(
-                SUPABASE_BUCKET
-            ).download(
-                document_path,
+    try:
+        async with AsyncSessionLocal() as session:
+            rows = await get_files_for_batches(
+                active,
+                session,
+                Files.batch_id,
+                Files.file_id,
+                Files.filename,
+                Files.content_hash,
+                Batch.redact_mode,
+                Batch.labels,
+                Batch.threshold,
             )
+        pages = [
+            Page(
+                str(file_id),
+                filename,
+                content_hash,
+                batch_id=batch_id,
+                redact_mode=redact_mode,
+                labels=tuple(batch_labels) if batch_labels else DEFAULT_LABELS,
+                threshold=THRESHOLD if threshold is None else threshold,
+            )
+            for (
+                batch_id,
+                file_id,
+                filename,
+                content_hash,
+                redact_mode,
+                batch_labels,
+                threshold,
+            ) in rows
+        ]
+
+        todo = pages
+        if PAGE_CACHE_ENABLED:
+            try:
+                todo = await restore_cached_pages(pages)
+            except Exception as e:
+                print(f"Page cache lookup failed: {e}")
 
-            nparr = np.frombuffer(
-                supabase_buffer, np.uint8
-            )  # Conv supabase buffer to np array
-            img = await asyncio.to_thread(preprocess_ocr, nparr)
-            results = await asyncio.to_thread(
-                pytesseract.image_to_data, img, output_type=pytesseract.Output.DICT
+        with timed("pipeline", len(todo)):
+            failed = set(await run_pipeline(todo))
+
+        by_batch = defaultdict(list)
+        for page in pages:
+            by_batch[page.batch_id].append(page)
+
+        await asyncio.gather(
+            *(
+                update_batch_status_async(
+                    batch_id, batch_status(by_batch[batch_id], failed)
+                )
+                for batch_id in active
             )
+        )
 
-            # Loop over each detected text localization
-            for i in range(0, len(results["text"])):
-                # Extract the bounding box coordinates, text, and confidence
-                x = results["left"][i]
-                y = results["top"][i]
-                w = results["width"][i]
-                h = results["height"][i]
-                text = results["text"][i]
-                conf = round(results["conf"][i], 3)
-
-                # Filter out empty text
-                if len(text.strip()) > 0:
-                    ocr_data = {
-                        "text": text,
-                        "bbox": [(x, y), (x + w, y + h)],
-                        "entity": None,
-                        "ocr_confidence": conf,
-                    }
-
-                    data["ocr"].append(ocr_data)
-
-            json_table = await session.get(Files, str_uuid)
-            if not json_table:
-                raise ValueError(f"Document {str_uuid} not found.")
-
-            json_table.json_data = data
-            session.add(json_table)
-            await session.commit()
-            await session.refresh(json_table)
-
-
-async def full_inference(batch_id: UUID):
-    """Performs OCR + NER"""
-    print(f"Processing batch: {batch_id}")
-    try:
-        start_time = time.perf_counter()
+        # Write every file's results back in one statement
+        await update_files_bulk(
+            [result_row(page, page.file_id in failed) for page in pages]
+        )
+        if failed:
+            print(f"{len(failed)} file(s) failed across {len(active)} batch(es)")
 
-        await update_batch_status_async(batch_id, FileStatus.processing)
-        await document_ocr(batch_id)
-        await NER(batch_id)
-        await redact(batch_id)
-        await update_batch_status_async(batch_id, FileStatus.complete)
+        if PAGE_CACHE_ENABLED:
+            try:
+                await cache_pages([page for page in todo if page.file_id not in failed])
+            except Exception as e:
+                print(f"Page cache update failed: {e}")
 
         end_time = time.perf_counter()
         elapsed_time = end_time - start_time
 
-        print(f"Task {batch_id} completed after {elapsed_time:.3f} seconds")
+        print(
+            f"Tasks {active} completed after {elapsed_time:.3f} seconds, {len(pages)} page(s)"
+        )
 
     except Exception as e:
         print(f"Exception: {e}")
-        await update_batch_status_async(batch_id, FileStatus.failed)
+        if raise_errors:
+            raise
+        await asyncio.gather(
+            *(
+                update_batch_status_async(batch_id, BatchStatus.failed)
+                for batch_id in active
+            ),
+            return_exceptions=True,
+        )
+
+    finally:
+        if METRICS_PUSHGATEWAY:
+            await export_metrics()
+
+
+async def export_metrics():
+    """Push this worker's metrics; nothing scrapes a Modal container."""
+    try:
+        await asyncio.to_thread(
+            push_metrics, METRICS_PUSHGATEWAY, METRICS_JOB, METRICS_INSTANCE
+        )
+    except Exception as e:
+        print(f"Metrics push failed: {e}")
+
+
+async def full_inference(batch_id: UUID, raise_errors: bool = False):
+    """Performs OCR + NER"""
+    await full_inference_many([batch_id], raise_errors)
+
+
+def get_batcher() -> MicroBatcher:
+    """Get or create the scheduler that groups batches into shared runs."""
+    global _batcher
+
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            full_inference_many, SCHEDULER_MAX_WAIT_MS, SCHEDULER_MAX_PAGES
+        )
+
+    return _batcher
+
+
+async def scheduled_inference(batch_id: UUID, pages: int = 1):
+    """Run a batch together with any others arriving within the window."""
+    await get_batcher().submit(batch_id, pages)
 
 
 def sync_full_inference(batch_id: UUID):
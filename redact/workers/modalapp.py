@@ -3,24 +3,51 @@ from uuid import UUID
 
 import modal
 
-from redact.core.config import MODAL_APP
-from redact.workers.inference import sync_full_inference
+from redact.core.config import MODAL_APP, SCHEDULER_MAX_INPUTS
+from redact.workers.inference import scheduled_inference
+from redact.workers.worker import warm_up
+
+MODEL_DIR = "/models"
 
 dockerfile_image = (
     modal.Image.debian_slim(python_version="3.10.16")
-    .apt_install("tesseract-ocr-eng", "tesseract-ocr", "libgl1", "libglib2.0-0")
+    .apt_install(
+        "tesseract-ocr-eng",
+        "tesseract-ocr",
+        "libtesseract-dev",
+        "libleptonica-dev",
+        "pkg-config",
+        "libgl1",
+        "libglib2.0-0",
+    )
     .pip_install_from_requirements("modal-requirements.txt")
+    # Container hostnames are random; one container at a time, so one group
+    .env({"MODEL_CACHE_DIR": MODEL_DIR, "METRICS_INSTANCE": "modal"})
     .add_local_python_source("redact", ignore=["**/__pycache__", "*.pyc", ".venv"])
 )
 
 app = modal.App(MODAL_APP, image=dockerfile_image)
 
+# Weights persist across containers, so a cold start reads them from disk
+model_volume = modal.Volume.from_name("redact-models", create_if_missing=True)
+
 
-@app.function(
-    concurrency_limit=1,
-    allow_concurrent_inputs=False,
+# One GPU container takes many inputs at once; the scheduler in
+# `scheduled_inference` groups them into shared pipeline runs.
+@app.cls(
+    max_containers=1,
     gpu="T4",
     secrets=[modal.Secret.from_name("redact-secrets")],
+    volumes={MODEL_DIR: model_volume},
 )
-def inference_work(batch_id: UUID):
-    sync_full_inference(batch_id)
+@modal.concurrent(max_inputs=SCHEDULER_MAX_INPUTS)
+class InferenceWorker:
+    @modal.enter()
+    def load(self):
+        # Load before taking inputs, and keep any freshly fetched weights
+        warm_up()
+        model_volume.commit()
+
+    @modal.method()
+    async def inference_work(self, batch_id: UUID, pages: int = 1):
+        await scheduled_inference(batch_id, pages)
@@ -0,0 +1,304 @@
+# ocr.py
+# Kept free of model imports: this module is loaded by the OCR worker processes.
+import math
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pytesseract
+
+from redact.core.config import (
+    OCR_MAX_PIXELS,
+    OCR_MAX_SCALE,
+    OCR_MIN_SCALE,
+    OCR_TEXT_HEIGHT,
+)
+from redact.services.ocrdata import OCRResult
+
+try:
+    import tesserocr
+except ImportError:  # Fall back to spawning the tesseract CLI per image
+    tesserocr = None
+
+ESTIMATE_SIDE = 2000  # Text height is measured on a copy this size at most
+MIN_GLYPHS = 20  # Fewer letter-like blobs than this and the estimate is noise
+
+COLUMNS = ("text", "left", "top", "width", "height", "conf")
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1
+Tile = Tuple[Box, Box]  # Pixels read, and the core the tile owns
+
+_api = None  # Per-process Tesseract handle, language data stays loaded
+
+
+def init_worker(lang="eng", tessdata=None):
+    """Pool initializer, loads Tesseract once per worker process."""
+    global _api
+    if tesserocr is None:
+        return
+
+    if tessdata:
+        _api = tesserocr.PyTessBaseAPI(path=tessdata, lang=lang)
+    else:
+        _api = tesserocr.PyTessBaseAPI(lang=lang)
+
+
+def estimate_text_height(gray: np.ndarray) -> Optional[float]:
+    """
+    Median glyph height in pixels, or None when the page has too little text.
+
+    Measured on connected components of an Otsu-binarized, downsized copy:
+    blobs that are specks, rules, or photo regions are dropped, and the
+    median of what's left tracks the body text size.
+    """
+    height, width = gray.shape[:2]
+    shrink = min(1.0, ESTIMATE_SIDE / max(height, width))
+    if shrink < 1.0:
+        gray = cv2.resize(
+            gray, None, fx=shrink, fy=shrink, interpolation=cv2.INTER_AREA
+        )
+
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+
+    glyphs = heights[
+        (heights >= 3) & (heights <= gray.shape[0] // 8) & (widths <= heights * 3)
+    ]
+    if len(glyphs) < MIN_GLYPHS:
+        return None
+    return float(np.median(glyphs)) / shrink
+
+
+def choose_scale(shape: Tuple[int, ...], text_height: Optional[float]) -> float:
+    """Resize factor bringing text to OCR_TEXT_HEIGHT, capped at OCR_MAX_PIXELS."""
+    scale = OCR_TEXT_HEIGHT / text_height if text_height else 1.0
+    scale = min(max(scale, OCR_MIN_SCALE), OCR_MAX_SCALE)
+    scale = min(scale, math.sqrt(OCR_MAX_PIXELS / (shape[0] * shape[1])))
+    return 1.0 if abs(scale - 1.0) < 0.05 else scale
+
+
+def preprocess_ocr(img) -> Tuple[np.ndarray, float]:
+    """Tesseract-ready image, and the scale it was resized by."""
+    # 1. Grayscale (before resizing, so the resize moves a third of the data)
+    if img.ndim == 2:
+        gray = img
+    elif img.shape[2] == 4:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+    else:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    # 2. Scale to the text size Tesseract reads best, not a fixed factor
+    scale = choose_scale(gray.shape, estimate_text_height(gray))
+    if scale != 1.0:
+        interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+    # 3. Noise reduction (Gaussian blur)
+    denoised = cv2.GaussianBlur(gray, (5, 5), 0)
+
+    # 4. Adaptive threshold (handles uneven lighting)
+    thresh = cv2.adaptiveThreshold(
+        denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 13, 7
+    )
+
+    return thresh, scale
+
+
+def _tesserocr_data(img):
+    """Same output shape as pytesseract.image_to_data, from the warm API handle."""
+    img = np.ascontiguousarray(img)
+    height, width = img.shape[:2]
+    channels = 1 if img.ndim == 2 else img.shape[2]
+    image_bytes = img.tobytes()  # Not copied by Tesseract, keep it alive until done
+    _api.SetImageBytes(image_bytes, width, height, channels, width * channels)
+    _api.Recognize()
+
+    results = {
+        "text": [],
+        "left": [],
+        "top": [],
+        "width": [],
+        "height": [],
+        "conf": [],
+    }
+    level = tesserocr.RIL.WORD
+    iterator = _api.GetIterator()
+    if iterator is None:
+        return results
+
+    for word in tesserocr.iterate_level(iterator, level):
+        box = word.BoundingBox(level)
+        if box is None:
+            continue
+        x1, y1, x2, y2 = box
+        results["text"].append(word.GetUTF8Text(level) or "")
+        results["left"].append(x1)
+        results["top"].append(y1)
+        results["width"].append(x2 - x1)
+        results["height"].append(y2 - y1)
+        results["conf"].append(word.Confidence(level))
+
+    return results
+
+
+def _ocr_columns(img) -> Dict[str, list]:
+    """Tesseract's non-empty words as pytesseract.image_to_data style columns."""
+    if _api is not None:
+        results = _tesserocr_data(img)
+    else:
+        results = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+
+    # Filter out empty text
+    keep = [i for i, text in enumerate(results["text"]) if len(text.strip()) > 0]
+    return {name: [results[name][i] for i in keep] for name in COLUMNS}
+
+
+def ocr_image(img, scale: float = 1.0):
+    """
+    Run Tesseract on a preprocessed image, returns the page's words as columns.
+
+    `scale` is the factor `preprocess_ocr` resized by, kept with the result so
+    boxes map back to the original image.
+    """
+    columns = _ocr_columns(img)
+    return OCRResult.from_columns(*(columns[name] for name in COLUMNS), scale=scale)
+
+
+def _spans(length: int, size: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """(start, end, core start, core end) of overlapping tiles along one axis."""
+    step = size - overlap
+    count = max(math.ceil((length - overlap) / step), 1)
+    spans = []
+    for i in range(count):
+        start = i * step
+        spans.append(
+            (
+                start,
+                min(start + size, length),
+                0 if i == 0 else start + overlap // 2,
+                length if i == count - 1 else start + step + overlap // 2,
+            )
+        )
+    return spans
+
+
+def tile_grid(height: int, width: int, size: int, overlap: int) -> List[Tile]:
+    """
+    Overlapping tiles covering a height x width image.
+
+    Each tile is its (x0, y0, x1, y1) box and its core, the part of the page
+    it owns. Cores split every overlap down the middle, so they partition the
+    page and a word is kept by the one tile whose core holds its center.
+    """
+    return [
+        ((x0, y0, x1, y1), (cx0, cy0, cx1, cy1))
+        for y0, y1, cy0, cy1 in _spans(height, size, overlap)
+        for x0, x1, cx0, cx1 in _spans(width, size, overlap)
+    ]
+
+
+def ocr_tile(img, tile: Tile) -> Dict[str, list]:
+    """
+    OCR one tile (`img` is the tile's pixels), keeping the words it owns.
+
+    Boxes come back in page coordinates, with a "seam" column marking words
+    that reach outside the core, where a neighbour may have read them too.
+    """
+    (x0, y0, _, _), (cx0, cy0, cx1, cy1) = tile
+    columns = _ocr_columns(img)
+    owned = {name: [] for name in COLUMNS + ("seam",)}
+    for i in range(len(columns["text"])):
+        left = columns["left"][i] + x0
+        top = columns["top"][i] + y0
+        width, height = columns["width"][i], columns["height"][i]
+        if not (cx0 <= left + width / 2 < cx1 and cy0 <= top + height / 2 < cy1):
+            continue
+
+        owned["text"].append(columns["text"][i])
+        owned["left"].append(left)
+        owned["top"].append(top)
+        owned["width"].append(width)
+        owned["height"].append(height)
+        owned["conf"].append(columns["conf"][i])
+        owned["seam"].append(
+            left < cx0 or top < cy0 or left + width > cx1 or top + height > cy1
+        )
+    return owned
+
+
+def _drop_duplicates(words: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Mask of words to keep after removing seam words read twice.
+
+    A word wider than half the overlap can be read whole by one tile and as a
+    fragment by its neighbour; of two seam words from different tiles that
+    mostly overlap, the wider one is kept.
+    """
+    keep = np.ones(len(words["left"]), dtype=bool)
+    seam = np.flatnonzero(words["seam"])
+    if len(seam) < 2:
+        return keep
+
+    x1, y1 = words["left"][seam], words["top"][seam]
+    x2, y2 = x1 + words["width"][seam], y1 + words["height"][seam]
+    overlap_w = np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1)
+    overlap_h = np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1)
+    intersection = np.clip(overlap_w, 0, None) * np.clip(overlap_h, 0, None)
+    area = (x2 - x1) * (y2 - y1)
+    smaller = np.minimum(area[:, None], area)
+
+    tile = words["tile"][seam]
+    duplicate = (intersection > 0.5 * np.maximum(smaller, 1)) & (tile[:, None] != tile)
+    width = words["width"][seam]
+    for a, b in zip(*np.nonzero(np.triu(duplicate))):
+        keep[seam[a] if width[a] < width[b] else seam[b]] = False
+    return keep
+
+
+def _reading_order(top: np.ndarray, height: np.ndarray, left: np.ndarray) -> List[int]:
+    """Word indices line by line, top to bottom, each line left to right."""
+    if len(top) == 0:
+        return []
+
+    center = top + height / 2
+    tolerance = max(float(np.median(height)) / 2, 1.0)
+    order, line, line_center = [], [], None
+    for i in np.argsort(center, kind="stable"):
+        if line_center is not None and center[i] - line_center > tolerance:
+            order += sorted(line, key=lambda j: left[j])
+            line = []
+        if not line:
+            line_center = center[i]
+        line.append(int(i))
+    order += sorted(line, key=lambda j: left[j])
+    return order
+
+
+def merge_tiles(parts: List[Dict[str, list]], scale: float = 1.0) -> OCRResult:
+    """
+    One page's OCRResult from its `ocr_tile` outputs.
+
+    Tiles only know their own reading order, so the merged words are put
+    back in line order; multi-column layouts read across columns.
+    """
+    words = {
+        name: np.asarray([v for part in parts for v in part[name]])
+        for name in COLUMNS[1:] + ("seam",)
+    }
+    words["tile"] = np.asarray(
+        [index for index, part in enumerate(parts) for _ in part["text"]]
+    )
+    texts = [text for part in parts for text in part["text"]]
+    if not texts:
+        return OCRResult.from_columns([], [], [], [], [], [], scale=scale)
+
+    kept = np.flatnonzero(_drop_duplicates(words))
+    order = kept[
+        _reading_order(*(words[name][kept] for name in ("top", "height", "left")))
+    ]
+    return OCRResult.from_columns(
+        [texts[i] for i in order],
+        *(words[name][order] for name in COLUMNS[1:]),
+        scale=scale,
+    )
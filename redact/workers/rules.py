@@ -0,0 +1,179 @@
+# rules.py
+# Pattern detectors for structured PII, run over page text before the model.
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+RULES_VERSION = 1  # Bump when a pattern or validator changes
+RULE_SCORE = 1.0  # Validated matches outrank any model score
+CARD = "credit card number"
+
+_MONTHS = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|"
+    r"aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+
+# label -> pattern, in priority order: at any position the first rule that
+# matches and validates wins
+PATTERNS = {
+    "email": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}",
+    CARD: r"(?<!\d)(?:\d[ -]?){12,18}\d(?!\d)",
+    "social security number, health insurance": r"(?<!\d)\d{3}[- ]\d{2}[- ]\d{4}(?!\d)",
+    "date": (
+        r"(?<!\d)\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}(?!\d)"
+        rf"|(?i:(?<!\w)\d{{1,2}}(?:st|nd|rd|th)?\s+{_MONTHS}\.?,?\s+\d{{2,4}}(?!\d))"
+        rf"|(?i:(?<!\w){_MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{2,4}}(?!\d))"
+    ),
+    "phone number": (
+        r"(?<![\w+])(?:\+\d{1,3}[ .-]?)?(?:\(\d{1,4}\)[ .-]?)?"
+        r"\d{2,4}(?:[ .-]?\d{2,4}){1,4}(?!\d)"
+    ),
+}
+
+# Labels the rules detect completely, so the model can be skipped for them.
+# Health insurance numbers have no common format, that label stays with the model.
+STRUCTURED_LABELS = {"email", CARD, "date", "phone number"}
+
+
+def _digits(text: str) -> str:
+    return re.sub(r"\D", "", text)
+
+
+def luhn_valid(numbers: Sequence[str]) -> np.ndarray:
+    """Luhn checksum for many digit strings at once, right-aligned in one array."""
+    if not numbers:
+        return np.zeros(0, dtype=bool)
+
+    width = max(len(number) for number in numbers)
+    digits = np.zeros((len(numbers), width), dtype=np.int64)
+    for row, number in enumerate(numbers):
+        digits[row, width - len(number) :] = np.frombuffer(
+            number.encode(), dtype=np.uint8
+        ) - ord("0")
+
+    doubled = digits[:, ::-1][:, 1::2] * 2  # Every second digit from the right
+    total = digits[:, ::-1][:, ::2].sum(axis=1) + (doubled - 9 * (doubled > 9)).sum(
+        axis=1
+    )
+    return total % 10 == 0
+
+
+def _card(text: str) -> bool:
+    digits = _digits(text)
+    return 13 <= len(digits) <= 19 and bool(luhn_valid([digits])[0])
+
+
+def _ssn(text: str) -> bool:
+    digits = _digits(text)
+    area, group, serial = digits[:3], digits[3:5], digits[5:]
+    return (
+        area not in ("000", "666")
+        and area[0] != "9"
+        and group != "00"
+        and serial != "0000"
+    )
+
+
+def _date(text: str) -> bool:
+    parts = re.split(r"[/.-]", text)
+    if len(parts) != 3:
+        return True  # Month-name forms are only matched when well formed
+
+    numbers = [int(part) for part in parts]
+    if len(parts[0]) == 4:  # Y-M-D
+        return 1 <= numbers[1] <= 12 and 1 <= numbers[2] <= 31
+    if len(parts[2]) not in (2, 4):
+        return False
+    day_month, month_day = numbers[0], numbers[1]  # D/M/Y or M/D/Y
+    return (1 <= day_month <= 31 and 1 <= month_day <= 12) or (
+        1 <= day_month <= 12 and 1 <= month_day <= 31
+    )
+
+
+def _phone(text: str) -> bool:
+    digits = _digits(text)
+    separated = bool(re.search(r"[ .()+-]", text))
+    return 10 <= len(digits) <= 15 or (len(digits) == 7 and separated)  # 555-0132
+
+
+VALIDATORS: Dict[str, Callable[[str], bool]] = {
+    CARD: _card,
+    "social security number, health insurance": _ssn,
+    "date": _date,
+    "phone number": _phone,
+}
+
+
+class RuleEngine:
+    """
+    Every pattern for a label set, compiled into one alternation.
+
+    `find` makes a single regex pass over the text; each hit is checked by its
+    label's validator, and a hit that fails is retried against the later
+    rules at the same position (a 14-digit number that isn't a card may still
+    be a phone number).
+    """
+
+    def __init__(self, labels: Sequence[str]):
+        self.labels = [label for label in PATTERNS if label in labels]
+        self.groups = {f"r{i}": label for i, label in enumerate(self.labels)}
+        self.pattern = re.compile(
+            "|".join(
+                f"(?P<{group}>{PATTERNS[label]})"
+                for group, label in self.groups.items()
+            )
+        )
+        self.single = [re.compile(PATTERNS[label]) for label in self.labels]
+
+    def _validate(self, label: str, text: str) -> bool:
+        validator = VALIDATORS.get(label)
+        return validator is None or validator(text)
+
+    def _fallback(self, text: str, start: int, after: int) -> Optional[dict]:
+        for index in range(after + 1, len(self.labels)):
+            match = self.single[index].match(text, start)
+            if match and self._validate(self.labels[index], match.group()):
+                return self._entity(self.labels[index], match)
+        return None
+
+    @staticmethod
+    def _entity(label: str, match: re.Match) -> dict:
+        return {
+            "start": match.start(),
+            "end": match.end(),
+            "text": match.group(),
+            "label": label,
+            "score": RULE_SCORE,
+        }
+
+    def find(self, text: str) -> List[dict]:
+        """Validated matches as GLiNER-style entities (start, end, text, label, score)."""
+        if not self.labels:
+            return []
+
+        matches = [
+            (self.groups[match.lastgroup], match)
+            for match in self.pattern.finditer(text)
+        ]
+
+        # Every card candidate on the page is checksummed in one go
+        cards = [i for i, (label, _) in enumerate(matches) if label == CARD]
+        numbers = [_digits(matches[i][1].group()) for i in cards]
+        checked = luhn_valid(numbers)
+        valid = {
+            i: 13 <= len(number) <= 19 and bool(ok)
+            for i, number, ok in zip(cards, numbers, checked)
+        }
+
+        entities = []
+        for i, (label, match) in enumerate(matches):
+            ok = valid[i] if i in valid else self._validate(label, match.group())
+            if ok:
+                entities.append(self._entity(label, match))
+                continue
+
+            entity = self._fallback(text, match.start(), self.labels.index(label))
+            if entity is not None:
+                entities.append(entity)
+        return entities
@@ -0,0 +1,208 @@
+# runner.py
+# Run `python -m redact.workers.runner [--processes N]` on any node with JOB_QUEUE_BACKEND=postgres
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from multiprocessing.connection import wait
+from typing import Awaitable, Callable, Optional
+from uuid import UUID
+
+from redact.core.config import (
+    JOB_LEASE_SECONDS,
+    JOB_POLL_INTERVAL,
+    JOB_PROCESSES,
+    JOB_RETRY_DELAY,
+    JOB_WORKERS,
+)
+from redact.services.jobqueue import (
+    ClaimableJobQueue,
+    ClaimedJob,
+    get_claimable_job_queue,
+)
+from redact.services.storage import update_batch_status_async
+from redact.sqlschema.tables import BatchStatus
+
+
+def default_worker_id(index: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+async def _keep_lease(
+    queue: ClaimableJobQueue, job: ClaimedJob, worker_id: str, lease_seconds: float
+):
+    """Renew the lease at a third of its length until cancelled."""
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        if not await queue.extend(job, worker_id, lease_seconds):
+            print(f"Lost lease on job {job.id}, another worker may pick it up")
+            return
+
+
+async def run_job(
+    queue: ClaimableJobQueue,
+    job: ClaimedJob,
+    worker_id: str,
+    handler: Callable[[UUID], Awaitable[None]],
+    lease_seconds: float = JOB_LEASE_SECONDS,
+    retry_delay: float = JOB_RETRY_DELAY,
+):
+    """Run one claimed job, then complete it or hand it back for a retry."""
+    heartbeat = asyncio.create_task(_keep_lease(queue, job, worker_id, lease_seconds))
+    try:
+        await handler(job.batch_id)
+
+    except Exception as e:
+        print(f"Job {job.id} attempt {job.attempts}/{job.max_attempts} failed: {e}")
+        await queue.fail(job, worker_id, str(e), retry_delay)
+        # Clients poll the batch: queued again while retries remain
+        await update_batch_status_async(
+            job.batch_id,
+            BatchStatus.failed if job.final_attempt else BatchStatus.uploaded,
+        )
+
+    else:
+        await queue.complete(job, worker_id)
+
+    finally:
+        heartbeat.cancel()
+
+
+async def run_worker(
+    handler: Callable[[UUID], Awaitable[None]],
+    queue: Optional[ClaimableJobQueue] = None,
+    worker_id: Optional[str] = None,
+    poll_interval: float = JOB_POLL_INTERVAL,
+    lease_seconds: float = JOB_LEASE_SECONDS,
+    retry_delay: float = JOB_RETRY_DELAY,
+    stop: Optional[asyncio.Event] = None,
+):
+    """Claim and run jobs one at a time until `stop` is set."""
+    queue = queue or get_claimable_job_queue()
+    worker_id = worker_id or default_worker_id()
+    stop = stop or asyncio.Event()
+
+    while not stop.is_set():
+        try:
+            for batch_id in await queue.reap():
+                print(f"Batch {batch_id} ran out of attempts")
+                await update_batch_status_async(batch_id, BatchStatus.failed)
+
+            job = await queue.claim(worker_id, lease_seconds)
+        except Exception as e:
+            print(f"Queue unavailable: {e}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        print(f"Worker {worker_id} running job {job.id} (batch {job.batch_id})")
+        try:
+            await run_job(queue, job, worker_id, handler, lease_seconds, retry_delay)
+        except Exception as e:
+            print(f"Job {job.id} bookkeeping failed, lease will expire: {e}")
+
+
+async def run_workers(count: int = JOB_WORKERS):
+    get_claimable_job_queue()  # Fail before loading anything if there's nothing to claim
+
+    # Imported here so the queue can be used without loading the model
+    from redact.workers.inference import full_inference
+
+    async def handler(batch_id: UUID):
+        await full_inference(batch_id, raise_errors=True)
+
+    await asyncio.gather(
+        *(
+            run_worker(handler, worker_id=default_worker_id(index))
+            for index in range(max(count, 1))
+        )
+    )
+
+
+def _child_main(processes: int):
+    from redact.core.database import get_engine
+    from redact.workers.inference import claim_cpu_share
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent decides when to stop
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    get_engine().sync_engine.dispose(close=False)  # Never share the parent's pool
+    claim_cpu_share(processes)
+    asyncio.run(run_workers())
+
+
+def run_processes(processes: int = JOB_PROCESSES):
+    """
+    Load the model once, then fork `processes` runners that share its weights.
+
+    Children are forked from the loaded parent, so the weights sit in memory
+    once, copy-on-write, however many cores are in use. Each child takes its
+    share of the node's cores for torch and OCR. A child that dies is
+    replaced; SIGINT/SIGTERM stop them all.
+    """
+    from redact.workers import worker
+
+    get_claimable_job_queue()  # Children would die at startup and be restarted forever
+    if processes > 1 and worker.get_device() == "cuda":
+        raise SystemExit("Forking after CUDA init is unsafe, use one process per GPU")
+    if processes > 1 and worker.NER_BACKEND == "onnx":
+        # ONNX Runtime sessions own thread pools, which don't survive a fork;
+        # one process already spreads inference over every core
+        raise SystemExit("The onnx backend runs one process, drop --processes")
+
+    worker.prepare_for_fork()
+    context = multiprocessing.get_context("fork")
+    stopping = False
+    parent_pid = os.getpid()
+
+    def start(index: int):
+        process = context.Process(
+            target=_child_main, args=(processes,), name=f"runner-{index}"
+        )
+        process.start()
+        return process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if os.getpid() != parent_pid:
+            os._exit(0)  # A child signalled before it installed its own handlers
+        stopping = True
+        for process in children.values():
+            if process.is_alive():
+                process.terminate()
+
+    children = {index: start(index) for index in range(processes)}
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Started {processes} runner process(es) sharing one model")
+
+    while children:
+        wait([process.sentinel for process in children.values()])
+        for index, process in list(children.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            if stopping:
+                del children[index]
+            else:
+                print(f"Runner {index} exited with {process.exitcode}, restarting")
+                time.sleep(1)  # Don't spin on a child that dies at startup
+                children[index] = start(index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued inference jobs")
+    parser.add_argument("--processes", type=int, default=JOB_PROCESSES)
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        run_processes(args.processes)
+    else:
+        asyncio.run(run_workers())
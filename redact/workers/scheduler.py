@@ -0,0 +1,97 @@
+# scheduler.py
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+from uuid import UUID
+
+
+@dataclass
+class _Pending:
+    batch_id: UUID
+    pages: int
+    future: asyncio.Future = field(repr=False)
+    arrived: float
+
+
+class MicroBatcher:
+    """
+    Coalesce batches submitted close together into one worker run.
+
+    The first pending batch opens a window; the group is dispatched when
+    `max_pages` pages are waiting or `max_wait_ms` after that first arrival,
+    whichever comes first. Runs go one at a time (one GPU), and batches that
+    arrive during a run are grouped for the next one. `submit` returns once
+    the run holding its batch has finished.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[List[UUID]], Awaitable[None]],
+        max_wait_ms: float,
+        max_pages: int,
+    ):
+        self.run = run
+        self.max_wait = max_wait_ms / 1000
+        self.max_pages = max(max_pages, 1)
+        self._pending: List[_Pending] = []
+        self._arrived = asyncio.Event()
+        self._consumer: Optional[asyncio.Task] = None
+
+    @property
+    def pending_pages(self) -> int:
+        return sum(item.pages for item in self._pending)
+
+    async def submit(self, batch_id: UUID, pages: int = 1):
+        loop = asyncio.get_running_loop()
+        if self._consumer is None or self._consumer.done():
+            self._consumer = loop.create_task(self._consume())
+
+        item = _Pending(batch_id, max(pages, 1), loop.create_future(), loop.time())
+        self._pending.append(item)
+        self._arrived.set()
+        return await item.future
+
+    def _take(self) -> List[_Pending]:
+        """Pending batches up to `max_pages` pages, always at least one."""
+        group, pages = [], 0
+        while self._pending:
+            item = self._pending[0]
+            if group and pages + item.pages > self.max_pages:
+                break
+            group.append(self._pending.pop(0))
+            pages += item.pages
+        return group
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._pending:
+                self._arrived.clear()
+                await self._arrived.wait()
+
+            # Hold the window open until it fills up or times out
+            deadline = self._pending[0].arrived + self.max_wait
+            while self.pending_pages < self.max_pages:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            group = self._take()
+            print(
+                f"Dispatching {len(group)} batch(es), {sum(i.pages for i in group)} page(s)"
+            )
+            try:
+                result = await self.run([item.batch_id for item in group])
+            except Exception as e:
+                for item in group:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+            else:
+                for item in group:
+                    if not item.future.done():
+                        item.future.set_result(result)
@@ -0,0 +1,93 @@
+# text.py
+# Mapping between OCR words and the text the NER model reads.
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import List, Sequence, Tuple
+
+# Mirrors GLiNER's whitespace token splitter, used to size windows.
+TOKEN_PATTERN = re.compile(r"\w+(?:[-_]\w+)*|\S")
+SENTENCE_END = (".", "!", "?", ":", ";")
+
+
+def join_words(words: Sequence[str]) -> Tuple[str, List[int]]:
+    """
+    Join words with single spaces, returning the text and each word's start offset.
+
+    The offsets are a prefix sum of word lengths plus separators, so any
+    character offset in the text resolves to its word by binary search.
+    """
+    starts = list(accumulate((len(word) + 1 for word in words[:-1]), initial=0))
+    return " ".join(words), starts
+
+
+def span_words(starts: Sequence[int], start: int, end: int) -> range:
+    """Indices of the words overlapping the character span [start, end)."""
+    if end <= start:
+        return range(0)
+    first = max(bisect_right(starts, start) - 1, 0)
+    if first + 1 < len(starts) and start >= starts[first + 1] - 1:
+        first += 1  # Starts on the separator after a word
+    last = bisect_left(starts, end)  # First word starting at or past the end
+    return range(first, last)
+
+
+def count_tokens(word: str) -> int:
+    return max(len(TOKEN_PATTERN.findall(word)), 1)
+
+
+def boundaries(words: Sequence[str], lefts: Sequence[int] = ()) -> List[int]:
+    """
+    Word indices a window may start at: after a sentence end, or at a new line.
+
+    A line starts where a word sits left of the one before it (the reading
+    position wrapped), when `lefts` gives the words' x positions.
+    """
+    return [
+        i
+        for i in range(1, len(words))
+        if words[i - 1].endswith(SENTENCE_END) or (lefts and lefts[i] < lefts[i - 1])
+    ]
+
+
+def window_words(
+    words: Sequence[str],
+    window: int,
+    stride: int,
+    breaks: Sequence[int] = (),
+) -> List[Tuple[int, int]]:
+    """
+    Overlapping (start, end) word ranges of at most `window` model tokens.
+
+    Consecutive windows start about `stride` tokens apart, so with a stride
+    below the window each one overlaps the next and text cut at one edge is
+    read whole by a neighbour. Edges snap back to the nearest sentence or
+    line break in `breaks` when one is in the back half of the window (or
+    stride). The number of windows grows linearly with the text.
+    """
+    offsets = list(accumulate((count_tokens(word) for word in words), initial=0))
+    n = len(words)
+    ranges = []
+    start = 0
+    while start < n:
+        # Furthest end that fits, at least one word even if it doesn't
+        end = max(bisect_right(offsets, offsets[start] + window) - 1, start + 1)
+        if end < n:
+            snap = bisect_right(breaks, end) - 1
+            if (
+                snap >= 0
+                and breaks[snap] > start
+                and offsets[breaks[snap]] >= offsets[start] + window // 2
+            ):
+                end = breaks[snap]
+        ranges.append((start, end))
+        if end >= n:
+            break
+
+        target = bisect_right(offsets, offsets[start] + stride) - 1
+        snap = bisect_right(breaks, target) - 1
+        if snap >= 0 and offsets[breaks[snap]] >= offsets[start] + stride // 2:
+            target = breaks[snap]
+        start = min(max(target, start + 1), end)
+
+    return ranges
@@ -1,24 +1,35 @@
 # model.py
-import sys
+# Nothing heavy happens at import: torch, GLiNER and the weights load on first use.
+import gc
+import hashlib
+import json
+import os
+import threading
+import time
 import warnings
+from functools import lru_cache
+from typing import Sequence, Tuple
 
-import torch
-from gliner import GLiNER
+from redact.core.config import (
+    LABEL_CACHE_SIZE,
+    MODEL_CACHE_DIR,
+    NER_BACKEND,
+    NER_MODEL_NAME,
+    ONNX_QUANTIZE,
+)
 
 warnings.filterwarnings("ignore")
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-ML_MODEL = GLiNER.from_pretrained("urchade/gliner_medium-v2.1").to(
-    device
-)  # update to download model instead.
+MODEL_NAME = NER_MODEL_NAME
+MANIFEST = "checksums.json"
 
+THRESHOLD = 0.28
+MODEL_VERSION = f"{MODEL_NAME}@{THRESHOLD}"  # Anything that changes predictions
+if NER_BACKEND == "onnx":
+    MODEL_VERSION += "+onnx-int8" if ONNX_QUANTIZE else "+onnx"
 
-print("CUDA available:", torch.cuda.is_available())
-print("CUDA device count:", torch.cuda.device_count())
-print(
-    "CUDA device name:",
-    torch.cuda.get_device_name(0) if torch.cuda.is_available() else "N/A",
-)
+_model = None
+_lock = threading.Lock()  # NER runs in worker threads, load exactly once
 
 """
 # For local downloaded model when doing dev.
@@ -29,5 +40,192 @@ ML_MODEL = GLiNER.from_pretrained(
 """
 
 
-def predict_entities(text, labels):
-    return ML_MODEL.predict_entities(text, labels, threshold=0.28)
+def get_device() -> str:
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _weight_files(path: str):
+    for root, _, names in os.walk(path):
+        for name in names:
+            full = os.path.join(root, name)
+            relative = os.path.relpath(full, path)
+            if name != MANIFEST and not relative.startswith(".cache"):
+                yield relative, full
+
+
+def _write_manifest(path: str):
+    manifest = {}
+    for relative, full in _weight_files(path):
+        stat = os.stat(full)
+        manifest[relative] = {
+            "sha256": _sha256(full),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+
+def verify_weights(path: str) -> bool:
+    """
+    Check a cached snapshot against its manifest.
+
+    Files whose size and mtime match what was recorded are trusted; any
+    other file is re-hashed, so a truncated or replaced file is caught
+    without hashing the whole model on every cold start.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    for relative, expected in manifest.items():
+        full = os.path.join(path, relative)
+        try:
+            stat = os.stat(full)
+        except OSError:
+            return False
+        if stat.st_size != expected["size"]:
+            return False
+        if (
+            stat.st_mtime_ns != expected["mtime_ns"]
+            and _sha256(full) != expected["sha256"]
+        ):
+            return False
+    return True
+
+
+def fetch_weights(model_name: str = MODEL_NAME) -> str:
+    """Local snapshot of `model_name` in MODEL_CACHE_DIR, downloaded if missing or corrupt."""
+    from huggingface_hub import snapshot_download
+
+    path = os.path.join(MODEL_CACHE_DIR, model_name.replace("/", "--"))
+    if verify_weights(path):
+        return path
+
+    print(f"Fetching {model_name} weights into {path}")
+    snapshot_download(model_name, local_dir=path, force_download=os.path.isdir(path))
+    _write_manifest(path)
+    return path
+
+
+def load_model(backend: str = NER_BACKEND):
+    """GLiNER on PyTorch, or on ONNX Runtime from a (quantized) export."""
+    if backend == "torch":
+        import torch
+        from gliner import GLiNER
+
+        device = get_device()
+        print("CUDA available:", torch.cuda.is_available())
+        print(
+            "CUDA device name:",
+            torch.cuda.get_device_name(0) if device == "cuda" else "N/A",
+        )
+        return GLiNER.from_pretrained(fetch_weights(), local_files_only=True).to(device)
+    if backend == "onnx":
+        from redact.workers.export import load_onnx_model
+
+        return load_onnx_model(MODEL_NAME, ONNX_QUANTIZE)
+    raise ValueError(f"Unknown NER_BACKEND {backend!r}, expected torch or onnx")
+
+
+def get_model():
+    """Get or load the NER model (thread safe, loaded once per process)."""
+    global _model
+
+    if _model is not None:
+        return _model
+
+    with _lock:
+        if _model is None:
+            start = time.perf_counter()
+            _model = load_model()
+            print(f"Loaded {MODEL_VERSION} in {time.perf_counter() - start:.2f}s")
+        return _model
+
+
+def warm_up():
+    """Load the model and run one prediction, so the first request doesn't pay for it."""
+    get_model()
+    predict_entities("Warm up for Jane Doe.", ["person"])
+
+
+def get_max_len() -> int:
+    return getattr(get_model().config, "max_len", 384)  # Context window, in words
+
+
+def prepare_for_fork():
+    """
+    Make the loaded model safe to share with forked workers.
+
+    Weight tensors live outside Python objects, so children read the
+    parent's pages copy-on-write as long as nothing writes to them: no
+    autograd state, and no GC passes over the parent's objects.
+    """
+    model = get_model()
+    model.eval()
+    for parameter in model.parameters():
+        parameter.requires_grad_(False)
+    gc.collect()
+    gc.freeze()
+
+
+def set_threads(threads: int):
+    import torch
+
+    torch.set_num_threads(max(threads, 1))
+
+
+def predict_entities(text, labels, threshold=THRESHOLD):
+    return get_model().predict_entities(text, labels, threshold=threshold)
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def _encode_labels(model_version: str, labels: Tuple[str, ...]):
+    return get_model().encode_labels(list(labels), batch_size=len(labels))
+
+
+def label_embeddings(labels: Sequence[str]):
+    """
+    Encodings of a label set, cached per model version and label set.
+
+    Only bi-encoder models encode labels apart from the text; the others
+    read them in the prompt next to every text, so there is nothing to
+    keep and this returns None.
+    """
+    model = get_model()
+    if NER_BACKEND != "torch" or not getattr(model.config, "labels_encoder", None):
+        return None
+    return _encode_labels(MODEL_VERSION, tuple(labels))
+
+
+def batch_predict_entities(texts, labels, batch_size=8, threshold=THRESHOLD):
+    """Run GLiNER over `texts`, `batch_size` texts per forward pass."""
+    model = get_model()
+    embeddings = label_embeddings(labels)
+    entities = []
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i : i + batch_size]
+        if embeddings is None:
+            entities.extend(
+                model.batch_predict_entities(batch, labels, threshold=threshold)
+            )
+        else:
+            entities.extend(
+                model.batch_predict_with_embeds(
+                    batch, embeddings, labels, threshold=threshold
+                )
+            )
+
+    return entities
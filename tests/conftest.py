@@ -1,11 +1,15 @@
 # tests/conftest.py
-from unittest.mock import AsyncMock, MagicMock
+import json
+import secrets
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session
+from supabase import AsyncClientOptions, acreate_client
 
 from app.main import app
 
@@ -51,3 +55,102 @@ def mock_supabase_client(mocker):
     mock_storage = client.storage.from_.return_value
     mock_storage.upload.return_value = {"key": "path/to/file.png"}
     return client
+
+
+class FakeStorage:
+    """In-memory stand-in for the Supabase Storage API, served over httpx"""
+
+    SIGN = "/storage/v1/object/upload/sign/"
+    INFO = "/storage/v1/object/info/"
+    DOWNLOAD_SIGN = "/storage/v1/object/sign/"
+    OBJECT = "/storage/v1/object/"
+
+    def __init__(self):
+        self.objects = {}
+        self.tokens = {}
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path
+        if path.startswith(self.SIGN):
+            key = path[len(self.SIGN) :]
+            if request.method == "POST":
+                token = secrets.token_hex(8)
+                self.tokens[token] = key
+                return httpx.Response(
+                    200, json={"url": f"/object/upload/sign/{key}?token={token}"}
+                )
+            if request.method == "PUT":
+                if self.tokens.get(request.url.params.get("token")) != key:
+                    return httpx.Response(
+                        403,
+                        json={
+                            "statusCode": 403,
+                            "error": "Forbidden",
+                            "message": "bad token",
+                        },
+                    )
+                self.objects[key] = request.read()
+                return httpx.Response(200, json={"Key": key})
+
+        if path.startswith(self.INFO) and request.method == "GET":
+            key = path[len(self.INFO) :]
+            if key in self.objects:
+                return httpx.Response(
+                    200, json={"name": key, "size": len(self.objects[key])}
+                )
+
+        if path.startswith(self.OBJECT) and request.method == "HEAD":
+            key = path[len(self.OBJECT) :]
+            return httpx.Response(200 if key in self.objects else 404)
+
+        if path.startswith(self.DOWNLOAD_SIGN):
+            if request.method == "POST":
+                signed = []
+                for key in json.loads(request.read())["paths"]:
+                    token = secrets.token_hex(8)
+                    self.tokens[token] = key
+                    signed.append(
+                        {
+                            "path": key,
+                            "signedURL": f"/object/sign/{key}?token={token}",
+                            "error": None if key in self.objects else "not_found",
+                        }
+                    )
+                return httpx.Response(200, json=signed)
+
+            key = path[len(self.DOWNLOAD_SIGN) :]
+            if self.tokens.get(request.url.params.get("token")) == key:
+                data = self.objects[key]
+                if "range" in request.headers:
+                    start, end = request.headers["range"][len("bytes=") :].split("-")
+                    return httpx.Response(206, content=data[int(start) : int(end) + 1])
+                return httpx.Response(200, content=data)
+
+        return httpx.Response(
+            404, json={"statusCode": 404, "error": "not_found", "message": path}
+        )
+
+
+@pytest_asyncio.fixture
+async def fake_storage():
+    """Routes the storage layer to a FakeStorage through a real supabase client"""
+    storage = FakeStorage()
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(storage.handle))
+    supabase_client = await acreate_client(
+        "http://localhost:54321",
+        "fake-key",
+        options=AsyncClientOptions(httpx_client=http_client),
+    )
+    with (
+        patch(
+            "redact.services.storage.get_supabase_client",
+            new=AsyncMock(return_value=supabase_client),
+        ),
+        patch(
+            "redact.services.storage.get_http_client",
+            new=AsyncMock(return_value=http_client),
+        ),
+    ):
+        yield storage
@@ -1,11 +1,22 @@
 # tests/test_app.py
+import asyncio
+import hashlib
+import zipfile
 from io import BytesIO
 from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
 
 import pytest
+from httpx import AsyncClient, MockTransport
 
-from app.main import get_supabase_client
+from app.main import app
+from redact.core.database import get_async_session
+from redact.services.jobqueue import MemoryJobQueue
+from redact.services.storage import create_upload_urls
+from redact.sqlschema.tables import Batch, BatchStatus
+
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+PNG = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
 
 
 @pytest.mark.asyncio
@@ -22,6 +33,11 @@ async def test_create_prediction_failure(client, mock_session):
         ) as mock_create_batch,
         patch("app.main.update_batch_status_async") as mock_update_batch,
         patch("app.main.get_async_session", return_value=mock_session),
+        patch(
+            "redact.services.ingest.upload_file",
+            new_callable=AsyncMock,
+            side_effect=Exception("storage unavailable"),
+        ),
         patch("builtins.open", create=True),
         patch("os.path.exists", return_value=False),
         patch("shutil.copyfileobj"),
@@ -32,7 +48,7 @@ async def test_create_prediction_failure(client, mock_session):
         mock_job.id = fake_job_id
 
         # Create fake file data
-        fake_image = BytesIO(b"fake image content")
+        fake_image = BytesIO(JPEG + b"fake image content")
         files = [("files", ("test.jpg", fake_image, "image/jpeg"))]
 
         # Act: Make the request
@@ -64,7 +80,7 @@ async def test_create_prediction_invalid_file_type(client):
 async def test_create_prediction_file_too_large(client):
     """Test rejection of files that are too large"""
 
-    huge_content = b"x" * (11 * 1024 * 1024)
+    huge_content = JPEG + b"x" * (11 * 1024 * 1024)
     fake_file = BytesIO(huge_content)
     files = [("files", ("huge.jpg", fake_file, "image/jpeg"))]
 
@@ -84,6 +100,11 @@ async def test_create_prediction_multiple_files_failure(client):
         ) as mock_create_batch,
         patch("app.main.update_batch_status_async") as mock_update_batch,
         patch("app.main.get_async_session"),
+        patch(
+            "redact.services.ingest.upload_file",
+            new_callable=AsyncMock,
+            side_effect=Exception("storage unavailable"),
+        ),
         patch("builtins.open", create=True),
         patch("os.path.exists", return_value=False),
         patch("shutil.copyfileobj"),
@@ -94,10 +115,432 @@ async def test_create_prediction_multiple_files_failure(client):
 
         # Multiple files
         files = [
-            ("files", ("test1.jpg", BytesIO(b"content1"), "image/jpeg")),
-            ("files", ("test2.png", BytesIO(b"content2"), "image/png")),
+            ("files", ("test1.jpg", BytesIO(JPEG + b"content1"), "image/jpeg")),
+            ("files", ("test2.png", BytesIO(PNG + b"content2"), "image/png")),
         ]
 
         response = await client.post("/predict", files=files)
 
         assert response.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_create_prediction_sniffs_type_from_content(client):
+    """Test a file is rejected by its bytes, not its declared content type"""
+
+    files = [("files", ("test.jpg", BytesIO(b"%PDF-1.7 not an image"), "image/jpeg"))]
+
+    with patch(
+        "redact.services.ingest.upload_file", new_callable=AsyncMock
+    ) as mock_upload:
+        response = await client.post("/predict", files=files)
+
+    assert response.status_code == 400
+    assert "Invalid file type" in response.json()["detail"]
+    mock_upload.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_create_prediction_uploads_every_file(client):
+    """Test each file is uploaded with its sniffed type and hashed for the batch"""
+    queue = MemoryJobQueue()
+
+    with (
+        patch(
+            "app.main.create_batch_and_files", new_callable=AsyncMock
+        ) as mock_create_batch,
+        patch("app.main.update_batch_status_async", new_callable=AsyncMock),
+        patch(
+            "redact.services.ingest.upload_file", new_callable=AsyncMock
+        ) as mock_upload,
+        patch("app.main.get_job_queue", return_value=queue),
+    ):
+        mock_create_batch.return_value = uuid4()
+
+        files = [
+            ("files", ("a.jpg", BytesIO(JPEG + b"a"), "application/octet-stream")),
+            ("files", ("b.png", BytesIO(PNG + b"b"), "image/png")),
+        ]
+        response = await client.post(
+            "/predict", files=files, data={"redact_mode": "blur"}
+        )
+
+    assert response.status_code == 200
+    [job] = queue.jobs.values()
+    assert job.pages == 2
+    uploaded = {call.args[0]: call.args[2] for call in mock_upload.await_args_list}
+    assert uploaded == {"uploads/a.jpg": "image/jpeg", "uploads/b.png": "image/png"}
+
+    ingested, _, redact_mode, hashes = mock_create_batch.call_args.args
+    assert [f.filename for f in ingested] == ["a.jpg", "b.png"]
+    assert redact_mode == "blur"
+    assert hashes == [
+        hashlib.sha256(JPEG + b"a").hexdigest(),
+        hashlib.sha256(PNG + b"b").hexdigest(),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_prediction_stores_label_options(client):
+    """Test a batch's own labels and threshold are normalized and stored"""
+    with (
+        patch(
+            "app.main.create_batch_and_files", new_callable=AsyncMock
+        ) as mock_create_batch,
+        patch("app.main.update_batch_status_async", new_callable=AsyncMock),
+        patch("redact.services.ingest.upload_file", new_callable=AsyncMock),
+        patch("app.main.get_job_queue", return_value=MemoryJobQueue()),
+    ):
+        mock_create_batch.return_value = uuid4()
+
+        files = [("files", ("a.jpg", BytesIO(JPEG + b"a"), "image/jpeg"))]
+        data = {"labels": '["Phone Number", "email", "email"]', "threshold": "0.5"}
+        response = await client.post("/predict", files=files, data=data)
+
+    assert response.status_code == 200
+    assert mock_create_batch.call_args.kwargs == {
+        "labels": ["email", "phone number"],
+        "threshold": 0.5,
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"labels": "email"},
+        {"labels": "[]"},
+        {"threshold": "1.5"},
+        {"redact_mode": "smudge"},
+    ],
+)
+async def test_create_prediction_rejects_bad_label_options(client, data):
+    """Test bad options are refused before any file reaches storage"""
+    with patch(
+        "redact.services.ingest.upload_file", new_callable=AsyncMock
+    ) as mock_upload:
+        files = [("files", ("a.jpg", BytesIO(JPEG + b"a"), "image/jpeg"))]
+        response = await client.post("/predict", files=files, data=data)
+
+    assert response.status_code == 422
+    mock_upload.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_prediction_rejects_fields_after_files(client):
+    """Test options sent after a file are refused, they can't be checked in time"""
+    body = (
+        b"--b\r\n"
+        b'Content-Disposition: form-data; name="files"; filename="a.jpg"\r\n'
+        b"Content-Type: image/jpeg\r\n\r\n" + JPEG + b"a\r\n"
+        b"--b\r\n"
+        b'Content-Disposition: form-data; name="redact_mode"\r\n\r\n'
+        b"blur\r\n"
+        b"--b--\r\n"
+    )
+
+    with patch("redact.services.ingest.upload_file", new_callable=AsyncMock):
+        response = await client.post(
+            "/predict",
+            content=body,
+            headers={"content-type": "multipart/form-data; boundary=b"},
+        )
+
+    assert response.status_code == 400
+    assert "must come before the files" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_create_prediction_accepts_documents(client):
+    """Test PDF and TIFF uploads are sniffed and stored as documents"""
+    with (
+        patch(
+            "app.main.create_batch_and_files", new_callable=AsyncMock
+        ) as mock_create_batch,
+        patch("app.main.update_batch_status_async", new_callable=AsyncMock),
+        patch(
+            "redact.services.ingest.upload_file", new_callable=AsyncMock
+        ) as mock_upload,
+        patch("app.main.get_job_queue", return_value=MemoryJobQueue()),
+    ):
+        mock_create_batch.return_value = uuid4()
+
+        files = [
+            ("files", ("a.pdf", BytesIO(b"%PDF-1.7\n" + b"x" * 16), "text/plain")),
+            ("files", ("b.tif", BytesIO(b"II*\x00" + b"x" * 16), "image/tiff")),
+        ]
+        response = await client.post("/predict", files=files)
+
+    assert response.status_code == 200
+    uploaded = {call.args[0]: call.args[2] for call in mock_upload.await_args_list}
+    assert uploaded == {
+        "uploads/a.pdf": "application/pdf",
+        "uploads/b.tif": "image/tiff",
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_prediction_rejects_misnamed_documents(client):
+    """Test an image named like a document is rejected, the worker goes by name"""
+    files = [("files", ("scan.pdf", BytesIO(JPEG + b"a"), "application/pdf"))]
+
+    response = await client.post("/predict", files=files)
+
+    assert response.status_code == 400
+    assert "Invalid file type" in response.json()["detail"]
+
+
+@pytest.fixture
+def session_override(mock_session):
+    """Serves mock_session to endpoints through the session dependency"""
+    app.dependency_overrides[get_async_session] = lambda: mock_session
+    yield mock_session
+    app.dependency_overrides.pop(get_async_session)
+
+
+@pytest.mark.asyncio
+async def test_direct_upload_roundtrip(client, fake_storage, session_override):
+    """Test a batch created with signed URLs commits once the client uploaded"""
+    queue = MemoryJobQueue()
+    batch_id = uuid4()
+    session_override.get.return_value = Batch(
+        id=batch_id, status=BatchStatus.awaiting_upload
+    )
+
+    with (
+        patch(
+            "app.main.create_batch_and_files", new_callable=AsyncMock
+        ) as mock_create_batch,
+        patch(
+            "app.main.get_batch_files",
+            new_callable=AsyncMock,
+            return_value=[("a.jpg",), ("b.png",)],
+        ),
+        patch(
+            "app.main.transition_batch_status", new_callable=AsyncMock
+        ) as mock_transition,
+        patch("app.main.get_job_queue", return_value=queue),
+    ):
+        mock_create_batch.return_value = batch_id
+
+        response = await client.post(
+            "/batches", json={"files": [{"filename": "a.jpg"}, {"filename": "b.png"}]}
+        )
+        assert response.status_code == 200
+        uploads = response.json()["uploads"]
+        assert (
+            mock_create_batch.call_args.kwargs["status"] == BatchStatus.awaiting_upload
+        )
+
+        # Only one file uploaded: commit is refused and names what's missing
+        storage_client = AsyncClient(transport=MockTransport(fake_storage.handle))
+        await storage_client.put(
+            uploads[0]["signed_url"],
+            content=JPEG,
+            headers={"content-type": "image/jpeg"},
+        )
+        response = await client.post(f"/batches/{batch_id}/commit")
+        assert response.status_code == 409
+        assert response.json()["detail"]["missing"] == ["uploads/b.png"]
+
+        await storage_client.put(
+            uploads[1]["signed_url"], content=PNG, headers={"content-type": "image/png"}
+        )
+        response = await client.post(f"/batches/{batch_id}/commit")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    mock_transition.assert_awaited_once_with(
+        batch_id, BatchStatus.awaiting_upload, BatchStatus.uploaded
+    )
+    [job] = queue.jobs.values()
+    assert (job.batch_id, job.pages) == (batch_id, 2)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_commits_queue_once(client, session_override):
+    """Test two commits racing past the status check enqueue the batch once"""
+    queue = MemoryJobQueue()
+    batch_id = uuid4()
+    session_override.get.return_value = Batch(
+        id=batch_id, status=BatchStatus.awaiting_upload
+    )
+
+    with (
+        patch(
+            "app.main.get_batch_files",
+            new_callable=AsyncMock,
+            return_value=[("a.jpg",)],
+        ),
+        patch("app.main.files_exist", new_callable=AsyncMock, return_value=[True]),
+        patch(
+            "app.main.files_info", new_callable=AsyncMock, return_value=[{"size": 12}]
+        ),
+        patch("app.main.read_heads", new_callable=AsyncMock, return_value=[JPEG]),
+        patch(
+            "app.main.transition_batch_status",
+            new_callable=AsyncMock,
+            side_effect=[True, False],  # The conditional UPDATE matches once
+        ),
+        patch("app.main.get_job_queue", return_value=queue),
+    ):
+        responses = await asyncio.gather(
+            client.post(f"/batches/{batch_id}/commit"),
+            client.post(f"/batches/{batch_id}/commit"),
+        )
+
+    assert sorted(r.status_code for r in responses) == [200, 409]
+    assert len(queue.jobs) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "filename, data, status",
+    [
+        ("a.jpg", JPEG + b"\0" * 64, 413),  # Over the size limit
+        ("a.jpg", b"GIF89a" + b"\0" * 6, 400),  # Not an allowed type
+        ("a.pdf", JPEG, 400),  # Image named as a document
+    ],
+)
+async def test_commit_checks_uploads_like_predict(
+    client, fake_storage, session_override, filename, data, status
+):
+    """Test a direct upload over the limits isn't queued and can be retried"""
+    batch_id = uuid4()
+    session_override.get.return_value = Batch(
+        id=batch_id, status=BatchStatus.awaiting_upload
+    )
+    [upload] = await create_upload_urls([f"uploads/{filename}"])
+    storage_client = AsyncClient(transport=MockTransport(fake_storage.handle))
+    await storage_client.put(upload["signed_url"], content=data)
+
+    with (
+        patch(
+            "app.main.get_batch_files",
+            new_callable=AsyncMock,
+            return_value=[(filename,)],
+        ),
+        patch("app.main.MAX_UPLOAD_BYTES", 64),
+        patch(
+            "app.main.transition_batch_status", new_callable=AsyncMock
+        ) as mock_transition,
+    ):
+        response = await client.post(f"/batches/{batch_id}/commit")
+
+    assert response.status_code == status
+    mock_transition.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_check_reports_partial_failure(client, session_override):
+    """Test a batch where only some files failed says so"""
+    session_override.execute.return_value = MagicMock(
+        scalars=MagicMock(
+            return_value=MagicMock(
+                one=MagicMock(return_value=BatchStatus.partially_failed)
+            )
+        )
+    )
+
+    response = await client.get(f"/check/{uuid4()}")
+
+    assert response.json() == {"status": "partially_failed"}
+
+
+@pytest.mark.asyncio
+async def test_create_batch_signing_failure_stores_nothing(client):
+    """Test a batch whose upload URLs can't be signed leaves no rows behind"""
+    with (
+        patch(
+            "app.main.create_upload_urls",
+            new_callable=AsyncMock,
+            side_effect=RuntimeError("storage down"),
+        ),
+        patch(
+            "app.main.create_batch_and_files", new_callable=AsyncMock
+        ) as mock_create_batch,
+    ):
+        response = await client.post(
+            "/batches", json={"files": [{"filename": "a.jpg"}]}
+        )
+
+    assert response.status_code == 502
+    mock_create_batch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_batch_rejects_unknown_extension(client):
+    """Test direct uploads are limited to image and document extensions"""
+
+    response = await client.post("/batches", json={"files": [{"filename": "a.gif"}]})
+
+    assert response.status_code == 400
+    assert "Invalid file type" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_enqueue_failure_is_reported(client):
+    """Test a batch that can't be queued fails the request and the batch"""
+    batch_id = uuid4()
+    queue = MagicMock(enqueue=AsyncMock(side_effect=RuntimeError("queue down")))
+
+    with (
+        patch(
+            "app.main.create_batch_and_files",
+            new_callable=AsyncMock,
+            return_value=batch_id,
+        ),
+        patch(
+            "app.main.update_batch_status_async", new_callable=AsyncMock
+        ) as mock_update_batch,
+        patch("redact.services.ingest.upload_file", new_callable=AsyncMock),
+        patch("app.main.get_job_queue", return_value=queue),
+    ):
+        files = [("files", ("a.jpg", BytesIO(JPEG + b"a"), "image/jpeg"))]
+        response = await client.post("/predict", files=files)
+
+    assert response.status_code == 503
+    mock_update_batch.assert_awaited_with(batch_id, BatchStatus.failed)
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_prometheus_text(client):
+    """Test /metrics is scrapeable and lists the pipeline metrics"""
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "redact_stage_seconds" in response.text
+    assert "redact_db_seconds" in response.text
+
+
+@pytest.mark.asyncio
+async def test_download_zips_only_finished_files(client, session_override):
+    """Test a partially failed batch downloads its redacted files, nothing else"""
+    with (
+        patch(
+            "app.main.get_redacted_filenames",
+            new_callable=AsyncMock,
+            return_value=["a_redacted.jpg"],
+        ),
+        patch(
+            "app.main.download_file", new_callable=AsyncMock, return_value=b"jpeg"
+        ) as mock_download,
+    ):
+        response = await client.get(f"/download/{uuid4()}")
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["a_redacted.jpg"]
+    mock_download.assert_awaited_once_with("redacted/a_redacted.jpg")
+
+
+@pytest.mark.asyncio
+async def test_download_without_finished_files_is_refused(client, session_override):
+    """Test nothing is streamed when no file of the batch is ready"""
+    with patch(
+        "app.main.get_redacted_filenames", new_callable=AsyncMock, return_value=[]
+    ):
+        response = await client.get(f"/download/{uuid4()}")
+
+    assert response.status_code == 409
@@ -0,0 +1,54 @@
+# tests/test_archive.py
+import asyncio
+import io
+import zipfile
+
+import pytest
+
+from redact.services.archive import stream_zip
+
+
+@pytest.mark.asyncio
+async def test_stream_zip_roundtrip():
+    """Test the streamed archive is a valid zip with entries in order"""
+    files = {
+        "redacted/a_redacted.jpg": b"\xff\xd8" + b"a" * 5000,
+        "redacted/b_redacted.txt": b"b" * 5000,
+        "redacted/c_redacted.png": b"\x89PNG" + b"c" * 10,
+    }
+
+    async def fetch(path):
+        await asyncio.sleep(0.01 if path.endswith("a_redacted.jpg") else 0)
+        return files[path]
+
+    chunks = [chunk async for chunk in stream_zip(list(files), fetch, prefetch=2)]
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.namelist() == ["a_redacted.jpg", "b_redacted.txt", "c_redacted.png"]
+        assert zf.getinfo("a_redacted.jpg").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("b_redacted.txt").compress_type == zipfile.ZIP_DEFLATED
+        for path, data in files.items():
+            assert zf.read(path.split("/")[-1]) == data
+
+
+@pytest.mark.asyncio
+async def test_stream_zip_yields_before_all_downloads_finish():
+    """Test the first file is streamed while later downloads are still pending"""
+    release_last = asyncio.Event()
+
+    async def fetch(path):
+        if path == "redacted/last.jpg":
+            await release_last.wait()
+        return b"data"
+
+    stream = stream_zip(["redacted/first.jpg", "redacted/last.jpg"], fetch)
+    first_chunk = await stream.__anext__()
+
+    assert b"first.jpg" in first_chunk
+    assert not release_last.is_set()
+
+    release_last.set()
+    rest = [chunk async for chunk in stream]
+
+    with zipfile.ZipFile(io.BytesIO(first_chunk + b"".join(rest))) as zf:
+        assert zf.namelist() == ["first.jpg", "last.jpg"]
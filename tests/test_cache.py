@@ -0,0 +1,58 @@
+# tests/test_cache.py
+import os
+
+import numpy as np
+import pytest
+
+from redact.workers.cache import ImageCache
+
+
+def test_image_cache_spills_least_recently_used(tmp_path):
+    """Test entries past the byte budget are spilled to disk, oldest first"""
+    # Arrange: Budget fits two 1000 byte images
+    images = {f"file{i}": np.full((10, 100), i, np.uint8) for i in range(3)}
+
+    with ImageCache(max_bytes=2000, spill_dir=str(tmp_path)) as cache:
+        # Act
+        cache.put("file0", images["file0"])
+        cache.put("file1", images["file1"])
+        cache.get("file0")  # file0 is now the most recently used
+        cache.put("file2", images["file2"])
+
+        # Assert: file1 was evicted to disk, nothing lost
+        assert cache.mem_bytes == 2000
+        assert len(cache) == 3
+        assert "file1" in cache._spilled
+        assert os.path.exists(cache._spilled["file1"])
+        for key, image in images.items():
+            np.testing.assert_array_equal(cache.get(key), image)
+
+
+def test_image_cache_pop_removes_entry(tmp_path):
+    """Test pop returns raw bytes and spilled arrays, then forgets them"""
+    with ImageCache(max_bytes=10, spill_dir=str(tmp_path)) as cache:
+        cache.put("raw", b"x" * 20)
+        cache.put("decoded", np.zeros((4, 4), np.uint8))
+
+        spilled_path = cache._spilled["raw"]
+
+        assert cache.pop("raw") == b"x" * 20
+        assert cache.pop("decoded").shape == (4, 4)
+        assert len(cache) == 0
+        assert cache.mem_bytes == 0
+        assert not os.path.exists(spilled_path)
+
+        with pytest.raises(KeyError):
+            cache.pop("raw")
+
+
+def test_image_cache_close_removes_spill_dir(tmp_path):
+    """Test closing the cache cleans up its temp dir"""
+    cache = ImageCache(max_bytes=0, spill_dir=str(tmp_path))
+    cache.put("a", b"abc")
+    cache.put("b", b"def")
+    spill_dir = cache._dir
+
+    cache.close()
+
+    assert not os.path.exists(spill_dir)
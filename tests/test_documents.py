@@ -0,0 +1,104 @@
+# tests/test_documents.py
+import asyncio
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import cv2
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from redact.workers.documents import (  # noqa: E402
+    build_pdf,
+    open_document,
+    render_page,
+)
+
+DPI = 144  # 2 pixels per PDF point
+
+
+def text_pdf(pages=2):
+    """A digital-born PDF, one line of text per page"""
+    document = fitz.open()
+    for i in range(pages):
+        page = document.new_page(width=300, height=200)
+        page.insert_text((50, 100), f"Page {i} for Jane Doe", fontsize=12)
+    return document.tobytes()
+
+
+def scanned_pdf():
+    """A PDF whose only content is a full-page picture"""
+    document = fitz.open()
+    page = document.new_page(width=300, height=200)
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 600, 400), False)
+    pixmap.set_rect(pixmap.irect, (255, 255, 255))
+    page.insert_image(page.rect, pixmap=pixmap)
+    return document.tobytes()
+
+
+def test_text_layer_in_raster_coordinates():
+    """Test embedded words skip OCR, boxed in the rendered page's pixels"""
+    document = open_document(text_pdf(), "doc.pdf")
+    image, text = render_page(document, 1, DPI)
+
+    assert image.shape == (400, 600, 3)
+    assert text.texts == ["Page", "1", "for", "Jane", "Doe"]
+    x1, y1, x2, y2 = text.boxes[0]
+    assert 95 <= x1 <= 105 and y2 <= 210 and y1 >= 170  # Baseline at 100pt
+    assert text.scale == 1
+
+
+def test_image_pages_need_ocr():
+    """Test pages that are pictures come without a text layer"""
+    _, text = render_page(open_document(scanned_pdf(), "scan.pdf"), 0, DPI)
+
+    assert text is None
+
+
+def test_build_pdf_keeps_page_size():
+    """Test redacted pages come back as a PDF at the original size"""
+    image, _ = render_page(open_document(text_pdf(), "doc.pdf"), 0, DPI)
+    jpeg = cv2.imencode(".jpg", image)[1].tobytes()
+    output = fitz.open(stream=build_pdf([(jpeg, 600, 400)] * 3, DPI), filetype="pdf")
+
+    assert output.page_count == 3
+    assert (output[0].rect.width, output[0].rect.height) == (300, 200)
+
+
+def test_pipeline_redacts_pdf_without_ocr():
+    """Test a text PDF streams page by page into one redacted PDF"""
+    pytest.importorskip("pytesseract")
+    from redact.workers import inference
+
+    def fake_ner(texts, labels, batch_size, threshold):
+        return [
+            [
+                {
+                    "start": text.index("Jane"),
+                    "end": text.index("Jane") + len("Jane Doe"),
+                    "text": "Jane Doe",
+                    "label": "person",
+                }
+            ]
+            for text in texts
+        ]
+
+    page = inference.Page(str(uuid4()), "contract.pdf", batch_id=uuid4())
+    with (
+        patch.object(inference, "download_file", AsyncMock(return_value=text_pdf(3))),
+        patch.object(inference, "upload_file", new_callable=AsyncMock) as upload,
+        patch.object(inference, "batch_predict_entities", side_effect=fake_ner),
+        patch.object(inference, "get_max_len", return_value=384),
+        patch.object(inference, "get_ocr_pool", side_effect=AssertionError("OCR ran")),
+    ):
+        failed = asyncio.run(inference.run_pipeline([page]))
+
+    assert failed == []
+    assert page.redact_filename == "contract_redacted.pdf"
+    assert [result.entity_of(3) for result in page.pages] == ["person"] * 3
+
+    path, pdf_bytes, content_type = upload.await_args.args
+    assert (path, content_type) == ("redacted/contract_redacted.pdf", "application/pdf")
+    redacted = fitz.open(stream=pdf_bytes, filetype="pdf")
+    assert redacted.page_count == 3
+    assert redacted[0].get_text().strip() == ""  # Pages are images, no text left
@@ -0,0 +1,181 @@
+# tests/test_inference.py
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytesseract")
+
+import cv2  # noqa: E402
+
+from redact.services.ocrdata import OCRResult  # noqa: E402
+from redact.services.pagecache import hash_content  # noqa: E402
+from redact.sqlschema.tables import BatchStatus, FileStatus, RedactMode  # noqa: E402
+from redact.workers import inference  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_batches_are_marked_by_how_many_files_failed():
+    """Test all, some and none of a batch's files failing"""
+    batches = [uuid4(), uuid4(), uuid4()]
+    rows = [
+        (batch_id, uuid4(), f"{name}.jpg", None, RedactMode.solid, None, None)
+        for batch_id, names in zip(batches, (["a", "b"], ["c", "d"], ["e"]))
+        for name in names
+    ]
+    failed = [str(rows[0][1]), str(rows[1][1]), str(rows[2][1])]
+
+    async def run_pipeline(pages):
+        for page in pages:
+            if page.file_id not in failed:
+                page.result = OCRResult.from_columns([], [], [], [], [], [])
+                page.redact_filename = f"{page.filename}_redacted.jpg"
+        return failed
+
+    with (
+        patch.object(inference, "AsyncSessionLocal"),
+        patch.object(inference, "get_files_for_batches", AsyncMock(return_value=rows)),
+        patch.object(inference, "run_pipeline", side_effect=run_pipeline),
+        patch.object(inference, "update_batch_status_async", AsyncMock()) as status,
+        patch.object(inference, "update_files_bulk", AsyncMock()) as write_back,
+        patch.object(inference, "PAGE_CACHE_ENABLED", False),
+    ):
+        await inference.full_inference_many(batches)
+
+    final = {call.args[0]: call.args[1] for call in status.await_args_list[3:]}
+    assert final == {
+        batches[0]: BatchStatus.failed,
+        batches[1]: BatchStatus.partially_failed,
+        batches[2]: BatchStatus.completed,
+    }
+    statuses = [row["status"] for row in write_back.await_args.args[0]]
+    assert statuses == [FileStatus.failed] * 3 + [FileStatus.complete] * 2
+
+
+@pytest.mark.asyncio
+async def test_replaced_upload_is_not_processed():
+    """Test bytes that don't match the ingest hash fail the page, never cached"""
+    page = inference.Page(str(uuid4()), "a.jpg", hash_content(b"mine"))
+
+    with patch.object(inference, "download_file", AsyncMock(return_value=b"theirs")):
+        with pytest.raises(ValueError, match="changed since it was uploaded"):
+            await inference.download_stage(page)
+
+    with patch.object(inference, "download_file", AsyncMock(return_value=b"mine")):
+        assert (await inference.download_stage(page)).buffer == b"mine"
+
+
+@pytest.mark.asyncio
+async def test_image_runs_through_the_pipeline():
+    """Test an uploaded JPEG comes back with only its entity words blacked out"""
+    image = np.full((120, 240, 3), 255, dtype=np.uint8)
+    upload = cv2.imencode(".jpg", image)[1].tobytes()
+    words = ["Call", "Alice"]  # Alice at x 100-179, y 40-69
+    boxes = [(20, 40, 60, 30), (100, 40, 80, 30)]
+
+    def ocr_image(ocr_input, scale):
+        columns = [[round(box[i] * scale) for box in boxes] for i in range(4)]
+        return OCRResult.from_columns(words, *columns, [95, 95], scale=scale)
+
+    def batch_predict_entities(texts, labels, batch_size, threshold):
+        return [
+            [
+                {
+                    "start": t.index("Alice"),
+                    "end": t.index("Alice") + 5,
+                    "label": "person",
+                }
+            ]
+            for t in texts
+        ]
+
+    page = inference.Page(str(uuid4()), "a.jpg", hash_content(upload))
+    with (
+        ThreadPoolExecutor(1) as pool,
+        patch.object(inference, "download_file", AsyncMock(return_value=upload)),
+        patch.object(inference, "upload_file", AsyncMock()) as upload_file,
+        patch.object(inference, "get_ocr_pool", return_value=pool),
+        patch.object(inference, "ocr_image", ocr_image),
+        patch.object(inference, "batch_predict_entities", batch_predict_entities),
+        patch.object(inference, "get_max_len", return_value=384),
+    ):
+        failed = await inference.run_pipeline([page])
+
+    assert failed == []
+    assert page.redact_filename == "a_redacted.jpg"
+    assert page.result.texts == words
+    path, data, content_type = upload_file.await_args.args
+    assert (path, content_type) == ("redacted/a_redacted.jpg", "image/jpeg")
+    redacted = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert redacted[45:65, 105:175].max() < 40  # Alice, blacked out
+    assert redacted[45:65, 25:75].min() > 215  # Call, untouched
+
+
+def test_entities_are_batched_across_files():
+    """Test every file's text goes through one model call per label set"""
+
+    def page(words, labels=inference.DEFAULT_LABELS):
+        n = len(words)
+        result = OCRResult.from_columns(
+            words, range(n), [0] * n, [1] * n, [1] * n, [90] * n
+        )
+        return inference.Page(str(uuid4()), "a.jpg", labels=labels, result=result)
+
+    pages = [
+        page(["Alice", "paid"]),
+        page(["call", "Bob"]),
+        page(["Carol", "wrote"], labels=("person",)),
+    ]
+    calls = []
+
+    def batch_predict_entities(texts, labels, batch_size, threshold):
+        calls.append((list(texts), tuple(labels)))
+        return [
+            [
+                {
+                    "start": t.index(name),
+                    "end": t.index(name) + len(name),
+                    "label": "person",
+                }
+                for name in ("Alice", "Bob", "Carol")
+                if name in t
+            ]
+            for t in texts
+        ]
+
+    with (
+        patch.object(inference, "batch_predict_entities", batch_predict_entities),
+        patch.object(inference, "get_max_len", return_value=384),
+    ):
+        inference.tag_entities(pages)
+
+    # The two files on the default labels share one call
+    assert sorted(texts for texts, _ in calls) == [
+        ["Alice paid", "call Bob"],
+        ["Carol wrote"],
+    ]
+    tagged = [[p.result.entity_of(i) for i in range(len(p.result))] for p in pages]
+    assert tagged == [["person", None], [None, "person"], ["person", None]]
+
+
+@pytest.mark.asyncio
+async def test_ocr_pool_is_kept_warm_until_it_breaks():
+    """Test batches share one OCR pool, and a dead worker gets a fresh one"""
+    with patch.object(inference, "_ocr_pool", None):
+        pool = inference.get_ocr_pool()
+        assert inference.get_ocr_pool() is pool
+
+        broken = MagicMock()
+        broken.submit.side_effect = BrokenProcessPool
+        page = inference.Page(str(uuid4()), "a.jpg", ocr_input=np.zeros((8, 8)))
+        with (
+            patch.object(inference, "get_ocr_pool", return_value=broken),
+            pytest.raises(BrokenProcessPool),
+        ):
+            await inference.ocr_stage(page)
+
+        assert inference._ocr_pool is None
+    pool.shutdown()
@@ -0,0 +1,146 @@
+# tests/test_jobqueue.py
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from redact.services import jobqueue
+from redact.services.jobqueue import (
+    JobQueue,
+    MemoryJobQueue,
+    ModalJobQueue,
+    PostgresJobQueue,
+)
+from redact.sqlschema.tables import BatchStatus, JobStatus
+from redact.workers.runner import run_worker
+
+
+class Clock:
+    """Manually advanced time source"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_claim_leases_job_to_one_worker():
+    """Test a claimed job is invisible to others until completed"""
+    queue = MemoryJobQueue()
+    batch_id = uuid4()
+    await queue.enqueue(batch_id, pages=3)
+
+    job = await queue.claim("w1")
+    assert (job.batch_id, job.pages, job.attempts) == (batch_id, 3, 1)
+    assert await queue.claim("w2") is None
+
+    await queue.complete(job, "w1")
+    assert queue.jobs[job.id].status == JobStatus.done
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed_and_fences_old_worker():
+    """Test the visibility timeout hands a stalled job to another worker"""
+    clock = Clock()
+    queue = MemoryJobQueue(clock=clock)
+    await queue.enqueue(uuid4())
+
+    stale = await queue.claim("w1", lease_seconds=10)
+    clock.now += 11
+    fresh = await queue.claim("w2", lease_seconds=10)
+
+    assert fresh.id == stale.id and fresh.attempts == 2
+    assert not await queue.extend(stale, "w1")
+    await queue.complete(stale, "w1")  # No-op, w1 lost the lease
+    assert queue.jobs[fresh.id].status == JobStatus.running
+
+
+@pytest.mark.asyncio
+async def test_fail_backs_off_then_gives_up():
+    """Test failures are retried after a delay until max_attempts"""
+    clock = Clock()
+    queue = MemoryJobQueue(max_attempts=2, clock=clock)
+    await queue.enqueue(uuid4())
+
+    job = await queue.claim("w1")
+    assert await queue.fail(job, "w1", "boom", retry_delay=5)
+    assert await queue.claim("w1") is None  # Still backing off
+
+    clock.now += 5
+    job = await queue.claim("w1")
+    assert job.final_attempt
+    assert not await queue.fail(job, "w1", "boom again")
+    assert queue.jobs[job.id].status == JobStatus.failed
+    assert queue.jobs[job.id].last_error == "boom again"
+
+
+def test_postgres_claim_skips_locked_rows():
+    """Test the claim query locks its row and skips rows locked elsewhere"""
+    sql = str(
+        PostgresJobQueue.claim_statement(datetime.utcnow()).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "LIMIT" in sql
+
+
+@pytest.mark.asyncio
+async def test_runner_retries_then_completes():
+    """Test the runner requeues a failed batch and completes it on retry"""
+    queue = MemoryJobQueue()
+    batch_id = uuid4()
+    job_id = await queue.enqueue(batch_id)
+    stop = asyncio.Event()
+    calls = []
+
+    async def handler(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        stop.set()
+
+    with patch(
+        "redact.workers.runner.update_batch_status_async", new_callable=AsyncMock
+    ) as mock_update_batch:
+        await asyncio.wait_for(
+            run_worker(
+                handler, queue, "w1", poll_interval=0.01, retry_delay=0, stop=stop
+            ),
+            timeout=2,
+        )
+
+    assert calls == [batch_id, batch_id]
+    assert queue.jobs[job_id].status == JobStatus.done
+    mock_update_batch.assert_awaited_once_with(batch_id, BatchStatus.uploaded)
+
+
+@pytest.mark.asyncio
+async def test_runner_refuses_a_push_only_backend():
+    """Test a worker fails fast on the Modal backend instead of polling it"""
+    handler = AsyncMock()
+
+    with (
+        patch.object(jobqueue, "_job_queue", ModalJobQueue()),
+        patch.object(jobqueue, "JOB_QUEUE_BACKEND", "modal"),
+    ):
+        with pytest.raises(ValueError, match="postgres"):
+            await asyncio.wait_for(run_worker(handler), 1)
+
+    handler.assert_not_called()
+
+
+def test_queues_must_implement_their_interface():
+    """Test a backend missing part of its interface can't be created"""
+
+    class Partial(JobQueue):
+        pass
+
+    with pytest.raises(TypeError):
+        Partial()
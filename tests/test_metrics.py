@@ -0,0 +1,93 @@
+# tests/test_metrics.py
+import os
+import socket
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from redact.core.metrics import (
+    grouping_key,
+    instrument_engine,
+    push_metrics,
+    size_bucket,
+    timed,
+)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_size_bucket_rounds_up_to_powers_of_two():
+    """Test batch sizes collapse to a few label values"""
+    assert [size_bucket(n) for n in (0, 1, 2, 3, 4, 5, 9)] == [
+        "1",
+        "1",
+        "2",
+        "4",
+        "4",
+        "8",
+        "16",
+    ]
+
+
+def test_timed_observes_even_on_error():
+    """Test a failing step is still timed, under its stage and batch size"""
+    before = sample("redact_stage_seconds_count", stage="test", batch_size="8")
+
+    with pytest.raises(ValueError):
+        with timed("test", 6):
+            raise ValueError
+
+    after = sample("redact_stage_seconds_count", stage="test", batch_size="8")
+    assert after == before + 1
+
+
+def test_engine_round_trips_are_timed():
+    """Test every statement is observed, labelled by its verb"""
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    before = sample("redact_db_seconds_count", operation="select")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("  select 2"))
+
+    assert sample("redact_db_seconds_count", operation="select") == before + 2
+
+
+def test_stage_queue_depth_ignores_the_sentinel():
+    """Test the queue gauge follows items in and out, but not the end marker"""
+    pytest.importorskip("pytesseract")
+    from redact.workers import inference
+
+    queue = inference.StageQueue("test", 4)
+    queue.put_nowait("a")
+    queue.put_nowait("b")
+    queue.put_nowait(inference._DONE)
+    assert sample("redact_queue_depth", stage="test") == 2
+
+    queue.get_nowait()
+    assert sample("redact_queue_depth", stage="test") == 1
+
+
+def test_pushes_reuse_one_group_per_worker(monkeypatch, tmp_path):
+    """Test the Pushgateway group doesn't change with the pid"""
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    with patch("multiprocessing.current_process") as process:
+        process.return_value.name = "runner-1"
+        assert grouping_key() == {
+            "instance": socket.gethostname(),
+            "process": "runner-1",
+        }
+
+    # A shared registry is pushed whole by every process on the node
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    assert grouping_key("modal") == {"instance": "modal"}
+
+    with patch("redact.core.metrics.push_to_gateway") as push:
+        push_metrics("gateway:9091", "redact-worker", "modal")
+    assert push.call_args.kwargs["grouping_key"] == {"instance": "modal"}
+    assert str(os.getpid()) not in str(push.call_args)
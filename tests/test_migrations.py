@@ -0,0 +1,45 @@
+# tests/test_migrations.py
+import re
+
+from redact.core.migrations import MIGRATIONS
+from redact.sqlschema.tables import Batch, Files, FileStatus
+
+# Schema as first deployed, created by create_all; anything newer needs a migration
+ORIGINAL_COLUMNS = {
+    "files": {
+        "file_id",
+        "batch_id",
+        "filename",
+        "json_data",
+        "redact_filename",
+        "status",
+        "created_at",
+    },
+    "batch": {"id", "status", "created_at"},
+}
+ORIGINAL_FILE_STATUSES = {"uploaded", "processing", "complete", "unusable", "failed"}
+
+
+def test_every_new_column_is_migrated():
+    """Test columns added to existing tables have an ADD COLUMN migration"""
+    added = set(
+        re.findall(
+            r"ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+)", " ".join(MIGRATIONS)
+        )
+    )
+    for table in (Files.__table__, Batch.__table__):
+        for column in table.columns:
+            if column.name not in ORIGINAL_COLUMNS[table.name]:
+                assert (table.name, column.name) in added
+
+
+def test_every_new_status_is_migrated():
+    """Test enum values added to an existing type have an ADD VALUE migration"""
+    added = set(
+        re.findall(
+            r"ALTER TYPE filestatus ADD VALUE IF NOT EXISTS '(\w+)'",
+            " ".join(MIGRATIONS),
+        )
+    )
+
+    assert {status.name for status in FileStatus} - ORIGINAL_FILE_STATUSES <= added
@@ -0,0 +1,44 @@
+# tests/test_ner_backends.py
+import pytest
+
+pytest.importorskip("gliner")
+pytest.importorskip("onnxruntime")
+
+from redact.workers.worker import THRESHOLD, load_model  # noqa: E402
+
+LABELS = ["person", "email", "phone number", "date", "location"]
+
+FIXTURE_TEXTS = [
+    "Patient John Smith was admitted on 12 March 2021 in Boston.",
+    "Contact Maria Garcia at maria.garcia@example.com or +1 415 555 0132.",
+    "Invoice sent to Ahmed Khan, 221B Baker Street, London, on 2023-07-01.",
+]
+
+MARGIN = 0.1  # int8 weights move scores a little, only compare confident calls
+
+
+def entity_set(model, text, threshold):
+    return {
+        (entity["text"], entity["label"])
+        for entity in model.predict_entities(text, LABELS, threshold=threshold)
+    }
+
+
+@pytest.fixture(scope="module")
+def backends():
+    return load_model("torch"), load_model("onnx")
+
+
+@pytest.mark.parametrize("text", FIXTURE_TEXTS)
+def test_onnx_matches_torch(backends, text):
+    """Test the quantized ONNX backend finds the same entities as PyTorch"""
+    torch_model, onnx_model = backends
+
+    # Every entity PyTorch is sure of, ONNX finds; ONNX invents nothing
+    # PyTorch wouldn't call at a slightly lower bar
+    assert entity_set(torch_model, text, THRESHOLD + MARGIN) <= entity_set(
+        onnx_model, text, THRESHOLD
+    )
+    assert entity_set(onnx_model, text, THRESHOLD) <= entity_set(
+        torch_model, text, THRESHOLD - MARGIN
+    )
@@ -0,0 +1,170 @@
+# tests/test_ocr.py
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("pytesseract")
+
+from redact.core.config import OCR_MAX_PIXELS, OCR_TEXT_HEIGHT  # noqa: E402
+from redact.workers import ocr  # noqa: E402
+from redact.workers.ocr import (  # noqa: E402
+    choose_scale,
+    estimate_text_height,
+    merge_tiles,
+    ocr_tile,
+    preprocess_ocr,
+    tile_grid,
+)
+
+
+def text_page(size, font_scale, lines=20):
+    """White page with dark text lines, returns (image, cap height in px)"""
+    page = np.full((*size, 3), 255, dtype=np.uint8)
+    thickness = max(int(font_scale * 2), 1)
+    (_, cap_height), _ = cv2.getTextSize("H", cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+    step = int(cap_height * 2.5)
+    for i in range(lines):
+        cv2.putText(
+            page,
+            "HELLO WORLD TEXT HEIGHT",
+            (20, step * (i + 1)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            font_scale,
+            (0, 0, 0),
+            thickness,
+        )
+    return page, cap_height
+
+
+@pytest.mark.parametrize("font_scale", [0.5, 2.0])
+def test_estimate_text_height_tracks_font_size(font_scale):
+    """Test the estimate is close to the rendered glyph height"""
+    page, cap_height = text_page((1200, 1600), font_scale, lines=12)
+    gray = cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)
+
+    assert estimate_text_height(gray) == pytest.approx(cap_height, rel=0.35)
+
+
+def test_blank_page_has_no_estimate():
+    """Test pages without glyphs fall back to no estimate"""
+    assert estimate_text_height(np.full((500, 500), 255, dtype=np.uint8)) is None
+
+
+def test_choose_scale_caps_output_pixels():
+    """Test small text is upscaled, but never past the pixel budget"""
+    assert choose_scale((1000, 1000), OCR_TEXT_HEIGHT / 2) == pytest.approx(2)
+
+    scale = choose_scale((4000, 3000), OCR_TEXT_HEIGHT / 3)
+    assert 4000 * 3000 * scale**2 <= OCR_MAX_PIXELS * 1.001
+    assert choose_scale((100, 100), None) == 1.0
+
+
+def test_large_text_is_downscaled():
+    """Test a high resolution scan shrinks instead of growing 3x"""
+    page, _ = text_page((3000, 4000), 4.0)
+    thresh, scale = preprocess_ocr(page)
+
+    assert scale < 1
+    assert thresh.shape == (round(3000 * scale), round(4000 * scale))
+
+
+def test_tile_cores_partition_the_page():
+    """Test tiles stay in bounds and their cores cover each pixel once"""
+    height, width = 5000, 4100
+    coverage = np.zeros((height, width), dtype=np.uint8)
+    for (x0, y0, x1, y1), (cx0, cy0, cx1, cy1) in tile_grid(height, width, 2000, 400):
+        assert 0 <= x0 <= cx0 < cx1 <= x1 <= width
+        assert 0 <= y0 <= cy0 < cy1 <= y1 <= height
+        assert (x1 - x0, y1 - y0) <= (2000, 2000)
+        coverage[cy0:cy1, cx0:cx1] += 1
+
+    assert (coverage == 1).all()
+
+
+def read_tile(words, box):
+    """What Tesseract would return for a tile: clipped words, tile coordinates"""
+    x0, y0, x1, y1 = box
+    columns = {name: [] for name in ("text", "left", "top", "width", "height", "conf")}
+    for text, left, top, width, height in words:
+        right, bottom = min(left + width, x1), min(top + height, y1)
+        left, top = max(left, x0), max(top, y0)
+        if right <= left or bottom <= top:
+            continue
+        visible = text[: max(len(text) * (right - left) // width, 1)]
+        columns["text"].append(visible)
+        columns["left"].append(left - x0)
+        columns["top"].append(top - y0)
+        columns["width"].append(right - left)
+        columns["height"].append(bottom - top)
+        columns["conf"].append(90.0)
+    return columns
+
+
+def test_tiled_ocr_merges_words_once_in_reading_order():
+    """Test words on tile seams come back once, whole, in page coordinates"""
+    words = [
+        ("alpha", 100, 100, 150, 30),
+        ("straddles", 1550, 100, 200, 30),  # Across the first vertical seam
+        ("omega", 2500, 105, 120, 30),
+        ("verylongwordacrosstheseam", 1300, 1790, 700, 30),  # Wider than the overlap
+        ("before", 100, 1800, 100, 30),  # Same line as the long word
+    ]
+    tiles = tile_grid(3000, 3000, 2000, 400)
+
+    parts = []
+    for tile in tiles:
+        with patch(
+            "redact.workers.ocr._ocr_columns", return_value=read_tile(words, tile[0])
+        ):
+            parts.append(ocr_tile(None, tile))
+    result = merge_tiles(parts, scale=2)
+
+    assert result.texts == [
+        "alpha",
+        "straddles",
+        "omega",
+        "before",
+        "verylongwordacrosstheseam",
+    ]
+    assert result.boxes[1].tolist() == [1550, 100, 1750, 130]
+    assert result.scale == 2
+
+
+def test_worker_loads_tesseract_once():
+    """Test a pool worker keeps one Tesseract handle and reads every page with it"""
+    tesserocr = MagicMock()
+    columns = {name: [] for name in ocr.COLUMNS}
+    columns["text"] = ["Alice", " "]
+    for name in ("left", "top", "width", "height", "conf"):
+        columns[name] = [1, 2]
+
+    with (
+        patch.object(ocr, "tesserocr", tesserocr),
+        patch.object(ocr, "_api", None),
+        patch.object(ocr, "_tesserocr_data", return_value=columns),
+        patch.object(ocr.pytesseract, "image_to_data") as cli,
+    ):
+        ocr.init_worker("deu", "/tessdata")
+        first = ocr.ocr_image(np.zeros((8, 8), np.uint8))
+        ocr.ocr_image(np.zeros((8, 8), np.uint8))
+
+    tesserocr.PyTessBaseAPI.assert_called_once_with(path="/tessdata", lang="deu")
+    cli.assert_not_called()
+    assert first.texts == ["Alice"]  # Blank words dropped
+
+
+def test_worker_falls_back_to_the_cli():
+    """Test without tesserocr each page is read through pytesseract"""
+    columns = {name: [] for name in ocr.COLUMNS}
+
+    with (
+        patch.object(ocr, "tesserocr", None),
+        patch.object(ocr, "_api", None),
+        patch.object(ocr.pytesseract, "image_to_data", return_value=columns) as cli,
+    ):
+        ocr.init_worker()
+        assert len(ocr.ocr_image(np.zeros((8, 8), np.uint8))) == 0
+
+    cli.assert_called_once()
@@ -0,0 +1,96 @@
+# tests/test_ocrdata.py
+import numpy as np
+import pytest
+
+from redact.services.ocrdata import OCRResult, ocr_json, pack_pages, unpack_pages
+
+WORDS = [
+    {
+        "text": "John",
+        "bbox": [(10, 20), (50, 40)],
+        "entity": None,
+        "ocr_confidence": 96.5,
+    },
+    {
+        "text": "Smith",
+        "bbox": [(60, 20), (110, 40)],
+        "entity": None,
+        "ocr_confidence": 91.0,
+    },
+    {
+        "text": "café",
+        "bbox": [(120, 20), (170, 40)],
+        "entity": None,
+        "ocr_confidence": 88.25,
+    },
+]
+
+
+def test_ocr_result_roundtrip():
+    """Test packing and unpacking keeps words, boxes, entities and scale"""
+    # Arrange
+    result = OCRResult.from_words(WORDS, scale=3)
+    result.set_entity(np.array([0, 1]), "person")
+
+    # Act
+    packed = result.to_bytes()
+    restored = OCRResult.from_bytes(packed)
+
+    # Assert
+    assert len(restored) == 3
+    assert restored.scale == 3
+    assert restored.x.dtype == np.int16
+    assert restored.texts == ["John", "Smith", "café"]
+    assert [restored.entity_of(i) for i in range(3)] == ["person", "person", None]
+    np.testing.assert_array_equal(restored.boxes, result.boxes)
+
+
+def test_ocr_result_json_view_matches_legacy_shape():
+    """Test the on-demand view has the same per-word shape as json_data"""
+    words = [dict(word) for word in WORDS]
+    words[2]["entity"] = "location"
+
+    view = OCRResult.from_bytes(OCRResult.from_words(words).to_bytes()).to_json()
+
+    assert view["ocr"] == words
+
+
+def test_ocr_result_large_coordinates_and_empty_pages():
+    """Test huge pages fall back to int32 and empty pages pack cleanly"""
+    big = OCRResult.from_columns(["wide"], [40000], [10], [5], [5], [90.0])
+    empty = OCRResult.from_columns([], [], [], [], [], [])
+
+    assert OCRResult.from_bytes(big.to_bytes()).boxes.tolist() == [
+        [40000, 10, 40005, 15]
+    ]
+    assert len(OCRResult.from_bytes(empty.to_bytes())) == 0
+
+
+def test_ocr_result_rejects_other_payloads():
+    """Test arbitrary bytes are not mistaken for a packed result"""
+    with pytest.raises(ValueError):
+        OCRResult.from_bytes(b"\x00" * 64)
+
+
+def test_pages_roundtrip():
+    """Test a document's pages pack together and unpack in order"""
+    first = OCRResult.from_words(WORDS, scale=2)
+    first.set_entity(0, "person")
+    second = OCRResult.from_words(WORDS[2:])
+
+    pages = unpack_pages(pack_pages([first, second]))
+
+    assert [page.texts for page in pages] == [first.texts, second.texts]
+    assert [page.scale for page in pages] == [2, 1]
+    assert pages[0].entity_of(0) == "person"
+    assert unpack_pages(first.to_bytes())[0].texts == first.texts
+
+
+def test_ocr_json_nests_document_pages():
+    """Test documents read back as pages, single images keep the legacy shape"""
+    result = OCRResult.from_words(WORDS)
+
+    assert ocr_json(result.to_bytes()) == result.to_json()
+    assert ocr_json(pack_pages([result, result])) == {
+        "pages": [result.to_json(), result.to_json()]
+    }
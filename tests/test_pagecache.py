@@ -0,0 +1,56 @@
+# tests/test_pagecache.py
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from redact.services import pagecache
+from redact.services.pagecache import cache_key, evict_cached_pages, hash_content
+from redact.sqlschema.tables import RedactMode
+
+
+def test_cache_key_changes_with_every_input():
+    """Test the key differs whenever anything affecting the result differs"""
+    base = (hash_content(b"page"), "model@0.28", ["person"], RedactMode.solid, ".jpg")
+    key = cache_key(*base)
+
+    assert cache_key(*base) == key
+    assert cache_key(hash_content(b"other"), *base[1:]) != key
+    assert cache_key(base[0], "model@0.5", *base[2:]) != key
+    assert cache_key(*base[:2], ["person", "email"], *base[3:]) != key
+    assert cache_key(*base[:3], RedactMode.blur, base[4]) != key
+    assert cache_key(*base[:4], ".png") != key
+    assert cache_key(*base, 0.5) != key
+
+
+@pytest.mark.parametrize(
+    "setting, value",
+    [("DOCUMENT_DPI", 300), ("OCR_TEXT_HEIGHT", 24), ("OCR_TILE_SIZE", 1000)],
+)
+def test_cache_key_changes_with_pipeline_settings(setting, value):
+    """Test re-tuned OCR and rasterization settings miss the old entries"""
+    base = (hash_content(b"page"), "model@0.28", ["person"], RedactMode.solid, ".jpg")
+    key = cache_key(*base)
+
+    with patch.object(pagecache, setting, value):
+        assert cache_key(*base) != key
+
+
+@pytest.mark.asyncio
+async def test_evict_removes_rows_and_objects(mock_session):
+    """Test evicted entries are deleted from the table and from storage"""
+    mock_session.execute.return_value = MagicMock(
+        all=MagicMock(return_value=[("k1", "cache/k1.jpg"), ("k2", "cache/k2.png")])
+    )
+
+    with (
+        patch("redact.services.pagecache.AsyncSessionLocal") as mock_session_local,
+        patch(
+            "redact.services.pagecache.remove_files", new_callable=AsyncMock
+        ) as mock_remove,
+    ):
+        mock_session_local.return_value.__aenter__.return_value = mock_session
+        evicted = await evict_cached_pages()
+
+    assert evicted == 2
+    assert mock_session.execute.await_count == 2  # SELECT + one DELETE
+    mock_remove.assert_awaited_once_with(["cache/k1.jpg", "cache/k2.png"])
@@ -0,0 +1,66 @@
+# tests/test_render.py
+import cv2
+import numpy as np
+import pytest
+
+from redact.services.ocrdata import OCRResult
+from redact.sqlschema.tables import RedactMode
+from redact.workers.render import box_mask, entity_boxes, render_redactions
+
+
+def test_entity_boxes_scales_entity_words_only():
+    """Test only tagged words are kept, scaled back to original pixels"""
+    ocr = [
+        {
+            "text": "John",
+            "bbox": [(30, 60), (90, 120)],
+            "entity": "person",
+            "ocr_confidence": 96.0,
+        },
+        {
+            "text": "lives",
+            "bbox": [(99, 60), (150, 120)],
+            "entity": None,
+            "ocr_confidence": 95.0,
+        },
+    ]
+
+    boxes = entity_boxes(OCRResult.from_words(ocr, scale=3))
+
+    np.testing.assert_array_equal(boxes, [[10, 20, 30, 40]])
+
+
+def test_solid_mode_matches_cv2_rectangle():
+    """Test the single mask pass paints the same pixels as filled rectangles"""
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (120, 200, 3), dtype=np.uint8)
+    boxes = np.array([[5, 5, 40, 30], [30, 20, 80, 60], [150, 100, 260, 200]])
+
+    expected = image.copy()
+    for x1, y1, x2, y2 in boxes:
+        cv2.rectangle(expected, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 0), -1)
+
+    render_redactions(image, boxes, RedactMode.solid)
+
+    np.testing.assert_array_equal(image, expected)
+
+
+@pytest.mark.parametrize("mode", [RedactMode.pixelate, RedactMode.blur])
+def test_soft_modes_only_touch_masked_pixels(mode):
+    """Test pixelate and blur leave pixels outside the boxes alone"""
+    rng = np.random.default_rng(1)
+    image = rng.integers(0, 255, (100, 100), dtype=np.uint8)
+    original = image.copy()
+    boxes = np.array([[10, 10, 49, 49]])
+    mask = box_mask(boxes, image.shape)
+
+    render_redactions(image, boxes, mode)
+
+    np.testing.assert_array_equal(image[~mask], original[~mask])
+    assert not np.array_equal(image[mask], original[mask])
+
+
+def test_unknown_mode_rejected():
+    """Test an unknown mode raises"""
+    with pytest.raises(ValueError):
+        render_redactions(np.zeros((4, 4), np.uint8), np.array([[0, 0, 1, 1]]), "x")
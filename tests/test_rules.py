@@ -0,0 +1,74 @@
+# tests/test_rules.py
+from redact.workers.rules import RuleEngine, luhn_valid
+from redact.workers.text import join_words, span_words
+
+LABELS = [
+    "email",
+    "credit card number",
+    "social security number, health insurance",
+    "date",
+    "phone number",
+]
+
+
+def found(text, labels=LABELS):
+    return [(e["label"], e["text"]) for e in RuleEngine(labels).find(text)]
+
+
+def test_luhn_checks_many_numbers_at_once():
+    """Test valid and invalid card numbers of different lengths in one call"""
+    valid = luhn_valid(["4111111111111111", "4111111111111112", "378282246310005"])
+    assert valid.tolist() == [True, False, True]
+    assert luhn_valid([]).tolist() == []
+
+
+def test_structured_pii_is_found_with_full_score():
+    """Test each rule finds its value, scored above any model entity"""
+    text = (
+        "Mail jane.doe@example.com, card 4111 1111 1111 1111, "
+        "SSN 123-45-6789, born 2021-03-12, call +1 415 555 0132"
+    )
+    assert found(text) == [
+        ("email", "jane.doe@example.com"),
+        ("credit card number", "4111 1111 1111 1111"),
+        ("social security number, health insurance", "123-45-6789"),
+        ("date", "2021-03-12"),
+        ("phone number", "+1 415 555 0132"),
+    ]
+    assert {e["score"] for e in RuleEngine(LABELS).find(text)} == {1.0}
+
+
+def test_validators_reject_lookalikes():
+    """Test impossible SSNs, dates and short numbers are left alone"""
+    assert found("SSN 000-12-3456") == []
+    assert found("version 1.2.3 and 2021-13-40") == []
+    assert found("room 42") == []
+    assert found("call 555-0132") == [("phone number", "555-0132")]
+
+
+def test_month_name_dates():
+    """Test written dates in both orders"""
+    assert found("on 12 March 2021 or Mar. 3rd, 2020") == [
+        ("date", "12 March 2021"),
+        ("date", "Mar. 3rd, 2020"),
+    ]
+
+
+def test_failed_card_falls_back_to_phone():
+    """Test a long digit run that fails Luhn is retried as a phone number"""
+    assert found("tel 0044 2079 4609 58") == [("phone number", "0044 2079 4609 58")]
+
+
+def test_only_requested_labels_run():
+    """Test rules for labels that weren't asked for don't match"""
+    assert found("jane@example.com 2021-03-12", ["date"]) == [("date", "2021-03-12")]
+    assert RuleEngine([]).find("jane@example.com") == []
+
+
+def test_rule_spans_map_to_words():
+    """Test a match over several OCR words tags each of them"""
+    words = ["Card:", "4111", "1111", "1111", "1111", "thanks"]
+    text, starts = join_words(words)
+    (entity,) = RuleEngine(LABELS).find(text)
+
+    assert list(span_words(starts, entity["start"], entity["end"])) == [1, 2, 3, 4]
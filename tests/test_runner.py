@@ -0,0 +1,111 @@
+# tests/test_runner.py
+import gc
+import os
+import signal
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from redact.workers import runner, worker
+
+
+@pytest.fixture
+def stub_model():
+    """A loaded model as far as the worker module can tell, with parameters"""
+    model = MagicMock()
+    model.parameters.return_value = [MagicMock(), MagicMock()]
+    with patch.object(worker, "_model", model):
+        yield model
+    gc.unfreeze()  # prepare_for_fork freezes the test process's heap
+
+
+@pytest.fixture
+def restore_signals():
+    """run_processes and _child_main install handlers on the test process"""
+    saved = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    yield
+    for sig, handler in saved.items():
+        signal.signal(sig, handler)
+
+
+def test_prepare_for_fork_freezes_the_model(stub_model):
+    """Test the shared model has no autograd state and its heap is frozen"""
+    worker.prepare_for_fork()
+
+    stub_model.eval.assert_called_once()
+    for parameter in stub_model.parameters.return_value:
+        parameter.requires_grad_.assert_called_once_with(False)
+    assert gc.get_freeze_count() > 0
+
+
+@pytest.mark.parametrize(
+    "device, backend",
+    [("cuda", "torch"), ("cpu", "onnx")],
+)
+def test_several_processes_refuse_unforkable_backends(stub_model, device, backend):
+    """Test CUDA and ONNX Runtime refuse to fork more than one runner"""
+    with (
+        patch.object(runner, "get_claimable_job_queue"),
+        patch.object(worker, "get_device", return_value=device),
+        patch.object(worker, "NER_BACKEND", backend),
+        patch.object(runner, "_child_main") as child,
+    ):
+        with pytest.raises(SystemExit):
+            runner.run_processes(2)
+
+    child.assert_not_called()
+
+
+def _flaky_child(log: str, parent: int):
+    """Dies on its first start; once restarted, asks the parent to stop."""
+    with open(log, "a") as f:
+        f.write("start\n")
+    with open(log) as f:
+        starts = f.read().count("start")
+    if starts == 1:
+        os._exit(1)
+    os.kill(parent, signal.SIGTERM)
+    time.sleep(30)  # Until the parent terminates us
+
+
+def test_dead_runner_is_restarted(stub_model, restore_signals, tmp_path):
+    """Test a child that dies is replaced, and SIGTERM stops them all"""
+    log = str(tmp_path / "starts")
+    parent = os.getpid()
+
+    with (
+        patch.object(runner, "get_claimable_job_queue"),
+        patch.object(worker, "get_device", return_value="cpu"),
+        patch.object(
+            runner, "_child_main", side_effect=lambda n: _flaky_child(log, parent)
+        ),
+        patch.object(runner.time, "sleep"),
+    ):
+        runner.run_processes(1)
+
+    with open(log) as f:
+        assert f.read().count("start") == 2
+
+
+def test_child_takes_its_share_and_a_fresh_engine(restore_signals):
+    """Test a forked runner drops the parent's pool and splits the node's cores"""
+    pytest.importorskip("pytesseract")
+    from redact.workers import inference
+
+    engine = MagicMock()
+    with (
+        patch("redact.core.database.get_engine", return_value=engine),
+        patch.object(inference, "set_threads") as set_threads,
+        patch.object(inference.os, "cpu_count", return_value=8),
+        patch.object(inference, "OCR_CONCURRENCY", 8),
+        patch.object(inference, "_ocr_workers", 1),
+        patch.object(runner, "run_workers", AsyncMock()) as run_workers,
+    ):
+        runner._child_main(4)
+
+        assert inference._ocr_workers == 2
+
+    engine.sync_engine.dispose.assert_called_once_with(close=False)
+    set_threads.assert_called_once_with(2)
+    run_workers.assert_awaited_once()
@@ -0,0 +1,78 @@
+# tests/test_scheduler.py
+import asyncio
+
+import pytest
+
+from redact.workers.scheduler import MicroBatcher
+
+
+class Recorder:
+    """Stands in for the worker run, recording the groups it was given"""
+
+    def __init__(self, delay=0.0):
+        self.groups = []
+        self.delay = delay
+
+    async def __call__(self, batch_ids):
+        self.groups.append(list(batch_ids))
+        await asyncio.sleep(self.delay)
+
+
+@pytest.mark.asyncio
+async def test_batches_within_window_share_a_run():
+    """Test batches submitted inside the wait window are dispatched together"""
+    run = Recorder()
+    batcher = MicroBatcher(run, max_wait_ms=50, max_pages=100)
+
+    await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+    assert run.groups == [[0, 1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_full_window_dispatches_without_waiting():
+    """Test reaching max_pages dispatches before the time window closes"""
+    run = Recorder()
+    batcher = MicroBatcher(run, max_wait_ms=10_000, max_pages=4)
+
+    await asyncio.wait_for(
+        asyncio.gather(batcher.submit("a", pages=3), batcher.submit("b", pages=1)),
+        timeout=1,
+    )
+
+    assert run.groups == [["a", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_groups_split_at_page_cap_and_queue_behind_a_run():
+    """Test one run at a time, with later arrivals grouped for the next run"""
+    run = Recorder(delay=0.05)
+    batcher = MicroBatcher(run, max_wait_ms=10, max_pages=2)
+
+    first = asyncio.ensure_future(batcher.submit("a", pages=2))
+    await asyncio.sleep(0.02)  # "a" is running now
+    rest = [asyncio.ensure_future(batcher.submit(b)) for b in ("b", "c", "d")]
+    await asyncio.gather(first, *rest)
+
+    assert run.groups == [["a"], ["b", "c"], ["d"]]
+
+
+@pytest.mark.asyncio
+async def test_run_errors_reach_every_submitter():
+    """Test a failing run fails each batch's submit, and the next run still goes"""
+    calls = []
+
+    async def run(batch_ids):
+        calls.append(batch_ids)
+        if len(calls) == 1:
+            raise RuntimeError("gpu fell over")
+
+    batcher = MicroBatcher(run, max_wait_ms=10, max_pages=10)
+
+    results = await asyncio.gather(
+        batcher.submit(1), batcher.submit(2), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    await batcher.submit(3)
+    assert calls == [[1, 2], [3]]
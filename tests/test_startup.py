@@ -0,0 +1,93 @@
+# tests/test_startup.py
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from redact.workers import export
+from redact.workers.worker import _write_manifest, verify_weights
+
+PROBE = "import sys, redact.workers.{}; print(sorted(sys.modules))"
+
+
+@pytest.mark.parametrize("module", ["worker", "export"])
+def test_worker_import_loads_no_model(module):
+    """Test importing the worker or the exporter leaves torch and GLiNER unloaded"""
+    loaded = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert "'torch'" not in loaded
+    assert "'gliner'" not in loaded
+
+
+def test_onnx_export_uses_the_checksummed_weights(tmp_path):
+    """Test the export is built from fetch_weights' snapshot, and rebuilt when it changes"""
+    weights = tmp_path / "weights"
+    weights.mkdir()
+    (weights / "model.bin").write_bytes(b"weights")
+    _write_manifest(str(weights))
+
+    model = MagicMock()
+    model.to.return_value.eval.return_value = model
+    model.config.span_mode = "token_level"
+    model.prepare_model_inputs.return_value = (MagicMock(), None)
+    gliner, torch = MagicMock(), MagicMock()
+    gliner.GLiNER.from_pretrained.return_value = model
+    torch.onnx.export.side_effect = lambda *a, f, **k: open(f, "wb").close()
+
+    with (
+        patch.dict(sys.modules, {"gliner": gliner, "torch": torch}),
+        patch.object(export, "fetch_weights", return_value=str(weights)),
+        patch.object(export, "ONNX_MODEL_DIR", str(tmp_path / "onnx")),
+    ):
+        export.export_onnx("org/model", quantize=False)
+        export.export_onnx("org/model", quantize=False)  # Reused
+        (weights / "model.bin").write_bytes(b"new weights")
+        _write_manifest(str(weights))
+        export.export_onnx("org/model", quantize=False)
+
+    assert gliner.GLiNER.from_pretrained.call_count == 2
+    gliner.GLiNER.from_pretrained.assert_called_with(
+        str(weights), local_files_only=True
+    )
+
+
+def test_config_imports_without_environment():
+    """Test config and the API import with no database or Supabase settings"""
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if not name.startswith(("ASYNC_DB_URL", "SUPABASE_"))
+    }
+    subprocess.run(
+        [sys.executable, "-c", "import redact.core.config, app.main"],
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+
+
+def test_verify_weights_catches_changed_files(tmp_path):
+    """Test cached weights are checked against their manifest"""
+    weights = tmp_path / "model.bin"
+    weights.write_bytes(b"weights" * 100)
+    (tmp_path / "config.json").write_text("{}")
+    assert not verify_weights(str(tmp_path))  # No manifest yet
+
+    _write_manifest(str(tmp_path))
+    assert verify_weights(str(tmp_path))
+
+    # Same size, new content and mtime: only the hash can tell
+    stat = weights.stat()
+    weights.write_bytes(b"WEIGHTS" * 100)
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert not verify_weights(str(tmp_path))
+
+    weights.unlink()
+    assert not verify_weights(str(tmp_path))
@@ -1,13 +1,22 @@
 # tests/test_storage.py
 import datetime
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import UUID, uuid4
 
 import pytest
 from fastapi import HTTPException, UploadFile
 
-from redact.services.storage import create_batch_and_files
-from redact.sqlschema.tables import Batch, Files
+from redact.services.storage import (
+    create_batch_and_files,
+    download_files,
+    get_batch_files,
+    get_redacted_filenames,
+    read_heads,
+    transition_batch_status,
+    update_batch_status_async,
+    update_files_bulk,
+)
+from redact.sqlschema.tables import Batch, BatchStatus, Files
 
 
 @pytest.mark.asyncio
@@ -57,5 +66,140 @@ async def test_create_batch_and_files_db_error(mock_session):
     assert "Failed to store batch" in exc_info.value.detail
 
 
+@pytest.mark.asyncio
+async def test_get_batch_files_single_query(mock_session):
+    """Test batch metadata comes back from one SELECT"""
+    mock_result = MagicMock()
+    mock_result.all.return_value = [("a.jpg",), ("b.jpg",)]
+    mock_session.execute.return_value = mock_result
+
+    rows = await get_batch_files(uuid4(), mock_session, Files.filename)
+
+    assert rows == [("a.jpg",), ("b.jpg",)]
+    mock_session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_redacted_filenames_skip_unfinished_files(mock_session):
+    """Test only completed files with a redacted object are selected"""
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = ["a_redacted.jpg"]
+    mock_session.execute.return_value = mock_result
+
+    names = await get_redacted_filenames(uuid4(), mock_session)
+
+    assert names == ["a_redacted.jpg"]
+    statement = str(mock_session.execute.call_args.args[0])
+    assert "files.status = " in statement
+    assert "files.redact_filename IS NOT NULL" in statement
+
+
+@pytest.mark.asyncio
+async def test_update_files_bulk_executemany(mock_session):
+    """Test every file's results are written in one executemany UPDATE"""
+    updates = [
+        {"file_id": uuid4(), "redact_filename": "a_redacted.jpg"},
+        {"file_id": uuid4(), "redact_filename": "b_redacted.jpg"},
+    ]
+
+    with patch("redact.services.storage.AsyncSessionLocal") as mock_session_local:
+        mock_session_local.return_value.__aenter__.return_value = mock_session
+        await update_files_bulk(updates)
+
+    mock_session.execute.assert_awaited_once()
+    assert mock_session.execute.call_args[0][1] == updates
+
+
+@pytest.mark.asyncio
+async def test_update_batch_status_without_loading_rows(mock_session):
+    """Test batch status propagates to files without a SELECT per file"""
+    mock_session.execute.return_value = MagicMock(rowcount=1)
+
+    with patch("redact.services.storage.AsyncSessionLocal") as mock_session_local:
+        mock_session_local.return_value.__aenter__.return_value = mock_session
+        await update_batch_status_async(uuid4(), BatchStatus.processing)
+
+    assert mock_session.execute.await_count == 2
+    mock_session.get.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_transition_batch_status_is_conditional(mock_session):
+    """Test a batch already moved on is left alone, files included"""
+    mock_session.execute.return_value = MagicMock(rowcount=0)
+
+    with patch("redact.services.storage.AsyncSessionLocal") as mock_session_local:
+        mock_session_local.return_value.__aenter__.return_value = mock_session
+        moved = await transition_batch_status(
+            uuid4(), BatchStatus.awaiting_upload, BatchStatus.uploaded
+        )
+
+    assert moved is False
+    mock_session.execute.assert_awaited_once()
+    assert "batch.status = " in str(mock_session.execute.call_args[0][0])
+
+
+@pytest.mark.asyncio
+async def test_download_files_retries_transient_errors(mock_supabase_client):
+    """Test downloads are retried on 5xx errors and returned in order"""
+    from storage3.exceptions import StorageApiError
+
+    attempts = {"uploads/a.jpg": 0}
+
+    async def flaky_download(path):
+        if path == "uploads/a.jpg" and attempts[path] == 0:
+            attempts[path] += 1
+            raise StorageApiError("Bad gateway", "BadGateway", 502)
+        return path.encode()
+
+    bucket = mock_supabase_client.storage.from_.return_value
+    bucket.download = AsyncMock(side_effect=flaky_download)
+
+    with (
+        patch(
+            "redact.services.storage.get_supabase_client",
+            AsyncMock(return_value=mock_supabase_client),
+        ),
+        patch("redact.services.storage.asyncio.sleep", new_callable=AsyncMock),
+    ):
+        data = await download_files(["uploads/a.jpg", "uploads/b.jpg"])
+
+    assert data == [b"uploads/a.jpg", b"uploads/b.jpg"]
+    assert bucket.download.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_download_files_does_not_retry_client_errors(mock_supabase_client):
+    """Test a 404 is raised straight away"""
+    from storage3.exceptions import StorageApiError
+
+    bucket = mock_supabase_client.storage.from_.return_value
+    bucket.download = AsyncMock(
+        side_effect=StorageApiError("Object not found", "not_found", 404)
+    )
+
+    with patch(
+        "redact.services.storage.get_supabase_client",
+        AsyncMock(return_value=mock_supabase_client),
+    ):
+        with pytest.raises(StorageApiError):
+            await download_files(["uploads/missing.jpg"])
+
+    assert bucket.download.call_count == 1
+
+
 """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" ""
 """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" """""" ""
+
+
+@pytest.mark.asyncio
+async def test_read_heads_fetches_only_the_first_bytes(fake_storage):
+    """Test object heads come from ranged GETs on signed URLs"""
+    fake_storage.objects = {"uploads/a.jpg": b"A" * 100, "uploads/b.png": b"B" * 5}
+
+    heads = await read_heads(["uploads/a.jpg", "uploads/b.png"], 12)
+
+    assert heads == [b"A" * 12, b"B" * 5]
+    assert [
+        r.headers.get("range") for r in fake_storage.requests if r.method == "GET"
+    ] == ["bytes=0-11"] * 2
@@ -0,0 +1,72 @@
+# tests/test_text.py
+import pytest
+
+from redact.workers.text import boundaries, join_words, span_words, window_words
+
+WORDS = ["Call", "John", "Smith", "or", "John", "at", "555-0132."]
+
+
+def test_join_words_offsets_point_at_each_word():
+    """Test each offset is where its word starts in the joined text"""
+    text, starts = join_words(WORDS)
+
+    assert text == "Call John Smith or John at 555-0132."
+    assert [text[start : start + len(word)] for word, start in zip(WORDS, starts)] == (
+        WORDS
+    )
+    assert join_words([]) == ("", [0])
+
+
+@pytest.mark.parametrize(
+    "span, expected",
+    [
+        ((5, 15), [1, 2]),  # "John Smith", the first John only
+        ((19, 23), [4]),  # The second John only
+        ((27, 35), [6]),  # Part of a word tags the whole word
+        ((9, 10), []),  # Just a separator
+        ((0, 0), []),
+    ],
+)
+def test_span_words_resolves_only_the_span(span, expected):
+    """Test a character span maps to exactly the words it covers"""
+    text, starts = join_words(WORDS)
+
+    assert list(span_words(starts, *span)) == expected
+
+
+def test_windows_cover_every_word_and_overlap():
+    """Test long text is read in full, in windows that share their edges"""
+    words = [f"w{i}" for i in range(1000)]
+
+    ranges = window_words(words, window=100, stride=75)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == 1000
+    assert all(end - start <= 100 for start, end in ranges)
+    for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert next_start < end  # Overlap
+    assert len(ranges) == 13  # Linear in the text: about 1000 / 75
+
+
+def test_windows_snap_to_sentence_and_line_breaks():
+    """Test window edges land on sentence ends rather than mid-sentence"""
+    words = ["Jane", "Doe", "lives", "right", "here."] * 20
+    breaks = boundaries(words)
+
+    ranges = window_words(words, window=16, stride=12, breaks=breaks)
+
+    assert all(start in breaks or start == 0 for start, _ in ranges)
+    assert all(end in breaks or end == len(words) for _, end in ranges)
+
+
+def test_boundaries_find_line_wraps():
+    """Test a word left of its predecessor starts a new line"""
+    assert boundaries(["a", "b", "c", "d"], [10, 50, 10, 50]) == [2]
+    assert boundaries(["end.", "next"]) == [1]
+
+
+def test_windows_count_model_tokens():
+    """Test punctuation-heavy words take their GLiNER token count"""
+    assert window_words(["555.0132.", "a", "b"], window=3, stride=2) == [
+        (0, 1),
+        (1, 3),
+    ]
@@ -0,0 +1,38 @@
+# tests/test_worker.py
+from unittest.mock import MagicMock, patch
+
+from redact.workers import worker
+
+
+def test_label_encodings_are_reused_per_label_set():
+    """Test a bi-encoder encodes each label set once across calls"""
+    model = MagicMock()
+    model.config.labels_encoder = "bge-small"
+    model.batch_predict_with_embeds.side_effect = lambda texts, *a, **k: [[]] * len(
+        texts
+    )
+    worker._encode_labels.cache_clear()
+
+    with patch.object(worker, "get_model", return_value=model):
+        worker.batch_predict_entities(["a", "b", "c"], ["email"], batch_size=2)
+        worker.batch_predict_entities(["d"], ["email"], threshold=0.5)
+        worker.batch_predict_entities(["e"], ["email", "person"])
+
+    assert model.encode_labels.call_count == 2
+    assert model.batch_predict_with_embeds.call_count == 4
+    assert model.batch_predict_with_embeds.call_args_list[2].kwargs == {
+        "threshold": 0.5
+    }
+    model.batch_predict_entities.assert_not_called()
+
+
+def test_prompt_models_skip_the_label_cache():
+    """Test models that read labels with the text predict without encodings"""
+    model = MagicMock()
+    model.config.labels_encoder = None
+    model.batch_predict_entities.return_value = [[]]
+
+    with patch.object(worker, "get_model", return_value=model):
+        assert worker.batch_predict_entities(["a"], ["email"]) == [[]]
+
+    model.encode_labels.assert_not_called()